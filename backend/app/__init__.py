@@ -21,8 +21,14 @@ def create_app(config_name='default'):
     db.init_app(app)
     jwt.init_app(app)
     cors.init_app(app, origins=app.config['CORS_ORIGINS'], supports_credentials=True)
-    socketio.init_app(app, cors_allowed_origins="*", ping_timeout=60, ping_interval=25, async_mode='eventlet')
+    # With SOCKETIO_MESSAGE_QUEUE set, emits from any worker/host reach sockets held by the others
+    socketio.init_app(app, cors_allowed_origins="*", ping_timeout=60, ping_interval=25, async_mode='eventlet',
+                      message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE') or None)
     mail.init_app(app)
+
+    # Live battle rooms + presence (in-process, or shared via BATTLE_STORE_URL)
+    from .services.battle_store import battle_store
+    battle_store.configure(app.config)
     
     # Register blueprints (routes)
     from .routes.auth import auth_bp
@@ -128,6 +134,7 @@ def create_app(config_name='default'):
     # Seed official roadmaps if collection is empty
     with app.app_context():
         seed_official_roadmaps(app)
+        migrate_roadmap_cache(app)
     
     return app
 
@@ -164,6 +171,24 @@ def seed_official_roadmaps(app):
         app.logger.error(f"Seeding failed: {e}")
 
 
+def migrate_roadmap_cache(app):
+    """Bring RoadmapCache up to the soft-expiry layout and canonical keys (idempotent, runs on every start).
+
+    Independent of the refresher, which may be disabled or not started yet.
+    """
+    from .models.cache import RoadmapCache
+    try:
+        RoadmapCache.migrate_soft_expiry(app.config.get('ROADMAP_CACHE_HARD_TTL', 30 * 86400))
+    except Exception as e:
+        app.logger.error(f"[CACHE] Soft-expiry migration failed: {e}")
+    try:
+        moved = RoadmapCache.migrate_canonical_keys()
+        if moved:
+            app.logger.info(f"[CACHE] Re-keyed {moved} roadmap cache entries")
+    except Exception as e:
+        app.logger.error(f"[CACHE] Cache key migration failed: {e}")
+
+
 def _get_category(slug):
     """Map slug to category."""
     categories = {
@@ -35,16 +35,114 @@ class Config:
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
     
+    # LLM backend: nvidia (default) | ollama | fake (offline stand-in for load tests)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'nvidia')
+    LLM_MODEL = os.getenv('LLM_MODEL', '')  # Overrides the backend's default model
+    LLM_FAKE_RECORDINGS = os.getenv('LLM_FAKE_RECORDINGS', '')  # JSON file of recorded responses
+    LLM_FAKE_LATENCY = os.getenv('LLM_FAKE_LATENCY', 'constant:0')  # e.g. lognormal:1.5,0.6
+    LLM_FAKE_ERROR_RATE = float(os.getenv('LLM_FAKE_ERROR_RATE', 0))
+    LLM_FAKE_KEYS = int(os.getenv('LLM_FAKE_KEYS', 3))
+    LLM_FAKE_SEED = int(os.getenv('LLM_FAKE_SEED', 0))
+
     # AI Configuration (Ollama - optional)
     OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
     OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama2')
     
     # NVIDIA AI Configuration
-    NVIDIA_API_KEY = os.getenv('NVIDIA_API_KEY', '')
+    NVIDIA_API_KEYS = os.getenv('NVIDIA_API_KEYS', '')  # Comma-separated, any number of keys
+    NVIDIA_API_KEY = os.getenv('NVIDIA_API_KEY', '')  # Legacy single slots, still honoured
     NVIDIA_API_KEY_2 = os.getenv('NVIDIA_API_KEY_2', '')
     NVIDIA_API_KEY_3 = os.getenv('NVIDIA_API_KEY_3', '')
     NVIDIA_BASE_URL = os.getenv('NVIDIA_BASE_URL', 'https://integrate.api.nvidia.com/v1')
     NVIDIA_MODEL = os.getenv('NVIDIA_MODEL', 'meta/llama-3.1-8b-instruct')
+
+    # LLM gateway (per-key concurrency + admission control)
+    AI_GATEWAY_MAX_PER_KEY = int(os.getenv('AI_GATEWAY_MAX_PER_KEY', 4))
+    AI_GATEWAY_MAX_QUEUE = int(os.getenv('AI_GATEWAY_MAX_QUEUE', 64))
+    AI_GATEWAY_QUEUE_TIMEOUT = float(os.getenv('AI_GATEWAY_QUEUE_TIMEOUT', 30))
+
+    # Key scheduler (per-key health, 429 cooldowns, circuit breakers)
+    AI_KEY_EWMA_ALPHA = float(os.getenv('AI_KEY_EWMA_ALPHA', 0.3))
+    AI_KEY_FAILURE_THRESHOLD = int(os.getenv('AI_KEY_FAILURE_THRESHOLD', 3))  # Consecutive failures to open
+    AI_KEY_OPEN_SECONDS = float(os.getenv('AI_KEY_OPEN_SECONDS', 30))
+    AI_KEY_MAX_OPEN_SECONDS = float(os.getenv('AI_KEY_MAX_OPEN_SECONDS', 300))
+    AI_KEY_DEFAULT_RETRY_AFTER = float(os.getenv('AI_KEY_DEFAULT_RETRY_AFTER', 10))  # 429 without Retry-After
+
+    # Hedged LLM calls: no first token within this percentile of recent ones -> duplicate on a second key
+    AI_HEDGE_ENABLED = os.getenv('AI_HEDGE_ENABLED', 'false').lower() == 'true'
+    AI_HEDGE_PERCENTILE = float(os.getenv('AI_HEDGE_PERCENTILE', 95))
+    AI_HEDGE_MIN_DELAY = float(os.getenv('AI_HEDGE_MIN_DELAY', 1.0))  # Never hedge sooner than this (seconds)
+    AI_HEDGE_MIN_SAMPLES = int(os.getenv('AI_HEDGE_MIN_SAMPLES', 20))  # Latencies needed before hedging starts
+
+    # Stream roadmap nodes to the browser (roadmap_node events) while the LLM is still writing
+    AI_STREAM_ROADMAPS = os.getenv('AI_STREAM_ROADMAPS', 'true').lower() == 'true'
+
+    # In-process roadmap cache tier (in front of the roadmap_cache collection)
+    ROADMAP_CACHE_MAX_ENTRIES = int(os.getenv('ROADMAP_CACHE_MAX_ENTRIES', 256))
+    ROADMAP_CACHE_MAX_BYTES = int(os.getenv('ROADMAP_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    ROADMAP_CACHE_TTL = int(os.getenv('ROADMAP_CACHE_TTL', 600))
+    ROADMAP_CACHE_FLUSH_INTERVAL = int(os.getenv('ROADMAP_CACHE_FLUSH_INTERVAL', 30))
+    # Serve the closest cached topic (trigram Jaccard) when the exact key misses
+    ROADMAP_CACHE_FUZZY = os.getenv('ROADMAP_CACHE_FUZZY', 'true').lower() == 'true'
+    ROADMAP_CACHE_SIMILARITY = float(os.getenv('ROADMAP_CACHE_SIMILARITY', 0.8))
+
+    # Stale-while-revalidate: entries older than SOFT_TTL are served and regenerated
+    # in the background; HARD_TTL is when Mongo finally deletes them.
+    ROADMAP_CACHE_SOFT_TTL = int(os.getenv('ROADMAP_CACHE_SOFT_TTL', 7 * 86400))
+    ROADMAP_CACHE_HARD_TTL = int(os.getenv('ROADMAP_CACHE_HARD_TTL', 30 * 86400))
+    ROADMAP_REFRESH_ENABLED = os.getenv('ROADMAP_REFRESH_ENABLED', 'true').lower() == 'true'
+    ROADMAP_REFRESH_INTERVAL = int(os.getenv('ROADMAP_REFRESH_INTERVAL', 3600))
+    ROADMAP_REFRESH_AHEAD = int(os.getenv('ROADMAP_REFRESH_AHEAD', 86400))
+    ROADMAP_REFRESH_TOP_N = int(os.getenv('ROADMAP_REFRESH_TOP_N', 50))
+    ROADMAP_REFRESH_CONCURRENCY = int(os.getenv('ROADMAP_REFRESH_CONCURRENCY', 2))
+
+    # Multi-worker battles: shared room/presence store + Socket.IO message queue.
+    # Both empty = single process (gunicorn workers must stay at 1).
+    BATTLE_STORE_URL = os.getenv('BATTLE_STORE_URL', '')  # e.g. redis://localhost:6379/0
+    BATTLE_STORE_PREFIX = os.getenv('BATTLE_STORE_PREFIX', 'careersage:')
+    BATTLE_ROOM_TTL = int(os.getenv('BATTLE_ROOM_TTL', 2 * 3600))  # Abandoned rooms expire
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')  # e.g. redis://localhost:6379/1
+    BATTLE_ANSWER_FLUSH_INTERVAL = float(os.getenv('BATTLE_ANSWER_FLUSH_INTERVAL', 2))  # Write-behind answer log
+    BATTLE_ANSWER_FLUSH_BATCH = int(os.getenv('BATTLE_ANSWER_FLUSH_BATCH', 200))  # Flush early past this many
+    PRESENCE_COALESCE_SECONDS = float(os.getenv('PRESENCE_COALESCE_SECONDS', 2))  # Swallow online/offline flaps
+    PRESENCE_SID_TTL = int(os.getenv('PRESENCE_SID_TTL', 120))  # Sockets without a heartbeat this long are offline
+
+    # Battle matchmaking: rating gap allowed = base + growth * seconds waited (capped)
+    MATCHMAKING_BASE_BAND = int(os.getenv('MATCHMAKING_BASE_BAND', 50))
+    MATCHMAKING_BAND_GROWTH = float(os.getenv('MATCHMAKING_BAND_GROWTH', 10))  # Rating points per second
+    MATCHMAKING_MAX_BAND = int(os.getenv('MATCHMAKING_MAX_BAND', 500))
+    MATCHMAKING_TICK = float(os.getenv('MATCHMAKING_TICK', 1.0))
+    MATCHMAKING_CONCURRENCY = int(os.getenv('MATCHMAKING_CONCURRENCY', 8))  # Battles being set up at once
+
+    # Server-side battle clock
+    BATTLE_QUESTION_SECONDS = int(os.getenv('BATTLE_QUESTION_SECONDS', 15))  # Shown to clients as the countdown
+    BATTLE_DEADLINE_GRACE = int(os.getenv('BATTLE_DEADLINE_GRACE', 5))  # Network slack before the server steps in
+    BATTLE_WAITING_TTL = int(os.getenv('BATTLE_WAITING_TTL', 600))  # Unjoined battles expire after this
+    BATTLE_STALE_AFTER = int(os.getenv('BATTLE_STALE_AFTER', 3600))  # In-progress battles older than this are swept
+    BATTLE_GC_INTERVAL = int(os.getenv('BATTLE_GC_INTERVAL', 600))
+    BATTLE_TIMER_CONCURRENCY = int(os.getenv('BATTLE_TIMER_CONCURRENCY', 16))  # Deadline callbacks running at once
+    BATTLE_PROGRESS_HZ = float(os.getenv('BATTLE_PROGRESS_HZ', 4))  # opponent_progress updates per second, max
+    BATTLE_MSGPACK = os.getenv('BATTLE_MSGPACK', 'false').lower() == 'true'  # Binary battle events (needs msgpack)
+    BATTLE_SPECTATORS = os.getenv('BATTLE_SPECTATORS', 'anyone')  # anyone / friends / off
+    BATTLE_SPECTATOR_HZ = float(os.getenv('BATTLE_SPECTATOR_HZ', 2))  # Scoreboard broadcasts per second, max
+
+    # Leaderboards: bump to rebuild every board from Mongo on the next read
+    LEADERBOARD_BUILD_VERSION = os.getenv('LEADERBOARD_BUILD_VERSION', '1')
+
+    # Rating formula for finished battles (see services/rating_engine.py, recompute_ratings.py)
+    RATING_ENGINE = os.getenv('RATING_ENGINE', 'elo')  # elo / glicko2 (needs numpy)
+    RATING_GLICKO_TAU = float(os.getenv('RATING_GLICKO_TAU', 0.5))  # Glicko-2 volatility constraint
+    RATING_PERIOD_DAYS = int(os.getenv('RATING_PERIOD_DAYS', 7))  # Rating period for batch recomputes
+
+    # Battle question bank (pre-generated MCQ pools per canonical topic)
+    QUESTION_BANK_REFRESH_ENABLED = os.getenv('QUESTION_BANK_REFRESH_ENABLED', 'true').lower() == 'true'
+    QUESTION_BANK_REFRESH_INTERVAL = int(os.getenv('QUESTION_BANK_REFRESH_INTERVAL', 1800))
+    QUESTION_BANK_TOPICS = os.getenv('QUESTION_BANK_TOPICS', 'JavaScript,Python,DevOps,React,Docker,SQL')
+    QUESTION_BANK_LOW_WATER = int(os.getenv('QUESTION_BANK_LOW_WATER', 30))  # Top up below this many
+    QUESTION_BANK_TARGET = int(os.getenv('QUESTION_BANK_TARGET', 60))
+    QUESTION_BANK_MAX_BATCHES = int(os.getenv('QUESTION_BANK_MAX_BATCHES', 3))  # LLM calls per top-up
+    QUESTION_BANK_SEEN_BATTLES = int(os.getenv('QUESTION_BANK_SEEN_BATTLES', 20))  # Recent battles to de-dup against
+    QUESTION_BANK_CONCURRENCY = int(os.getenv('QUESTION_BANK_CONCURRENCY', 2))
     
     # Email (SMTP)
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
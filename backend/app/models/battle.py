@@ -7,7 +7,13 @@ from ..extensions import db
 
 class BattleResult(db.Document):
     """Stores each 1v1 battle"""
-    meta = {'collection': 'battle_results'}
+    meta = {
+        'collection': 'battle_results',
+        'indexes': [
+            {'fields': ['challenger_id', '-created_at']},
+            {'fields': ['opponent_id', '-created_at']},
+        ]
+    }
     
     challenger_id = db.ReferenceField('User', required=True)
     opponent_id = db.ReferenceField('User')
@@ -21,7 +27,7 @@ class BattleResult(db.Document):
     winner_id = db.ReferenceField('User')
     is_draw = db.BooleanField(default=False)
     
-    # waiting / in_progress / completed
+    # waiting / in_progress / completed / abandoned (swept without a result)
     status = db.StringField(default='waiting')
     
     questions = db.ListField(db.DictField(), default=list)
@@ -35,20 +41,24 @@ class BattleResult(db.Document):
     created_at = db.DateTimeField(default=datetime.utcnow)
     completed_at = db.DateTimeField()
     
-    def to_dict(self):
-        from ..models.user import User
-        challenger = User.objects(id=self.challenger_id.id).first() if self.challenger_id else None
-        opponent = User.objects(id=self.opponent_id.id).first() if self.opponent_id else None
+    def to_dict(self, users=None):
+        """Serialize; ``users`` ({ObjectId: User}) comes from serialize_battles when batching"""
+        from ..utils.loaders import ref_id, identity_map
+        challenger_id, opponent_id, winner_id = (ref_id(self, f) for f in ('challenger_id', 'opponent_id', 'winner_id'))
+        if users is None:
+            users = identity_map().users([challenger_id, opponent_id])
+        challenger = users.get(challenger_id)
+        opponent = users.get(opponent_id)
         
         return {
             'id': str(self.id),
-            'challenger': {'id': str(self.challenger_id.id), 'name': challenger.name} if challenger else None,
-            'opponent': {'id': str(self.opponent_id.id), 'name': opponent.name} if opponent else {'name': 'AI Opponent'},
+            'challenger': {'id': str(challenger_id), 'name': challenger.name} if challenger else None,
+            'opponent': {'id': str(opponent_id), 'name': opponent.name} if opponent else {'name': 'AI Opponent'},
             'topic': self.topic,
             'challenger_score': self.challenger_score,
             'opponent_score': self.opponent_score,
             'total_questions': self.total_questions,
-            'winner_id': str(self.winner_id.id) if self.winner_id else None,
+            'winner_id': str(winner_id) if winner_id else None,
             'is_draw': self.is_draw,
             'status': self.status,
             'is_ai_opponent': self.is_ai_opponent,
@@ -59,7 +69,12 @@ class BattleResult(db.Document):
 
 class BattleStats(db.Document):
     """Per-user battle statistics and badges"""
-    meta = {'collection': 'battle_stats'}
+    meta = {
+        'collection': 'battle_stats',
+        'indexes': [
+            {'fields': ['-rating']},
+        ]
+    }
     
     user_id = db.ReferenceField('User', required=True, unique=True)
     
@@ -69,6 +84,9 @@ class BattleStats(db.Document):
     draws = db.IntField(default=0)
     
     rating = db.IntField(default=1000)
+    # Glicko-2 state (RATING_ENGINE=glicko2); the Elo engine leaves these alone
+    rating_deviation = db.FloatField(default=350.0)
+    volatility = db.FloatField(default=0.06)
     badges = db.ListField(db.StringField(), default=list)
     
     win_streak = db.IntField(default=0)
@@ -76,20 +94,21 @@ class BattleStats(db.Document):
     
     updated_at = db.DateTimeField(default=datetime.utcnow)
     
+    # (badge, stat field, minimum) - also evaluated inside Mongo by services.battle_stats
+    BADGE_RULES = [
+        ('First Blood', 'wins', 1),
+        ('Warrior', 'wins', 10),
+        ('Champion', 'wins', 25),
+        ('On Fire', 'best_streak', 5),
+        ('Diamond', 'rating', 1500),
+        ('Legend', 'rating', 2000),
+    ]
+    
     def check_badges(self):
         """Award badges based on current stats"""
-        badge_rules = [
-            ('First Blood', self.wins >= 1),
-            ('Warrior', self.wins >= 10),
-            ('Champion', self.wins >= 25),
-            ('On Fire', self.best_streak >= 5),
-            ('Diamond', self.rating >= 1500),
-            ('Legend', self.rating >= 2000),
-        ]
-        
         new_badges = []
-        for badge_name, condition in badge_rules:
-            if condition and badge_name not in (self.badges or []):
+        for badge_name, field, minimum in self.BADGE_RULES:
+            if getattr(self, field) >= minimum and badge_name not in (self.badges or []):
                 self.badges = (self.badges or []) + [badge_name]
                 new_badges.append(badge_name)
         
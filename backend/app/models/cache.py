@@ -1,9 +1,13 @@
 """
 Roadmap Cache Model
 Caches AI-generated roadmaps in MongoDB to avoid repeated API calls.
+
+Entries go stale after ROADMAP_CACHE_SOFT_TTL (served, then regenerated in the
+background) and are only hard-deleted at ``expires_at``.
 """
-from datetime import datetime
+from datetime import datetime, timedelta
 from ..extensions import db
+from ..utils.topics import canonical_topic
 
 
 class RoadmapCache(db.Document):
@@ -12,7 +16,8 @@ class RoadmapCache(db.Document):
         'collection': 'roadmap_cache',
         'indexes': [
             {'fields': ['cache_key'], 'unique': True},
-            {'fields': ['created_at'], 'expireAfterSeconds': 604800}  # Auto-delete after 7 days
+            {'fields': ['expires_at'], 'expireAfterSeconds': 0},  # Hard delete at expires_at
+            {'fields': ['-hit_count']},
         ]
     }
 
@@ -23,11 +28,67 @@ class RoadmapCache(db.Document):
     roadmap_data = db.DictField(required=True)
     hit_count = db.IntField(default=0)
     created_at = db.DateTimeField(default=datetime.utcnow)
+    refreshed_at = db.DateTimeField(default=datetime.utcnow)
+    expires_at = db.DateTimeField()
 
     @staticmethod
     def make_key(topic, mode, experience_level):
-        """Generate a normalized cache key."""
-        return f"{topic.strip().lower()}|{mode}|{experience_level}".replace(" ", "-")
+        """Generate a normalized cache key ("React.js" and "React Developer" share one)."""
+        return f"{canonical_topic(topic)}|{mode}|{experience_level}".replace(" ", "-")
+
+    def is_stale(self, soft_ttl):
+        refreshed = self.refreshed_at or self.created_at
+        return not refreshed or refreshed < datetime.utcnow() - timedelta(seconds=soft_ttl)
+
+    @classmethod
+    def migrate_soft_expiry(cls, hard_ttl):
+        """One-time upgrade from the old 7-day TTL on created_at.
+
+        Drops that index (otherwise Mongo keeps hard-deleting at 7 days) and
+        backfills refreshed_at/expires_at on entries written before them.
+        Safe to call on every start.
+        """
+        collection = cls._get_collection()
+        for name, info in collection.index_information().items():
+            if info.get('key') == [('created_at', 1)] and 'expireAfterSeconds' in info:
+                collection.drop_index(name)
+        collection.update_many(
+            {'expires_at': {'$exists': False}},
+            [{'$set': {
+                'refreshed_at': {'$ifNull': ['$refreshed_at', '$created_at']},
+                'expires_at': {'$add': [{'$ifNull': ['$created_at', '$$NOW']}, hard_ttl * 1000]},
+            }}]
+        )
+
+    @classmethod
+    def migrate_canonical_keys(cls):
+        """Re-key entries written before make_key() canonicalized topics.
+
+        Entries that now share a key are merged: the most recently refreshed
+        roadmap is kept and their hit counts are summed, so the prewarm
+        ranking keeps their history. Safe to call on every start; returns the
+        number of entries re-keyed or merged away.
+        """
+        collection = cls._get_collection()
+        groups = {}
+        for doc in collection.find({}, {'cache_key': 1, 'topic': 1, 'mode': 1, 'experience_level': 1,
+                                         'hit_count': 1, 'refreshed_at': 1, 'created_at': 1}):
+            key = cls.make_key(doc.get('topic') or '', doc.get('mode'), doc.get('experience_level'))
+            groups.setdefault(key, []).append(doc)
+
+        moved = 0
+        for key, docs in groups.items():
+            if len(docs) == 1 and docs[0]['cache_key'] == key:
+                continue
+            keep = max(docs, key=lambda d: d.get('refreshed_at') or d.get('created_at') or datetime.min)
+            # Delete the rest first: one of them may already hold the canonical key
+            collection.delete_many({'_id': {'$in': [d['_id'] for d in docs if d is not keep]}})
+            collection.update_one({'_id': keep['_id']}, {'$set': {
+                'cache_key': key,
+                'hit_count': sum(d.get('hit_count') or 0 for d in docs),
+            }})
+            moved += len(docs) - (keep['cache_key'] == key)
+        return moved
 
     def __repr__(self):
         return f'<RoadmapCache {self.cache_key}>'
@@ -0,0 +1,42 @@
+"""
+Battle Question Bank Model
+Pre-generated battle MCQs, one document per question, pooled by canonical
+topic so "React.js" and "React Developer" battles draw from the same pool.
+"""
+import hashlib
+import re
+from datetime import datetime
+from ..extensions import db
+from ..utils.topics import canonical_topic
+
+
+class BankQuestion(db.Document):
+    """A single multiple-choice battle question."""
+    meta = {
+        'collection': 'question_bank',
+        'indexes': [
+            {'fields': ['topic_key', 'fingerprint'], 'unique': True},
+            {'fields': ['topic_key', '-created_at']},
+        ]
+    }
+
+    topic_key = db.StringField(required=True)
+    topic = db.StringField(required=True)    # as first requested, for display / prompts
+    question = db.StringField(required=True)
+    options = db.ListField(db.StringField(), required=True)
+    correct = db.IntField(required=True)
+    fingerprint = db.StringField(required=True)
+    created_at = db.DateTimeField(default=datetime.utcnow)
+
+    @staticmethod
+    def make_topic_key(topic):
+        return canonical_topic(topic)
+
+    @staticmethod
+    def make_fingerprint(question):
+        """Same question modulo case, punctuation and spacing -> same fingerprint."""
+        text = re.sub(r'[^a-z0-9]+', ' ', (question or '').lower()).strip()
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def __repr__(self):
+        return f'<BankQuestion {self.topic_key}: {self.question[:40]}>'
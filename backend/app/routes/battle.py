@@ -12,14 +12,25 @@ from mongoengine import Q as meQ
 from ..models.battle import BattleResult, BattleStats
 from ..models.user import User
 from ..models.progress import UserProgress
+from ..services.battle_store import battle_store
+from ..services.answer_log import answer_log
+from ..services.presence import presence, user_room, LOBBY_ROOM
+from ..services.matchmaking import matchmaker
+from ..services.battle_timers import battle_timers
+from ..services.battle_stats import load_stats, apply_results, rating_state, rating_fields
+from ..services.rating_engine import get_engine
+from ..services.leaderboard import leaderboard, board_name, weekly_kept, WEEKLY_KEEP
+from ..services.rating_index import rating_index
+from ..utils.loaders import ref_id, identity_map, serialize_battles
+from ..utils.battle_protocol import encode, start_payload, answer_payload, progress_payload, scoreboard_payload, describe
 from bson import ObjectId
 from bson.errors import InvalidId
 
 battle_bp = Blueprint('battle', __name__)
 
-# In-memory battle rooms for real-time tracking
-active_rooms = {}   # battle_id -> {challenger_sid, opponent_sid, ...}
-user_sid_map = {}   # user_id -> sid
+# Live battle rooms (battle_id -> {challenger_uid, opponent_uid, scores, ...}) and
+# user_id <-> sid presence live in battle_store, shared across workers when
+# BATTLE_STORE_URL points at Redis.
 
 
 def safe_object_id(id_str):
@@ -31,6 +42,11 @@ def safe_object_id(id_str):
         return None
 
 
+def emit_battle(event, payload, to):
+    """Emit a compact battle event, MessagePack-encoded when BATTLE_MSGPACK is on"""
+    socketio.emit(event, encode(payload, current_app.config.get('BATTLE_MSGPACK', False)), to=to, namespace='/')
+
+
 def get_or_create_stats(user_id):
     """Get or create BattleStats for a user"""
     stats = BattleStats.objects(user_id=safe_object_id(user_id)).first()
@@ -40,104 +56,21 @@ def get_or_create_stats(user_id):
     return stats
 
 
-def generate_battle_questions(topic):
-    """Generate 10 rapid-fire MCQs for a battle topic via AI"""
-    from ..services.ai_service import AIService
-    ai = AIService()
-
-    prompt = f"""Generate exactly 10 multiple-choice quiz questions SPECIFICALLY about "{topic}" for a rapid-fire skill battle.
-
-Return ONLY valid JSON in this exact format:
-{{
-  "questions": [
-    {{
-      "id": 1,
-      "question": "What is ...?",
-      "options": ["Option A", "Option B", "Option C", "Option D"],
-      "correct": 0
-    }}
-  ]
-}}
-
-Rules:
-- "correct" is the 0-based index of the right answer
-- Questions should range from easy to hard
-- Keep questions concise (rapid-fire style)
-- CRITICAL: ALL questions MUST be specifically about {topic}. Do NOT generate generic programming or computer science questions unless the topic IS programming/computer science.
-- For example, if the topic is "AutoCAD", ask about AutoCAD commands, tools, workflows, file formats, etc.
-- If the topic is "SolidWorks", ask about sketching, assemblies, simulations, etc.
-- Cover different aspects and features of {topic}
-- Exactly 4 options per question
-- Exactly 10 questions
-- IMPORTANT: Randomize the position of the correct answer across questions. Do NOT always put the correct answer at the same index."""
-
-    content = ai.call_nvidia_api(prompt)
-    if content:
-        data = ai.parse_json_response(content)
-        if data and 'questions' in data:
-            questions = data['questions'][:10]
-            # Ensure each question has required fields and shuffle options
-            for i, q in enumerate(questions):
-                q['id'] = i + 1
-                if 'correct' not in q:
-                    q['correct'] = 0
-                if len(q.get('options', [])) != 4:
-                    q['options'] = q.get('options', ['A', 'B', 'C', 'D'])[:4]
-                # Shuffle options so correct answer position is random
-                correct_idx = q['correct']
-                if 0 <= correct_idx < len(q['options']):
-                    correct_answer = q['options'][correct_idx]
-                    shuffled = list(q['options'])
-                    random.shuffle(shuffled)
-                    q['options'] = shuffled
-                    q['correct'] = shuffled.index(correct_answer)
-            return questions
+def generate_battle_questions(topic, user_ids=(), wait=True):
+    """10 rapid-fire MCQs for a battle topic, drawn from the question bank.
 
-    # Fallback: generate topic-aware questions
-    return generate_fallback_questions(topic)
+    Only a topic the bank has never seen waits on the AI; if that fails too,
+    topic-aware fallback questions are used. With ``wait=False`` nothing
+    waits on the AI and that topic returns None instead.
+    """
+    from ..services.question_bank import question_bank, generate_fallback_questions
 
+    questions = question_bank.draw(topic, [uid for uid in user_ids if uid], wait=wait)
+    if questions or not wait:
+        return questions
 
-def generate_fallback_questions(topic):
-    """Fallback questions - dynamically generated to be relevant to the topic"""
-    templates = [
-        {"question": f"Which of the following is a key feature of {topic}?",
-         "options": [f"Core functionality of {topic}", "Unrelated feature", "Not applicable", "None of these"], "correct": 0},
-        {"question": f"What is {topic} primarily used for?",
-         "options": ["Entertainment only", f"Professional work in its domain", "Social media", "Gaming"], "correct": 1},
-        {"question": f"Who would typically use {topic} in their work?",
-         "options": ["Chefs", f"Professionals in the {topic} field", "Athletes", "Musicians"], "correct": 1},
-        {"question": f"What is the first step to learning {topic}?",
-         "options": ["Skip basics", "Memorize everything", f"Understand {topic} fundamentals", "Ignore documentation"], "correct": 2},
-        {"question": f"Which skill is most helpful when working with {topic}?",
-         "options": ["Cooking", f"Understanding {topic} concepts", "Singing", "Dancing"], "correct": 1},
-        {"question": f"What makes {topic} valuable in industry?",
-         "options": ["It's free", "It's old", f"It solves real-world problems", "It's simple"], "correct": 2},
-        {"question": f"How can you improve your {topic} skills?",
-         "options": [f"Practice with {topic} projects", "Only watch videos", "Avoid practicing", "Read unrelated books"], "correct": 0},
-        {"question": f"What type of professional certification exists for {topic}?",
-         "options": ["Cooking certificate", f"{topic} professional certification", "Driving license", "Sports medal"], "correct": 1},
-        {"question": f"Which is a reliable place to learn {topic}?",
-         "options": [f"Official {topic} documentation/courses", "Random social media", "Unverified blogs only", "None of these"], "correct": 0},
-        {"question": f"What is a common beginner mistake when learning {topic}?",
-         "options": ["Practicing too much", f"Skipping {topic} fundamentals", "Reading documentation", "Asking questions"], "correct": 1},
-    ]
-    for i, q in enumerate(templates):
-        q['id'] = i + 1
-    return templates
-
-
-def calculate_rating_change(winner_rating, loser_rating, is_draw=False):
-    """ELO-like rating calculation"""
-    k = 32
-    expected = 1 / (1 + 10 ** ((loser_rating - winner_rating) / 400))
-
-    if is_draw:
-        change = round(k * (0.5 - expected))
-        return change, -change
-    else:
-        win_change = round(k * (1 - expected))
-        loss_change = round(k * (0 - (1 - expected)))
-        return max(win_change, 1), min(loss_change, -1)
+    # Fallback: generate topic-aware questions
+    return generate_fallback_questions(topic)
 
 
 def finalize_battle(battle, challenger_score, opponent_score):
@@ -157,75 +90,38 @@ def finalize_battle(battle, challenger_score, opponent_score):
     except Exception:
         pass
 
-    c_stats = get_or_create_stats(str(battle.challenger_id.id))
-    c_stats.total_battles += 1
-
-    new_badges_challenger = []
-    new_badges_opponent = []
+    # One read of both players' stats, then one atomic bulk write
+    challenger_uid = str(ref_id(battle, 'challenger_id'))
+    opponent_uid = None if battle.is_ai_opponent else str(ref_id(battle, 'opponent_id'))
+    stats = load_stats([uid for uid in (challenger_uid, opponent_uid) if uid])
+    c_stats = stats[challenger_uid]
+
+    engine = get_engine(current_app.config)
+    score = 1 if challenger_score > opponent_score else (0 if challenger_score < opponent_score else 0.5)
+    if score == 1:
+        battle.winner_id = battle.challenger_id
+    elif score == 0 and not battle.is_ai_opponent:
+        battle.winner_id = battle.opponent_id
+    elif score == 0.5:
+        battle.is_draw = True
 
     if battle.is_ai_opponent:
-        # Solo vs AI
-        if challenger_score > opponent_score:
-            battle.winner_id = battle.challenger_id
-            c_stats.wins += 1
-            c_stats.win_streak += 1
-            if c_stats.win_streak > c_stats.best_streak:
-                c_stats.best_streak = c_stats.win_streak
-            c_stats.rating += 15
-        elif challenger_score < opponent_score:
-            c_stats.losses += 1
-            c_stats.win_streak = 0
-            c_stats.rating = max(c_stats.rating - 10, 100)
-        else:
-            battle.is_draw = True
-            c_stats.draws += 1
-
-        new_badges_challenger = c_stats.check_badges()
-        c_stats.updated_at = datetime.utcnow()
-        c_stats.save()
+        before = {challenger_uid: rating_state(c_stats)}
+        after = {challenger_uid: engine.rate_solo(before[challenger_uid], score)}
     else:
-        # Real opponent
-        o_stats = get_or_create_stats(str(battle.opponent_id.id))
-        o_stats.total_battles += 1
-
-        if challenger_score > opponent_score:
-            battle.winner_id = battle.challenger_id
-            win_delta, loss_delta = calculate_rating_change(c_stats.rating, o_stats.rating)
-            c_stats.wins += 1
-            c_stats.win_streak += 1
-            if c_stats.win_streak > c_stats.best_streak:
-                c_stats.best_streak = c_stats.win_streak
-            c_stats.rating += win_delta
-            o_stats.losses += 1
-            o_stats.win_streak = 0
-            o_stats.rating = max(o_stats.rating + loss_delta, 100)
-
-        elif opponent_score > challenger_score:
-            battle.winner_id = battle.opponent_id
-            win_delta, loss_delta = calculate_rating_change(o_stats.rating, c_stats.rating)
-            o_stats.wins += 1
-            o_stats.win_streak += 1
-            if o_stats.win_streak > o_stats.best_streak:
-                o_stats.best_streak = o_stats.win_streak
-            o_stats.rating += win_delta
-            c_stats.losses += 1
-            c_stats.win_streak = 0
-            c_stats.rating = max(c_stats.rating + loss_delta, 100)
+        before = {uid: rating_state(stats[uid]) for uid in (challenger_uid, opponent_uid)}
+        new_c, new_o = engine.rate_battle(before[challenger_uid], before[opponent_uid], score)
+        after = {challenger_uid: new_c, opponent_uid: new_o}
 
-        else:
-            battle.is_draw = True
-            draw_delta_c, draw_delta_o = calculate_rating_change(c_stats.rating, o_stats.rating, is_draw=True)
-            c_stats.draws += 1
-            o_stats.draws += 1
-            c_stats.rating += draw_delta_c
-            o_stats.rating = max(o_stats.rating + draw_delta_o, 100)
-
-        new_badges_challenger = c_stats.check_badges()
-        new_badges_opponent = o_stats.check_badges()
-        c_stats.updated_at = datetime.utcnow()
-        o_stats.updated_at = datetime.utcnow()
-        c_stats.save()
-        o_stats.save()
+    outcomes = {1: ('win', 'loss'), 0: ('loss', 'win'), 0.5: ('draw', 'draw')}[score]
+    results = {}
+    for uid, outcome in zip((challenger_uid, opponent_uid), outcomes):
+        if uid in after:
+            delta = round(after[uid]['rating']) - stats[uid].rating
+            results[uid] = (outcome, delta, rating_fields(before[uid], after[uid]))
+
+    new_badges = apply_results(stats, results)   # stats now holds the stored documents
+    c_stats = stats[challenger_uid]
 
     # Update user activity
     progress = UserProgress.objects(user_id=battle.challenger_id).first()
@@ -234,40 +130,79 @@ def finalize_battle(battle, challenger_score, opponent_score):
         progress.add_activity('battle', f'Battle {result_text}: {battle.topic} ({challenger_score}/{battle.total_questions})')
 
     battle.save()
+    battle_data = battle.to_dict()
+
+    try:
+        leaderboard.record_battle(current_app._get_current_object(), battle_data, stats)
+    except Exception as e:
+        current_app.logger.error(f"[LEADERBOARD] Recording battle {battle.id} failed: {e}")
 
     return {
-        'battle': battle.to_dict(),
-        'challenger_new_badges': new_badges_challenger,
-        'opponent_new_badges': new_badges_opponent,
+        'battle': battle_data,
+        'challenger_new_badges': new_badges[challenger_uid],
+        'opponent_new_badges': new_badges.get(opponent_uid, []),
         'challenger_rating': c_stats.rating,
-        'opponent_rating': get_or_create_stats(str(battle.opponent_id.id)).rating if not battle.is_ai_opponent else None
+        'opponent_rating': stats[opponent_uid].rating if opponent_uid else None
     }
 
 
 # ============ REST Endpoints ============
 
+BOARD_ERROR = 'board must be global, weekly, or topic (with a topic)'
+WEEK_ERROR = (f'week must be YYYY-Www within the last {WEEKLY_KEEP // (7 * 86400)} weeks '
+              f'(older weekly boards are not kept)')
+
+
+def leaderboard_board():
+    """(board, error) named by the query string (?board=global|weekly|topic&topic=&week=YYYY-Www)"""
+    week = request.args.get('week')
+    if week and request.args.get('board') == 'weekly' and not weekly_kept(week):
+        return None, WEEK_ERROR
+    board = board_name(request.args.get('board', 'global'), topic=request.args.get('topic'), week=week)
+    return board, None if board else BOARD_ERROR
+
+
 @battle_bp.route('/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Global leaderboard sorted by rating"""
-    top_stats = BattleStats.objects.order_by('-rating').limit(20)
-
-    leaderboard = []
-    for i, stats in enumerate(top_stats):
-        user = User.objects(id=stats.user_id.id).first()
-        if user:
-            leaderboard.append({
-                'rank': i + 1,
-                'name': user.name,
-                'user_id': str(user.id),
-                'rating': stats.rating,
-                'wins': stats.wins,
-                'losses': stats.losses,
-                'total_battles': stats.total_battles,
-                'badges': stats.badges or [],
-                'win_rate': round((stats.wins / stats.total_battles * 100), 1) if stats.total_battles > 0 else 0
-            })
-
-    return jsonify({'leaderboard': leaderboard}), 200
+    """Leaderboard page: global by rating, or wins per topic / per week"""
+    board, error = leaderboard_board()
+    if error:
+        return jsonify({'error': error}), 400
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    rows, total = leaderboard.page(current_app._get_current_object(), board, page, per_page)
+    return jsonify({'leaderboard': rows, 'board': board, 'page': page, 'per_page': per_page, 'total': total}), 200
+
+
+@battle_bp.route('/leaderboard/me', methods=['GET'])
+@jwt_required()
+def get_my_rank():
+    """Current user's position on a leaderboard (rank is null when not on it)"""
+    board, error = leaderboard_board()
+    if error:
+        return jsonify({'error': error}), 400
+    row = leaderboard.rank_of(current_app._get_current_object(), board, get_jwt_identity())
+    return jsonify({'board': board, 'rank': row['rank'] if row else None, 'entry': row}), 200
+
+
+@battle_bp.route('/rank/<user_id>', methods=['GET'])
+def get_rank(user_id):
+    """A player's global rank and percentile by rating"""
+    standing = rating_index.standing(current_app._get_current_object(), user_id)
+    if not standing:
+        return jsonify({'error': 'No battle stats for this user'}), 404
+    return jsonify(standing), 200
+
+
+@battle_bp.route('/rank/<user_id>/around', methods=['GET'])
+def get_rank_around(user_id):
+    """Players just above and below someone in the global rating order"""
+    count = min(max(request.args.get('count', 10, type=int), 1), 50)
+    around = rating_index.around(current_app._get_current_object(), user_id, count)
+    if not around:
+        return jsonify({'error': 'No battle stats for this user'}), 404
+    return jsonify(around), 200
 
 
 @battle_bp.route('/stats', methods=['GET'])
@@ -293,9 +228,9 @@ def get_battle_history():
     battles = BattleResult.objects(
         db.Q(challenger_id=oid) | db.Q(opponent_id=oid),
         status='completed'
-    ).order_by('-created_at').limit(20)
+    ).exclude('questions', 'challenger_answers', 'opponent_answers').order_by('-created_at').limit(20)
 
-    return jsonify({'battles': [b.to_dict() for b in battles]}), 200
+    return jsonify({'battles': serialize_battles(battles)}), 200
 
 
 @battle_bp.route('/active', methods=['GET'])
@@ -305,22 +240,39 @@ def get_active_battles():
     user_id = get_jwt_identity()
     oid = safe_object_id(user_id)
 
-    waiting = BattleResult.objects(status='waiting', challenger_id__ne=oid).order_by('-created_at').limit(10)
+    waiting = list(BattleResult.objects(status='waiting', challenger_id__ne=oid)
+                   .only('topic', 'challenger_id', 'created_at').order_by('-created_at').limit(10))
+
+    # One query for the challengers and one for their stats; players without stats show the default rating
+    challenger_ids = [ref_id(b, 'challenger_id') for b in waiting]
+    users = identity_map().users(challenger_ids)
+    stats = identity_map().stats(challenger_ids)
 
     result = []
-    for b in waiting:
-        challenger = User.objects(id=b.challenger_id.id).first()
-        c_stats = get_or_create_stats(str(b.challenger_id.id))
+    for b, cid in zip(waiting, challenger_ids):
+        challenger = users.get(cid)
+        c_stats = stats.get(cid)
         result.append({
             'id': str(b.id),
             'topic': b.topic,
-            'challenger': {'name': challenger.name if challenger else '?', 'rating': c_stats.rating},
+            'challenger': {'name': challenger.name if challenger else '?',
+                           'rating': c_stats.rating if c_stats else BattleStats.rating.default},
             'created_at': b.created_at.isoformat()
         })
 
     return jsonify({'battles': result}), 200
 
 
+@battle_bp.route('/protocol', methods=['GET'])
+def get_protocol():
+    """Describe the live battle event protocol (version, encoding, event layouts)"""
+    cfg = current_app.config
+    return jsonify(describe(binary=cfg.get('BATTLE_MSGPACK', False),
+                            question_seconds=cfg.get('BATTLE_QUESTION_SECONDS', 15),
+                            progress_hz=cfg.get('BATTLE_PROGRESS_HZ', 4),
+                            spectator_hz=cfg.get('BATTLE_SPECTATOR_HZ', 2))), 200
+
+
 # ============ Socket.IO Events ============
 
 @socketio.on('connect')
@@ -333,35 +285,36 @@ def handle_disconnect():
     sid = request.sid
     current_app.logger.info(f'Socket disconnected: {sid}')
 
-    # Find which user disconnected
-    disc_user = None
-    for uid, s in list(user_sid_map.items()):
-        if s == sid:
-            disc_user = uid
-            del user_sid_map[uid]
-            break
+    # O(1): sid -> user, then user -> live battle. A user with another tab
+    # still open is not offline and keeps their battle.
+    disc_user = battle_store.drop_sid(sid)
+    if not disc_user:
+        return
+    matchmaker.leave(disc_user)
 
-    # Broadcast offline status to all connected clients
-    if disc_user:
-        socketio.emit('user_offline', {'user_id': disc_user}, namespace='/')
+    # Friends hear about it once the coalescing window passes
+    presence.changed(current_app._get_current_object(), disc_user)
 
     # Notify opponent if mid-battle
-    if disc_user:
-        for battle_id, room in list(active_rooms.items()):
-            if room.get('challenger_uid') == disc_user or room.get('opponent_uid') == disc_user:
-                emit('opponent_disconnected', {'message': 'Opponent left the battle'}, room=battle_id)
-                # Auto-complete the battle
-                try:
-                    battle = BattleResult.objects(id=safe_object_id(battle_id)).first()
-                    if battle and battle.status == 'in_progress':
-                        c_score = room.get('challenger_score', 0)
-                        o_score = room.get('opponent_score', 0)
-                        finalize_battle(battle, c_score, o_score)
-                except Exception:
-                    pass
-                if battle_id in active_rooms:
-                    del active_rooms[battle_id]
-                break
+    battle_id = battle_store.get_battle(disc_user)
+    room = battle_store.get_room(battle_id) if battle_id else None
+    if not room:
+        return
+    emit('opponent_disconnected', {'message': 'Opponent left the battle'}, room=battle_id)
+    if not battle_store.claim_completion(battle_id):
+        return  # the last answer is already finalizing it
+    # Auto-complete the battle
+    try:
+        stop_battle_clock(battle_id)
+        answer_log.flush(current_app._get_current_object(), battle_id)
+        battle = BattleResult.objects(id=safe_object_id(battle_id)).first()
+        if battle and battle.status == 'in_progress':
+            c_score = room.get('challenger_score', 0)
+            o_score = room.get('opponent_score', 0)
+            finalize_battle(battle, c_score, o_score)
+    except Exception:
+        pass
+    battle_store.delete_room(battle_id)
 
 
 @socketio.on('register_user')
@@ -369,14 +322,24 @@ def handle_register(data):
     """Map user_id to socket sid for real-time communication"""
     user_id = data.get('user_id')
     if user_id:
-        user_sid_map[user_id] = request.sid
+        came_online = battle_store.set_sid(user_id, request.sid)
+        presence.ensure_heartbeat(current_app._get_current_object())
+        join_room(user_room(user_id))
         current_app.logger.info(f'User {user_id} registered with sid {request.sid}')
-        # Broadcast online status to all connected clients
-        user = User.objects(id=safe_object_id(user_id)).first()
-        socketio.emit('user_online', {
-            'user_id': user_id,
-            'name': user.name if user else 'Unknown'
-        }, namespace='/')
+        # Tell online friends only (reconnects and extra tabs are not news)
+        if came_online:
+            presence.changed(current_app._get_current_object(), user_id)
+
+
+@socketio.on('join_lobby')
+def handle_join_lobby(data=None):
+    """Subscribe this socket to lobby events (new_battle_available)"""
+    join_room(LOBBY_ROOM)
+
+
+@socketio.on('leave_lobby')
+def handle_leave_lobby(data=None):
+    leave_room(LOBBY_ROOM)
 
 
 @socketio.on('create_battle')
@@ -403,15 +366,46 @@ def handle_create_battle(data):
         return
 
     sid = request.sid
-    user_sid_map[user_id] = sid
+    battle_store.set_sid(user_id, sid)
     current_app.logger.info(f'Creating battle for user {user_id}, topic: {topic}')
 
     # Emit a "generating" status so the client knows we're working
     emit('battle_generating', {'message': 'Generating questions...', 'topic': topic})
 
-    # Generate questions (this can take 10-20s for AI)
-    questions = generate_battle_questions(topic)
-
+    # Sample from the question bank; a brand-new topic is generated in the
+    # background and battle_created follows when it is ready
+    app = current_app._get_current_object()
+    questions = generate_battle_questions(topic, [user_id], wait=False)
+    if questions is None:
+        if not battle_store.try_lock(f'create_battle:{user_id}', 120):
+            emit('error', {'message': 'Your battle is still being prepared. Please wait.'})
+            return
+        socketio.start_background_task(open_cold_battle, app, user_id, topic)
+        return
+    open_battle(app, user_id, sid, topic, questions)
+
+
+def open_cold_battle(app, user_id, topic):
+    """create_battle for a topic the question bank has never seen, off the handler"""
+    with app.app_context():
+        try:
+            questions = generate_battle_questions(topic, [user_id])
+            # The client may have reconnected (or left) while the questions were generated
+            sid = battle_store.get_sid(user_id)
+            if not sid:
+                app.logger.info(f'User {user_id} left before their battle on {topic!r} was ready')
+                return
+            open_battle(app, user_id, sid, topic, questions)
+        except Exception as e:
+            app.logger.error(f'Creating battle on {topic!r} for {user_id} failed: {e}')
+            socketio.emit('error', {'message': 'Could not create the battle. Please try again.'},
+                          to=user_room(user_id), namespace='/')
+        finally:
+            battle_store.release_lock(f'create_battle:{user_id}')
+
+
+def open_battle(app, user_id, sid, topic, questions):
+    """Save a waiting battle, open its room and announce it to the lobby"""
     # Create battle record
     battle = BattleResult(
         challenger_id=safe_object_id(user_id),
@@ -426,15 +420,15 @@ def handle_create_battle(data):
 
     # Join the socket room (wrapped in try/except for stale SID)
     try:
-        join_room(battle_id)
+        join_room(battle_id, sid=sid, namespace='/')
     except (ValueError, Exception) as e:
-        current_app.logger.warning(f'join_room failed (client may have reconnected): {e}')
+        app.logger.warning(f'join_room failed (client may have reconnected): {e}')
         # Client may have reconnected with a new SID
-        new_sid = user_sid_map.get(user_id)
+        new_sid = battle_store.get_sid(user_id)
         if new_sid and new_sid != sid:
             sid = new_sid
 
-    active_rooms[battle_id] = {
+    battle_store.put_room(battle_id, {
         'challenger_uid': user_id,
         'challenger_sid': sid,
         'opponent_uid': None,
@@ -445,26 +439,18 @@ def handle_create_battle(data):
         'opponent_answered': 0,
         'questions': questions,
         'total': len(questions)
-    }
-
-    # Send safe questions (without correct answers) for display
-    safe_questions = []
-    for q in questions:
-        safe_questions.append({
-            'id': q['id'],
-            'question': q['question'],
-            'options': q['options']
-        })
+    })
+    arm_waiting_deadline(app, battle_id)
 
-    emit('battle_created', {
+    # Questions go out once, in battle_start
+    socketio.emit('battle_created', {
         'battle_id': battle_id,
         'topic': topic,
-        'questions': safe_questions,
         'total_questions': len(questions),
         'status': 'waiting'
-    })
+    }, to=sid, namespace='/')
 
-    # Broadcast to ALL users so their active battles list updates in real-time
+    # Only clients currently looking at the lobby get the new battle
     challenger_user = User.objects(id=safe_object_id(user_id)).first()
     socketio.emit('new_battle_available', {
         'id': battle_id,
@@ -473,7 +459,7 @@ def handle_create_battle(data):
             'name': challenger_user.name if challenger_user else 'Unknown',
             'id': user_id
         }
-    }, namespace='/')
+    }, to=LOBBY_ROOM, namespace='/')
 
 
 @socketio.on('join_battle')
@@ -486,7 +472,7 @@ def handle_join_battle(data):
         emit('error', {'message': 'user_id and battle_id required'})
         return
 
-    user_sid_map[user_id] = request.sid
+    battle_store.set_sid(user_id, request.sid)
 
     battle = BattleResult.objects(id=safe_object_id(battle_id)).first()
     if not battle or battle.status != 'waiting':
@@ -506,11 +492,10 @@ def handle_join_battle(data):
     join_room(battle_id)
 
     # Update active room
-    if battle_id in active_rooms:
-        active_rooms[battle_id]['opponent_uid'] = user_id
-        active_rooms[battle_id]['opponent_sid'] = request.sid
+    if battle_store.get_room(battle_id) is not None:
+        battle_store.update_room(battle_id, opponent_uid=user_id, opponent_sid=request.sid)
     else:
-        active_rooms[battle_id] = {
+        battle_store.put_room(battle_id, {
             'challenger_uid': str(battle.challenger_id.id),
             'opponent_uid': user_id,
             'opponent_sid': request.sid,
@@ -520,10 +505,7 @@ def handle_join_battle(data):
             'opponent_answered': 0,
             'questions': battle.questions,
             'total': battle.total_questions
-        }
-
-    # Safe questions
-    safe_questions = [{'id': q['id'], 'question': q['question'], 'options': q['options']} for q in battle.questions]
+        })
 
     # Get user names
     challenger = User.objects(id=battle.challenger_id.id).first()
@@ -532,36 +514,26 @@ def handle_join_battle(data):
     challenger_uid = str(battle.challenger_id.id)
 
     # Get the CURRENT SID for the challenger (may have reconnected)
-    challenger_sid = user_sid_map.get(challenger_uid)
+    challenger_sid = battle_store.get_sid(challenger_uid)
     opponent_sid = request.sid
 
     # Update the active room with current SIDs
-    if battle_id in active_rooms:
-        active_rooms[battle_id]['challenger_sid'] = challenger_sid
-        active_rooms[battle_id]['opponent_sid'] = opponent_sid
+    battle_store.update_room(battle_id, challenger_sid=challenger_sid, opponent_sid=opponent_sid)
 
     current_app.logger.info(f'Battle {battle_id}: challenger_sid={challenger_sid}, opponent_sid={opponent_sid}')
+    start_battle_clock(current_app._get_current_object(), battle_id, battle.total_questions)
+    question_seconds = current_app.config.get('BATTLE_QUESTION_SECONDS', 15)
 
     # Notify challenger directly via their current SID
     if challenger_sid:
-        socketio.emit('battle_start', {
-            'battle_id': battle_id,
-            'topic': battle.topic,
-            'questions': safe_questions,
-            'total_questions': battle.total_questions,
-            'opponent': {'name': opponent.name if opponent else '?'},
-            'role': 'challenger'
-        }, to=challenger_sid, namespace='/')
+        emit_battle('battle_start', start_payload(
+            battle_id, battle.topic, battle.questions, 'challenger',
+            {'name': opponent.name if opponent else '?'}, question_seconds), to=challenger_sid)
 
     # Notify opponent (the joiner)
-    emit('battle_start', {
-        'battle_id': battle_id,
-        'topic': battle.topic,
-        'questions': safe_questions,
-        'total_questions': battle.total_questions,
-        'opponent': {'name': challenger.name if challenger else '?'},
-        'role': 'opponent'
-    })
+    emit_battle('battle_start', start_payload(
+        battle_id, battle.topic, battle.questions, 'opponent',
+        {'name': challenger.name if challenger else '?'}, question_seconds), to=request.sid)
 
 
 @socketio.on('start_solo')
@@ -581,105 +553,380 @@ def handle_start_solo(data):
     battle.status = 'in_progress'
     battle.save()
 
-    if battle_id in active_rooms:
-        active_rooms[battle_id]['is_solo'] = True
+    battle_store.update_room(battle_id, is_solo=True)
+    start_battle_clock(current_app._get_current_object(), battle_id, battle.total_questions, is_solo=True)
 
-    safe_questions = [{'id': q['id'], 'question': q['question'], 'options': q['options']} for q in battle.questions]
-
-    emit('battle_start', {
-        'battle_id': battle_id,
-        'topic': battle.topic,
-        'questions': safe_questions,
-        'total_questions': battle.total_questions,
-        'opponent': {'name': 'AI Opponent'},
-        'role': 'challenger',
-        'is_solo': True
-    })
+    emit_battle('battle_start', start_payload(
+        battle_id, battle.topic, battle.questions, 'challenger', {'name': 'AI Opponent'},
+        current_app.config.get('BATTLE_QUESTION_SECONDS', 15), solo=True), to=request.sid)
 
 
-@socketio.on('submit_answer')
-def handle_submit_answer(data):
-    """Handle a player's answer submission"""
-    battle_id = data.get('battle_id')
+@socketio.on('join_queue')
+def handle_join_queue(data):
+    """Queue for an opponent of similar rating; the battle starts when one is found"""
     user_id = data.get('user_id')
-    question_id = data.get('question_id')
-    answer_idx = data.get('answer')
+    topic = (data.get('topic') or 'General Programming').strip()
 
-    if not battle_id or battle_id not in active_rooms:
+    if not user_id:
+        emit('error', {'message': 'User ID required'})
+        return
+    active = battle_store.get_battle(user_id)   # None if the room has expired
+    if active and not BattleResult.objects(id=safe_object_id(active),
+                                           status__in=['waiting', 'in_progress']).only('id').first():
+        # The room outlived its battle (finished or cleaned up elsewhere)
+        battle_store.clear_battle(active, [user_id])
+        active = None
+    if active:
+        emit('error', {'message': 'You already have an active battle.'})
         return
 
-    room = active_rooms[battle_id]
-    questions = room['questions']
+    battle_store.set_sid(user_id, request.sid)
+    app = current_app._get_current_object()
+    matchmaker.ensure_started(app, start_matched_battle)
+
+    rating = get_or_create_stats(user_id).rating
+    emit('queue_joined', {'topic': topic, 'rating': rating})
+    matchmaker.join(app, user_id, topic, rating)
+
+
+@socketio.on('leave_queue')
+def handle_leave_queue(data):
+    user_id = data.get('user_id')
+    if user_id and matchmaker.leave(user_id):
+        emit('queue_left', {})
+
+
+def start_matched_battle(app, first, second):
+    """Matchmaker callback: create and start a battle for two queued players"""
+    challenger_uid, opponent_uid = first['user_id'], second['user_id']
+    topic = first['topic']
+    questions = generate_battle_questions(topic, [challenger_uid, opponent_uid])
+
+    battle = BattleResult(
+        challenger_id=safe_object_id(challenger_uid),
+        opponent_id=safe_object_id(opponent_uid),
+        topic=topic,
+        questions=questions,
+        status='in_progress',
+        total_questions=len(questions)
+    )
+    battle.save()
+    battle_id = str(battle.id)
+
+    challenger_sid = battle_store.get_sid(challenger_uid)
+    opponent_sid = battle_store.get_sid(opponent_uid)
+    battle_store.put_room(battle_id, {
+        'challenger_uid': challenger_uid,
+        'challenger_sid': challenger_sid,
+        'opponent_uid': opponent_uid,
+        'opponent_sid': opponent_sid,
+        'challenger_score': 0,
+        'opponent_score': 0,
+        'challenger_answered': 0,
+        'opponent_answered': 0,
+        'questions': questions,
+        'total': len(questions)
+    })
+    for sid in (challenger_sid, opponent_sid):
+        if sid:
+            try:
+                join_room(battle_id, sid=sid, namespace='/')
+            except Exception:
+                pass  # socket is on another worker; results are sent per sid anyway
 
-    # Find the question
-    question = None
-    for q in questions:
-        if q['id'] == question_id:
-            question = q
-            break
+    start_battle_clock(app, battle_id, len(questions))
 
-    if not question:
+    names = {str(u.id): u.name for u in User.objects(id__in=[battle.challenger_id, battle.opponent_id]).only('name')}
+    app.logger.info(f"[MATCH] {challenger_uid} ({first['rating']}) vs {opponent_uid} ({second['rating']}) on '{topic}': {battle_id}")
+
+    for sid, role, other, other_rating in ((challenger_sid, 'challenger', opponent_uid, second['rating']),
+                                           (opponent_sid, 'opponent', challenger_uid, first['rating'])):
+        if sid:
+            emit_battle('battle_start', start_payload(
+                battle_id, topic, questions, role, {'name': names.get(other, '?'), 'rating': other_rating},
+                app.config.get('BATTLE_QUESTION_SECONDS', 15), matched=True), to=sid)
+
+
+# ============ Spectators ============
+
+def spectator_room(battle_id):
+    return f'spectate:{battle_id}'
+
+
+def can_spectate(user_id, room):
+    """BATTLE_SPECTATORS: 'anyone', 'friends' (of either player) or 'off'"""
+    mode = current_app.config.get('BATTLE_SPECTATORS', 'anyone')
+    if mode == 'anyone':
+        return True
+    if mode != 'friends' or not user_id:
+        return False
+    players = [uid for uid in (room.get('challenger_uid'), room.get('opponent_uid')) if uid]
+    if user_id in players:
+        return True
+    viewer = User.objects(id=safe_object_id(user_id)).only('friends').first()
+    return bool(viewer) and any(safe_object_id(uid) in viewer.friends for uid in players)
+
+
+@socketio.on('spectate_battle')
+def handle_spectate_battle(data):
+    """Watch a live battle read-only; scores arrive as a throttled room broadcast"""
+    battle_id = data.get('battle_id')
+    room = battle_store.get_room(battle_id) if battle_id else None
+    if not room:
+        emit('error', {'message': 'Battle not found or already finished'})
+        return
+    if not can_spectate(data.get('user_id'), room):
+        emit('error', {'message': 'You are not allowed to watch this battle'})
         return
 
-    is_correct = (answer_idx == question['correct'])
+    join_room(spectator_room(battle_id))
+    battle = BattleResult.objects(id=safe_object_id(battle_id)).only('topic').first()
+    uids = [room.get('challenger_uid'), room.get('opponent_uid')]
+    names = {str(u.id): u.name for u in User.objects(id__in=[safe_object_id(u) for u in uids if u]).only('name')}
+    emit_battle('spectate_state', {
+        'b': battle_id,
+        't': battle.topic if battle else '',
+        'n': room.get('total', 0),
+        'p': [names.get(uids[0], '?'), 'AI Opponent' if room.get('is_solo') else names.get(uids[1], '...')],
+        'sc': scoreboard_payload(room)
+    }, to=request.sid)
 
-    # Determine if challenger or opponent
-    is_challenger = (room.get('challenger_uid') == user_id)
 
-    if is_challenger:
-        room['challenger_answered'] += 1
-        if is_correct:
-            room['challenger_score'] += 1
+@socketio.on('stop_spectating')
+def handle_stop_spectating(data):
+    if data.get('battle_id'):
+        leave_room(spectator_room(data['battle_id']))
+
+
+@socketio.on('submit_answer')
+def handle_submit_answer(data):
+    """Handle a player's answer submission"""
+    battle_id = data.get('b')
+    index = data.get('i')
+    if not battle_id or not isinstance(index, int):
+        return
+    apply_answer(current_app._get_current_object(), battle_id, data.get('u'), index, data.get('a'), sid=request.sid)
+
+
+def apply_answer(app, battle_id, user_id, index, answer_idx, sid=None, timed_out=False):
+    """Score one answer, notify both players and finalize if it was the last one"""
+    # One O(1) store call looks the question up in the room's answer key,
+    # records the answer at most once per (player, question) and bumps the
+    # counters atomically, so double-clicks and retries can't double-score
+    outcome = battle_store.record_answer(battle_id, user_id, index, answer_idx)
+    if not outcome or outcome['duplicate']:
+        return outcome
+
+    side = outcome['side']
+    is_challenger = side == 'challenger'
+    # This worker may never have created or started a battle
+    ensure_battle_clock(app)
+    answer_log.record(app, battle_id, side, index, answer_idx, outcome['is_correct'])
+
+    # Restart this player's question clock (or stop it after their last question)
+    if outcome[f'{side}_answered'] < outcome['total']:
+        battle_timers.schedule((battle_id, side), question_deadline(app), on_question_deadline,
+                               battle_id, side, outcome[f'{side}_answered'])
     else:
-        room['opponent_answered'] += 1
-        if is_correct:
-            room['opponent_score'] += 1
+        battle_timers.cancel((battle_id, side))
 
     # Send result to the answering player
-    emit('answer_result', {
-        'question_id': question_id,
-        'is_correct': is_correct,
-        'correct_answer': question['correct'],
-        'your_score': room['challenger_score'] if is_challenger else room['opponent_score']
-    })
+    sid = sid or battle_store.get_sid(user_id)
+    if sid:
+        emit_battle('answer_result', answer_payload(index, outcome['correct'], outcome['is_correct'],
+                                                    outcome[f'{side}_score'], timed_out), to=sid)
 
-    # Send progress to opponent using their current SID
-    opponent_uid = room.get('opponent_uid') if is_challenger else room.get('challenger_uid')
-    opponent_sid = user_sid_map.get(opponent_uid) if opponent_uid else None
-    if opponent_sid:
-        socketio.emit('opponent_progress', {
-            'opponent_score': room['challenger_score'] if is_challenger else room['opponent_score'],
-            'opponent_answered': room['challenger_answered'] if is_challenger else room['opponent_answered']
-        }, to=opponent_sid, namespace='/')
+    # Progress to the opponent is coalesced to BATTLE_PROGRESS_HZ
+    opponent_uid = outcome['opponent_uid'] if is_challenger else outcome['challenger_uid']
+    if opponent_uid:
+        queue_progress(app, battle_id, opponent_uid, outcome[f'{side}_score'], outcome[f'{side}_answered'])
+    queue_scoreboard(app, battle_id, outcome)
 
     # Check if battle is complete
+    total = outcome['total']
+    if outcome.get('is_solo'):
+        done = outcome['challenger_answered'] >= total
+    else:
+        done = outcome['challenger_answered'] >= total and outcome['opponent_answered'] >= total
+    # Both players' final answers can see a finished room; only one finalizes
+    if done and battle_store.claim_completion(battle_id):
+        complete_battle(app, battle_id, outcome)
+    return outcome
+
+
+# Latest unsent opponent_progress per (battle, recipient) and spectator
+# scoreboard per battle; this worker's answers only
+_pending_progress = {}
+
+
+def queue_progress(app, battle_id, to_uid, score, answered):
+    """Keep only the newest progress for ``to_uid``; a timer sends it on the next tick"""
+    key = ('progress', battle_id, to_uid)
+    _pending_progress[key] = progress_payload(score, answered)
+    # A key stays pending only while a running loop will fire it; otherwise
+    # the tick is rescheduled instead of waiting forever
+    battle_timers.ensure_started(app)
+    if not battle_timers.pending(key):
+        battle_timers.schedule(key, 1.0 / app.config.get('BATTLE_PROGRESS_HZ', 4), send_progress, key)
+
+
+def send_progress(app, key):
+    payload = _pending_progress.pop(key, None)
+    sid = battle_store.get_sid(key[2]) if payload else None
+    if sid:
+        emit_battle('opponent_progress', payload, to=sid)
+
+
+def queue_scoreboard(app, battle_id, state):
+    """Latest scores for spectators; one room broadcast per tick however many are watching"""
+    key = ('scoreboard', battle_id)
+    _pending_progress[key] = scoreboard_payload(state)
+    battle_timers.ensure_started(app)   # as in queue_progress
+    if not battle_timers.pending(key):
+        battle_timers.schedule(key, 1.0 / app.config.get('BATTLE_SPECTATOR_HZ', 2), send_scoreboard, battle_id)
+
+
+def send_scoreboard(app, battle_id):
+    payload = _pending_progress.pop(('scoreboard', battle_id), None)
+    if payload:
+        emit_battle('spectate_score', payload, to=spectator_room(battle_id))
+
+
+def complete_battle(app, battle_id, state):
+    """Finalize a battle whose completion we claimed and send both players the result.
+
+    ``state`` is a room snapshot (scores, uids, total, is_solo).
+    """
+    stop_battle_clock(battle_id)
+    for uid in (state.get('challenger_uid'), state.get('opponent_uid')):
+        # The result carries final scores; a late progress tick would only flicker
+        battle_timers.cancel(('progress', battle_id, uid))
+        _pending_progress.pop(('progress', battle_id, uid), None)
+    battle_timers.cancel(('scoreboard', battle_id))
+    _pending_progress.pop(('scoreboard', battle_id), None)
+    answer_log.flush(app, battle_id)
+    battle = BattleResult.objects(id=safe_object_id(battle_id)).first()
+    if battle and battle.status == 'in_progress':
+        if state.get('is_solo'):
+            # Generate AI score (40-80% correct)
+            total = state['total']
+            opponent_score = random.randint(int(total * 0.4), int(total * 0.8))
+        else:
+            opponent_score = state.get('opponent_score', 0)
+        result = finalize_battle(battle, state.get('challenger_score', 0), opponent_score)
+        # Emit to both players directly
+        players = [state.get('challenger_uid')] + ([] if state.get('is_solo') else [state.get('opponent_uid')])
+        for uid in players:
+            sid = battle_store.get_sid(uid) if uid else None
+            if sid:
+                socketio.emit('battle_result', result, to=sid, namespace='/')
+        socketio.emit('spectate_result', {'battle': result['battle']}, to=spectator_room(battle_id), namespace='/')
+    socketio.close_room(spectator_room(battle_id), namespace='/')
+    battle_store.delete_room(battle_id)
+
+
+# ============ Battle Clock ============
+# Deadlines are enforced server-side so a stalled or vanished client can't
+# hold a room open: each player has a per-question deadline, each battle an
+# overall one, and unjoined battles expire. Timers are per worker; every
+# callback re-checks the shared room before acting.
+
+def question_deadline(app):
+    return app.config.get('BATTLE_QUESTION_SECONDS', 15) + app.config.get('BATTLE_DEADLINE_GRACE', 5)
+
+
+def ensure_battle_clock(app):
+    battle_timers.ensure_started(app)
+    presence.ensure_heartbeat(app)
+    if not battle_timers.pending('battle_gc'):
+        battle_timers.schedule('battle_gc', app.config.get('BATTLE_GC_INTERVAL', 600), gc_stale_battles)
+
+
+def arm_waiting_deadline(app, battle_id):
+    """An unjoined battle expires after BATTLE_WAITING_TTL seconds"""
+    ensure_battle_clock(app)
+    battle_timers.schedule((battle_id, 'waiting'), app.config.get('BATTLE_WAITING_TTL', 600),
+                           on_waiting_deadline, battle_id)
+
+
+def start_battle_clock(app, battle_id, total, is_solo=False):
+    """Arm the overall deadline and each player's first question deadline"""
+    ensure_battle_clock(app)
+    battle_timers.cancel((battle_id, 'waiting'))
+    per_question = question_deadline(app)
+    battle_timers.schedule((battle_id, 'battle'), total * per_question + app.config.get('BATTLE_DEADLINE_GRACE', 5),
+                           on_battle_deadline, battle_id)
+    for side in ('challenger',) if is_solo else ('challenger', 'opponent'):
+        battle_timers.schedule((battle_id, side), per_question, on_question_deadline, battle_id, side, 0)
+
+
+def stop_battle_clock(battle_id):
+    battle_timers.cancel(*[(battle_id, kind) for kind in ('waiting', 'battle', 'challenger', 'opponent')])
+
+
+def on_question_deadline(app, battle_id, side, answered):
+    """A player let a question run out: score it as unanswered so they move on"""
+    room = battle_store.get_room(battle_id)
+    # Progress since this timer was armed means another worker owns the clock now
+    if not room or room.get(f'{side}_answered', 0) != answered or answered >= room['total']:
+        return
     total = room['total']
-    is_solo = room.get('is_solo', False)
+    for index in list(range(answered, total)) + list(range(answered)):
+        outcome = apply_answer(app, battle_id, room.get(f'{side}_uid'), index, -1, timed_out=True)
+        if not outcome or not outcome['duplicate']:
+            return
+
+
+def on_battle_deadline(app, battle_id):
+    """The battle ran out of time: finalize with the scores so far"""
+    room = battle_store.get_room(battle_id)
+    if room and battle_store.claim_completion(battle_id):
+        app.logger.info(f'[BATTLE] {battle_id} hit its deadline, finalizing')
+        complete_battle(app, battle_id, room)
+
+
+def on_waiting_deadline(app, battle_id):
+    """Nobody joined in time: drop the battle and tell the challenger"""
+    deleted = BattleResult.objects(id=safe_object_id(battle_id), status='waiting').delete()
+    room = battle_store.get_room(battle_id)
+    battle_store.delete_room(battle_id)
+    if deleted and room:
+        sid = battle_store.get_sid(room.get('challenger_uid'))
+        if sid:
+            socketio.emit('battle_expired', {'battle_id': battle_id}, to=sid, namespace='/')
+
+
+def gc_stale_battles(app):
+    """Periodic sweep for battles whose timers were lost (restart, crashed worker)"""
+    interval = app.config.get('BATTLE_GC_INTERVAL', 600)
+    battle_timers.schedule('battle_gc', interval, gc_stale_battles)
+    if not battle_store.try_lock('battle_gc', interval / 2):
+        return
 
-    if is_solo:
-        if room['challenger_answered'] >= total:
-            # Generate AI score (40-80% correct)
-            ai_score = random.randint(int(total * 0.4), int(total * 0.8))
-            room['opponent_score'] = ai_score
-
-            battle = BattleResult.objects(id=safe_object_id(battle_id)).first()
-            if battle:
-                result = finalize_battle(battle, room['challenger_score'], ai_score)
-                # Emit to challenger directly
-                emit('battle_result', result)
-                if battle_id in active_rooms:
-                    del active_rooms[battle_id]
-    else:
-        if room['challenger_answered'] >= total and room['opponent_answered'] >= total:
-            battle = BattleResult.objects(id=safe_object_id(battle_id)).first()
-            if battle:
-                result = finalize_battle(battle, room['challenger_score'], room['opponent_score'])
-                # Emit to both players directly
-                c_sid = user_sid_map.get(room.get('challenger_uid'))
-                o_sid = user_sid_map.get(room.get('opponent_uid'))
-                if c_sid:
-                    socketio.emit('battle_result', result, to=c_sid, namespace='/')
-                if o_sid:
-                    socketio.emit('battle_result', result, to=o_sid, namespace='/')
-                if battle_id in active_rooms:
-                    del active_rooms[battle_id]
+    now = datetime.utcnow()
+    waiting_cutoff = now - timedelta(seconds=app.config.get('BATTLE_WAITING_TTL', 600))
+    stale = list(BattleResult.objects(status='waiting', created_at__lt=waiting_cutoff).only('id', 'challenger_id'))
+    stale_ids = [b.id for b in stale]
+    for battle in stale:
+        battle_store.delete_room(str(battle.id))
+        battle_store.clear_battle(str(battle.id), [str(ref_id(battle, 'challenger_id'))])
+    if stale_ids:
+        BattleResult.objects(id__in=stale_ids, status='waiting').delete()
+
+    abandoned = 0
+    playing_cutoff = now - timedelta(seconds=app.config.get('BATTLE_STALE_AFTER', 3600))
+    stale_playing = BattleResult.objects(status='in_progress', created_at__lt=playing_cutoff)
+    for battle in stale_playing.only('id', 'challenger_id', 'opponent_id'):
+        battle_id = str(battle.id)
+        room = battle_store.get_room(battle_id)
+        if room is None:
+            # Nothing left to score it from: close it without touching ratings
+            BattleResult.objects(id=battle.id, status='in_progress').update_one(
+                set__status='abandoned', set__completed_at=now)
+            players = [ref_id(battle, field) for field in ('challenger_id', 'opponent_id')]
+            battle_store.clear_battle(battle_id, [str(oid) for oid in players if oid])
+            abandoned += 1
+        elif battle_store.claim_completion(battle_id):
+            complete_battle(app, battle_id, room)
+    if stale_ids or abandoned:
+        app.logger.info(f'[BATTLE] GC removed {len(stale_ids)} stale waiting battles, abandoned {abandoned}')
@@ -5,6 +5,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..extensions import db, socketio
 from ..models.user import User
 from ..models.notification import Notification
+from ..services.battle_store import battle_store
 from bson import ObjectId
 from bson.errors import InvalidId
 
@@ -29,8 +30,8 @@ def get_friends():
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
-    # Import user_sid_map from battle routes for online status
-    from .battle import user_sid_map
+    # Online status comes from the shared presence store (one lookup for all friends)
+    online = battle_store.online(str(fid) for fid in (user.friends or []))
 
     friends_list = []
     for fid in (user.friends or []):
@@ -40,7 +41,7 @@ def get_friends():
                 'id': str(friend.id),
                 'name': friend.name,
                 'email': friend.email,
-                'online': str(friend.id) in user_sid_map
+                'online': str(friend.id) in online
             })
 
     return jsonify({'friends': friends_list})
@@ -96,8 +97,7 @@ def send_friend_request():
     notif.save()
 
     # Push real-time notification via Socket.IO
-    from .battle import user_sid_map
-    target_sid = user_sid_map.get(str(target.id))
+    target_sid = battle_store.get_sid(str(target.id))
     if target_sid:
         socketio.emit('notification', notif.to_dict(), to=target_sid, namespace='/')
 
@@ -153,14 +153,13 @@ def accept_friend_request():
     )
     accept_notif.save()
 
-    from .battle import user_sid_map
-    their_sid = user_sid_map.get(str(from_user_id))
+    their_sid = battle_store.get_sid(str(from_user_id))
     if their_sid:
         socketio.emit('notification', accept_notif.to_dict(), to=their_sid, namespace='/')
         socketio.emit('friend_list_updated', {}, to=their_sid, namespace='/')
 
     # Also notify the accepting user to refresh their friends list and notifications
-    my_sid = user_sid_map.get(user_id)
+    my_sid = battle_store.get_sid(user_id)
     if my_sid:
         socketio.emit('notification', {}, to=my_sid, namespace='/')
         socketio.emit('friend_list_updated', {}, to=my_sid, namespace='/')
@@ -232,8 +231,6 @@ def mark_notifications_read():
 @socketio.on('battle_invite')
 def handle_battle_invite(data):
     """Send a battle invite to a friend"""
-    from .battle import user_sid_map
-
     from_user_id = data.get('from_user_id')
     to_user_id = data.get('to_user_id')
     battle_id = data.get('battle_id')
@@ -272,7 +269,7 @@ def handle_battle_invite(data):
     notif.save()
 
     # Push real-time
-    target_sid = user_sid_map.get(to_user_id)
+    target_sid = battle_store.get_sid(to_user_id)
     if target_sid:
         socketio.emit('notification', notif.to_dict(), to=target_sid, namespace='/')
 
@@ -1,31 +1,38 @@
 """
 CareerSage AI Service — Parallel Generation + MongoDB Cache + Streaming
-Uses 3 NVIDIA API keys for concurrent roadmap generation.
+Spreads calls across every configured NVIDIA API key (see KeyScheduler).
 """
-import json
-import re
 import random
 import time
+from datetime import datetime, timedelta, timezone
 import eventlet
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from flask import current_app
+from .llm_gateway import LLMGateway, GatewayBusy
+from .llm_backends import create_backend
+from .presence import user_room
+from .roadmap_cache import roadmap_memory_cache, roadmap_refresher, topic_index
+from ..utils.json_stream import NodeStreamParser, extract_json
 
 
 class AIService:
     """AI-powered roadmap and quiz generation with parallel API calls."""
 
-    NVIDIA_BASE_URL = "https://integrate.api.nvidia.com/v1"
-
     def __init__(self):
-        self._clients = {}
-        self._key_counter = 0  # Round-robin across 3 keys
-        # Persistent session with connection pooling for faster API calls
+        self.gateway = LLMGateway()
+        self._backend = None
+        self._backend_config = None
+        # Persistent session with connection pooling for faster API calls;
+        # resized to the configured keys when the backend is built
         self._session = requests.Session()
+        self._mount_adapter(32)
+
+    def _mount_adapter(self, pool_maxsize):
         adapter = HTTPAdapter(
             pool_connections=3,
-            pool_maxsize=5,
+            pool_maxsize=pool_maxsize,  # >= keys x AI_GATEWAY_MAX_PER_KEY or extra calls reconnect each time
             max_retries=Retry(total=1, backoff_factor=0.5, status_forcelist=[502, 503, 504])
         )
         self._session.mount('https://', adapter)
@@ -35,137 +42,162 @@ class AIService:
     #  Client / API helpers
     # ──────────────────────────────────────────
 
-    def _get_api_key(self, key_index=0):
-        """Get API key for a specific slot (0/1/2)."""
-        key_names = ['NVIDIA_API_KEY', 'NVIDIA_API_KEY_2', 'NVIDIA_API_KEY_3']
-        key_name = key_names[key_index] if key_index < len(key_names) else key_names[0]
-        return current_app.config.get(key_name, '') or current_app.config.get('NVIDIA_API_KEY', '')
+    BACKEND_CONFIG_KEYS = (
+        'LLM_BACKEND', 'LLM_MODEL', 'NVIDIA_BASE_URL', 'NVIDIA_API_KEYS', 'NVIDIA_API_KEY', 'NVIDIA_API_KEY_2',
+        'NVIDIA_API_KEY_3', 'OLLAMA_BASE_URL', 'OLLAMA_MODEL', 'LLM_FAKE_RECORDINGS',
+        'LLM_FAKE_LATENCY', 'LLM_FAKE_ERROR_RATE', 'LLM_FAKE_KEYS', 'LLM_FAKE_SEED', 'AI_GATEWAY_MAX_PER_KEY',
+    )
+
+    def get_backend(self):
+        """Current LLM backend, rebuilt whenever its config changes."""
+        cfg = current_app.config
+        snapshot = tuple(cfg.get(k) for k in self.BACKEND_CONFIG_KEYS)
+        if self._backend is None or snapshot != self._backend_config:
+            self._backend = create_backend(cfg, self._session)
+            self._backend_config = snapshot
+            pool_size = self._backend.num_keys * cfg.get('AI_GATEWAY_MAX_PER_KEY', 4)
+            self._mount_adapter(pool_size)
+            current_app.logger.info(
+                f"[LLM] Backend: {self._backend.name} ({self._backend.model}, {self._backend.num_keys} keys, "
+                f"{pool_size} pooled connections)"
+            )
+        return self._backend
 
-    def _get_model(self):
-        # HARDCODE the 8b model to prevent the massive 4-minute delays caused by the 70b model on AWS
-        return 'meta/llama-3.1-8b-instruct'
+    def _gateway_submit(self, fingerprint, call, key_index, kind='complete'):
+        cfg = current_app.config
+        self.gateway.configure(cfg)
+        app = current_app._get_current_object()
 
-    def call_nvidia_api(self, prompt, key_index=0, system_msg="You are an expert career roadmap generator. Output ONLY valid JSON."):
-        """Call NVIDIA API using persistent session with connection pooling.
-        
-        Uses keep-alive connections for ~200ms faster calls and retries
-        with an alternate API key on failure.
-        """
-        start = time.time()
-        try:
-            api_key = self._get_api_key(key_index)
-            model = self._get_model()
-            current_app.logger.info(f"[API-{key_index}] Calling {model}...")
+        def call_in_context(key, claim):
+            # Hedged attempts run on their own green threads
+            with app.app_context():
+                return call(key, claim)
+
+        return self.gateway.submit(
+            fingerprint, call_in_context,
+            kind=kind,
+            key_hint=key_index,
+            num_keys=self.get_backend().num_keys,
+            max_per_key=cfg.get('AI_GATEWAY_MAX_PER_KEY', 4),
+            max_queue=cfg.get('AI_GATEWAY_MAX_QUEUE', 64),
+            queue_timeout=cfg.get('AI_GATEWAY_QUEUE_TIMEOUT', 30)
+        )
 
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.6,
-                "top_p": 0.95,
-                "max_tokens": 4096,
-                "stream": False
-            }
+    def call_nvidia_api(self, prompt, key_index=None, system_msg="You are an expert career roadmap generator. Output ONLY valid JSON."):
+        """Call the configured LLM backend through the gateway.
 
-            response = self._session.post(
-                f"{self.NVIDIA_BASE_URL}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=(10, 40)  # (connect_timeout, read_timeout)
+        (Name kept for callers; the backend may be NVIDIA, Ollama or fake.)
+        The gateway caps in-flight calls per key, queues (and past a limit
+        rejects) overflow, coalesces identical in-flight prompts into one
+        upstream call, retries once on a different key on failure and, with
+        AI_HEDGE_ENABLED, hedges slow calls onto a second key.
+        ``key_index`` is only a preference; the key scheduler routes around
+        rate-limited or failing keys.
+        """
+        backend = self.get_backend()
+        fingerprint = self.gateway.fingerprint(backend.name, backend.model, system_msg, prompt)
+        try:
+            return self._gateway_submit(
+                fingerprint,
+                lambda key, claim: self._post_completion(prompt, key, system_msg, claim),
+                key_index
             )
-            response.raise_for_status()
-            
-            data = response.json()
+        except GatewayBusy as e:
+            current_app.logger.warning(f"[GATEWAY] Rejected call: {e}")
+            return None
+
+    def _post_completion(self, prompt, key_index, system_msg, claim):
+        """Single upstream attempt. Returns None on an empty reply, raises on errors."""
+        start = time.time()
+        backend = self.get_backend()
+        try:
+            current_app.logger.info(f"[API-{key_index}] Calling {backend.model}...")
+            content = backend.complete(prompt, system_msg, key_index)
             elapsed = time.time() - start
-            if 'choices' not in data or not data['choices']:
+            if not content:
                 current_app.logger.warning(f"[API-{key_index}] No choices in response ({elapsed:.1f}s)")
                 return None
-
-            content = data['choices'][0]['message']['content']
-            current_app.logger.info(f"[API-{key_index}] OK: {len(content or '')} chars in {elapsed:.1f}s")
+            if not claim():
+                return None  # a hedged twin answered first
+            current_app.logger.info(f"[API-{key_index}] OK: {len(content)} chars in {elapsed:.1f}s")
             return content
 
         except Exception as e:
             elapsed = time.time() - start
             current_app.logger.error(f"[API-{key_index}] FAILED after {elapsed:.1f}s: {type(e).__name__}: {e}")
-            
-            # Retry once with a different API key
-            retry_key = (key_index + 1) % 3
-            if retry_key != key_index:
-                current_app.logger.info(f"[API-{key_index}] Retrying with key {retry_key}...")
-                return self._call_nvidia_api_no_retry(prompt, retry_key, system_msg)
-            return None
+            raise  # the gateway records status / Retry-After against this key
+
+    def call_nvidia_api_stream(self, prompt, sink, key_index=None, system_msg="You are an expert career roadmap generator. Output ONLY valid JSON."):
+        """Streaming variant of call_nvidia_api.
+
+        ``sink.begin()`` is called when an upstream attempt starts producing and
+        ``sink.feed(text)`` with each token chunk as it arrives. Returns the
+        full content (or None), exactly like call_nvidia_api. Callers that
+        were coalesced onto someone else's stream get the whole content fed
+        to their sink in one chunk once it completes.
+        """
+        backend = self.get_backend()
+        fingerprint = self.gateway.fingerprint(backend.name, backend.model, system_msg, prompt, 'stream')
+        streamed = []
+
+        def attempt(key, claim):
+            streamed.append(key)
+            return self._post_completion_stream(prompt, key, system_msg, sink, claim)
 
-    def _call_nvidia_api_no_retry(self, prompt, key_index, system_msg):
-        """Single attempt API call (no retry to avoid infinite loop)."""
-        start = time.time()
         try:
-            api_key = self._get_api_key(key_index)
-            model = self._get_model()
+            content = self._gateway_submit(fingerprint, attempt, key_index, kind='stream')
+        except GatewayBusy as e:
+            current_app.logger.warning(f"[GATEWAY] Rejected stream: {e}")
+            return None
 
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt}
-                ],
-                "temperature": 0.6,
-                "top_p": 0.95,
-                "max_tokens": 4096,
-                "stream": False
-            }
+        if content and not streamed:
+            sink.begin()
+            sink.feed(content)
+        return content
 
-            response = self._session.post(
-                f"{self.NVIDIA_BASE_URL}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=(10, 40)
-            )
-            response.raise_for_status()
-            data = response.json()
-            elapsed = time.time() - start
+    def _post_completion_stream(self, prompt, key_index, system_msg, sink, claim):
+        """Single streaming attempt: feed the sink chunk by chunk as tokens arrive.
 
-            if 'choices' not in data or not data['choices']:
+        The sink is reset on this attempt's first token, once ``claim()``
+        confirms no hedged twin has already started streaming.
+        """
+        start = time.time()
+        first_token = None
+        parts = []
+        backend = self.get_backend()
+        try:
+            current_app.logger.info(f"[API-{key_index}:stream] Calling {backend.model}...")
+            for delta in backend.stream(prompt, system_msg, key_index):
+                if first_token is None:
+                    first_token = time.time() - start
+                    if not claim():
+                        return None
+                    sink.begin()
+                parts.append(delta)
+                sink.feed(delta)
+
+            content = ''.join(parts)
+            elapsed = time.time() - start
+            if not content:
+                current_app.logger.warning(f"[API-{key_index}:stream] Empty stream ({elapsed:.1f}s)")
                 return None
-
-            content = data['choices'][0]['message']['content']
-            current_app.logger.info(f"[API-{key_index}:retry] OK: {len(content or '')} chars in {elapsed:.1f}s")
+            current_app.logger.info(
+                f"[API-{key_index}:stream] OK: {len(content)} chars in {elapsed:.1f}s "
+                f"(first token {first_token:.1f}s)"
+            )
             return content
+
         except Exception as e:
             elapsed = time.time() - start
-            current_app.logger.error(f"[API-{key_index}:retry] FAILED after {elapsed:.1f}s: {e}")
-            return None
+            current_app.logger.error(f"[API-{key_index}:stream] FAILED after {elapsed:.1f}s: {type(e).__name__}: {e}")
+            raise
 
     def parse_json_response(self, content):
-        """Extract and parse JSON from AI response."""
-        if not content:
-            return None
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError:
-            pass
-
-        for pattern in [r'```json\s*(\{.*?\})\s*```', r'```\s*(\{.*?\})\s*```', r'(\{.*\})']:
-            match = re.search(pattern, content, re.DOTALL)
-            if match:
-                try:
-                    return json.loads(match.group(1))
-                except json.JSONDecodeError:
-                    continue
-
-        current_app.logger.error("Could not parse JSON from response")
-        return None
+        """Extract and parse JSON from AI response (fences, chatter, trailing commas, truncation)."""
+        data = extract_json(content)
+        if data is None and content:
+            current_app.logger.error("Could not parse JSON from response")
+        return data
 
     # ──────────────────────────────────────────
     #  Streaming progress via Socket.IO
@@ -176,49 +208,161 @@ class AIService:
         if not user_id:
             return
         try:
-            from ..routes.battle import user_sid_map
             from ..extensions import socketio
-            sid = user_sid_map.get(user_id)
-            if sid:
-                socketio.emit('roadmap_progress', {
-                    'step': step,
-                    'message': message,
-                    'progress': progress
-                }, to=sid, namespace='/')
+            # Every tab the user has open, not just the newest socket
+            socketio.emit('roadmap_progress', {
+                'step': step,
+                'message': message,
+                'progress': progress
+            }, to=user_room(user_id), namespace='/')
         except Exception:
             pass
 
+    def _emit_node(self, user_id, index, node):
+        """Push a single roadmap node to the browser as soon as it is parsed."""
+        if not user_id:
+            return
+        try:
+            from ..extensions import socketio
+            socketio.emit('roadmap_node', {
+                'index': index,
+                'node': node
+            }, to=user_room(user_id), namespace='/')
+        except Exception:
+            pass
+
+    def _complete_roadmap(self, prompt, user_id, progress_range, expected_nodes):
+        """Run a roadmap prompt, streaming nodes to the user when possible."""
+        if not user_id or not current_app.config.get('AI_STREAM_ROADMAPS', True):
+            return self.call_nvidia_api(prompt)
+        sink = RoadmapStreamSink(self, user_id, progress_range, expected_nodes)
+        return self.call_nvidia_api_stream(prompt, sink)
+
     # ──────────────────────────────────────────
     #  MongoDB Cache
     # ──────────────────────────────────────────
 
     def _check_cache(self, topic, mode, experience_level):
-        """Return cached roadmap or None."""
+        """Return cached roadmap or None (memory tier first, then Mongo).
+
+        On an exact miss, falls back to the closest existing cache key for
+        the same mode/level if it is similar enough (ROADMAP_CACHE_SIMILARITY).
+        """
         from ..models.cache import RoadmapCache
         key = RoadmapCache.make_key(topic, mode, experience_level)
-        cached = RoadmapCache.objects(cache_key=key).first()
-        if cached:
-            cached.update(inc__hit_count=1)
-            current_app.logger.info(f"[CACHE HIT] {key} (hits: {cached.hit_count + 1})")
-            return cached.roadmap_data
+        cached = self._lookup_cache_key(key)
+        if cached is not None:
+            return cached
+
+        similar = self._similar_cache_key(key)
+        if similar:
+            cached = self._lookup_cache_key(similar)
+            if cached is not None:
+                return cached
+            topic_part, bucket = similar.split('|', 1)
+            topic_index.discard(bucket, topic_part)
         return None
 
-    def _save_cache(self, topic, mode, experience_level, roadmap_data):
-        """Upsert roadmap into cache."""
+    def _lookup_cache_key(self, key):
         from ..models.cache import RoadmapCache
-        key = RoadmapCache.make_key(topic, mode, experience_level)
+        app = current_app._get_current_object()
+        roadmap_memory_cache.configure(app.config)
+
+        roadmap_refresher.ensure_started(app, self)
+        soft_ttl = app.config.get('ROADMAP_CACHE_SOFT_TTL', 7 * 86400)
+
+        cached = roadmap_memory_cache.get(key)
+        if cached is not None:
+            roadmap_memory_cache.record_hit(key, app)
+            if roadmap_memory_cache.is_stale(key):
+                roadmap_refresher.revalidate(app, self, key)
+            current_app.logger.info(f"[CACHE HIT:mem] {key}")
+            return cached
+
+        doc = RoadmapCache.objects(cache_key=key).only(
+            'roadmap_data', 'hit_count', 'created_at', 'refreshed_at'
+        ).first()
+        if doc:
+            refreshed = doc.refreshed_at or doc.created_at or datetime.utcnow()
+            stale_at = refreshed.replace(tzinfo=timezone.utc).timestamp() + soft_ttl
+            roadmap_memory_cache.put(key, doc.roadmap_data, stale_at=stale_at)
+            roadmap_memory_cache.record_hit(key, app)
+            hits = doc.hit_count + roadmap_memory_cache.pending_hits(key)
+            if doc.is_stale(soft_ttl):
+                # Serve the stale copy now; regenerate in the background
+                roadmap_refresher.revalidate(app, self, key)
+                current_app.logger.info(f"[CACHE HIT:stale] {key} (hits: ~{hits})")
+            else:
+                current_app.logger.info(f"[CACHE HIT:db] {key} (hits: ~{hits})")
+            return doc.roadmap_data
+        return None
+
+    def _similar_cache_key(self, key):
+        """Nearest known cache key for the same mode/level, or None."""
+        cfg = current_app.config
+        if not cfg.get('ROADMAP_CACHE_FUZZY', True):
+            return None
+        self._load_topic_index()
+        topic_part, bucket = key.split('|', 1)
+        match, score = topic_index.nearest(bucket, topic_part, cfg.get('ROADMAP_CACHE_SIMILARITY', 0.8))
+        if not match or match == topic_part:
+            return None
+        current_app.logger.info(f"[CACHE FUZZY] {topic_part} ~ {match} ({score:.2f})")
+        return f"{match}|{bucket}"
+
+    def _load_topic_index(self):
+        """Build the similarity index from existing cache keys once per process."""
+        if topic_index.loaded:
+            return
+        from ..models.cache import RoadmapCache
+        topic_index.loaded = True
+        try:
+            for key in RoadmapCache.objects.scalar('cache_key'):
+                topic_part, _, bucket = key.partition('|')
+                topic_index.add(bucket, topic_part)
+        except Exception as e:
+            current_app.logger.error(f"[CACHE] Topic index load failed: {e}")
+
+    def _save_cache(self, topic, mode, experience_level, roadmap_data, key=None):
+        """Upsert roadmap into cache (Mongo + memory tier) and restart its freshness clock."""
+        from ..models.cache import RoadmapCache
+        cfg = current_app.config
+        key = key or RoadmapCache.make_key(topic, mode, experience_level)
+        now = datetime.utcnow()
+        soft_ttl = cfg.get('ROADMAP_CACHE_SOFT_TTL', 7 * 86400)
+        hard_ttl = cfg.get('ROADMAP_CACHE_HARD_TTL', 30 * 86400)
+
+        roadmap_memory_cache.put(key, roadmap_data, stale_at=time.time() + soft_ttl)
+        topic_part, bucket = key.split('|', 1)
+        topic_index.add(bucket, topic_part)
         try:
             RoadmapCache.objects(cache_key=key).update_one(
                 set__roadmap_data=roadmap_data,
                 set__topic=topic,
                 set__mode=mode,
                 set__experience_level=experience_level,
+                set__refreshed_at=now,
+                set__expires_at=now + timedelta(seconds=hard_ttl),
+                set_on_insert__created_at=now,
                 upsert=True
             )
             current_app.logger.info(f"[CACHE SAVED] {key}")
         except Exception as e:
             current_app.logger.error(f"[CACHE ERROR] {e}")
 
+    def refresh_cache_entry(self, key):
+        """Regenerate a cached roadmap in place (used by the background refresher)."""
+        from ..models.cache import RoadmapCache
+        entry = RoadmapCache.objects(cache_key=key).only('topic', 'mode', 'experience_level').first()
+        if not entry:
+            return None
+        level = entry.experience_level or 'beginner'
+        roadmap = self._generate_uncached(entry.topic, "None specified", level, "learn", entry.mode)
+        if roadmap and 'error' not in roadmap:
+            self._save_cache(entry.topic, entry.mode, entry.experience_level, roadmap, key=key)
+            return roadmap
+        return None
+
     # ──────────────────────────────────────────
     #  Topic validation
     # ──────────────────────────────────────────
@@ -483,11 +627,7 @@ Use REAL URLs. Create branching edges, NOT a linear chain."""
 
         current_app.logger.info(f"[PERF] Generating AI roadmap for: {topic} (mode: {mode})")
         skills_text = ", ".join(skills) if skills else "None specified"
-
-        if mode == 'beginner':
-            roadmap = self._generate_beginner(topic, skills_text, experience_level, career_goal, user_id)
-        else:
-            roadmap = self._generate_advanced_parallel(topic, skills_text, experience_level, career_goal, user_id)
+        roadmap = self._generate_uncached(topic, skills_text, experience_level, career_goal, mode, user_id)
 
         # ── Save to cache ──
         if roadmap and 'error' not in roadmap:
@@ -497,14 +637,17 @@ Use REAL URLs. Create branching edges, NOT a linear chain."""
         current_app.logger.info(f"[PERF] Total roadmap generation for '{topic}' ({mode}): {elapsed:.1f}s")
         return roadmap
 
+    def _generate_uncached(self, topic, skills_text, experience_level, career_goal, mode, user_id=None):
+        if mode == 'beginner':
+            return self._generate_beginner(topic, skills_text, experience_level, career_goal, user_id)
+        return self._generate_advanced_parallel(topic, skills_text, experience_level, career_goal, user_id)
+
     def _generate_beginner(self, topic, skills_text, experience_level, career_goal, user_id=None):
         """Beginner mode — single API call + DuckDuckGo resources."""
         self._emit_progress(user_id, 1, '🧠 Generating roadmap...', 30)
 
         prompt = self._build_beginner_prompt(topic, skills_text, experience_level, career_goal)
-        key_idx = self._key_counter % 3
-        self._key_counter += 1
-        content = self.call_nvidia_api(prompt, key_index=key_idx)
+        content = self._complete_roadmap(prompt, user_id, (30, 58), expected_nodes=8)
         if not content:
             return None
 
@@ -526,9 +669,7 @@ Use REAL URLs. Create branching edges, NOT a linear chain."""
         self._emit_progress(user_id, 1, '🏗️ Building roadmap structure...', 15)
 
         structure_prompt = self._build_structure_prompt(topic, skills_text, experience_level, career_goal)
-        key_idx = self._key_counter % 3
-        self._key_counter += 1
-        content = self.call_nvidia_api(structure_prompt, key_index=key_idx)
+        content = self._complete_roadmap(structure_prompt, user_id, (15, 48), expected_nodes=15)
 
         if not content:
             current_app.logger.warning("Structure call failed, trying fallback")
@@ -579,7 +720,7 @@ Use REAL URLs. Create branching edges, NOT a linear chain."""
         self._emit_progress(user_id, 2, '🔄 Generating full roadmap (fallback)...', 40)
 
         prompt = self._build_advanced_prompt(topic, skills_text, experience_level, career_goal)
-        content = self.call_nvidia_api(prompt, key_index=0)
+        content = self.call_nvidia_api(prompt)
         if not content:
             return None
         data = self.parse_json_response(content)
@@ -734,11 +875,8 @@ Output valid JSON only. No markdown, no explanation."""
 
         current_app.logger.info(f"Generating resume for: {name} ({job_title})")
 
-        key_idx = self._key_counter % 3
-        self._key_counter += 1
         content = self.call_nvidia_api(
             prompt,
-            key_index=key_idx,
             system_msg="You are an expert resume writer. Output ONLY valid JSON."
         )
 
@@ -768,4 +906,35 @@ Output valid JSON only. No markdown, no explanation."""
         return data
 
 
+class RoadmapStreamSink:
+    """Turns a streamed roadmap completion into roadmap_node / roadmap_progress events."""
+
+    def __init__(self, service, user_id, progress_range, expected_nodes):
+        self.service = service
+        self.user_id = user_id
+        self.progress_start, self.progress_end = progress_range
+        self.expected = max(expected_nodes, 1)
+        self.sent_ids = set()
+        self.parser = None
+
+    def begin(self):
+        # A retry on another key restarts the JSON from scratch; keep the ids
+        # we've already pushed so the browser doesn't see duplicates.
+        self.parser = NodeStreamParser('nodes')
+
+    def feed(self, text):
+        for node in self.parser.feed(text):
+            node_id = node.get('id') or f"node-{self.parser.count}"
+            if node_id in self.sent_ids:
+                continue
+            self.sent_ids.add(node_id)
+            index = len(self.sent_ids)
+            self.service._emit_node(self.user_id, index, node)
+            span = self.progress_end - self.progress_start
+            progress = self.progress_start + int(span * min(index, self.expected) / self.expected)
+            self.service._emit_progress(
+                self.user_id, 1, f"🧩 Drafted {index}: {node.get('title', 'step')}", progress
+            )
+
+
 ai_service = AIService()
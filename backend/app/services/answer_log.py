@@ -0,0 +1,99 @@
+"""
+CareerSage Answer Log — write-behind persistence of battle answers
+submit_answer appends to an in-process buffer; a background green thread
+flushes it to BattleResult.challenger_answers / opponent_answers as one
+bulk write of ``$push``/``$each`` updates. A battle's own answers are also
+flushed when it ends, so the real-time path never waits on Mongo.
+"""
+from collections import defaultdict
+from datetime import datetime
+import eventlet
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+
+
+class AnswerLog:
+    """Buffers answers per battle and flushes them in batches.
+
+    Answers are lost only if the worker dies between flushes, i.e. at most
+    BATTLE_ANSWER_FLUSH_INTERVAL seconds' worth; scores themselves live in
+    the battle store and are unaffected.
+    """
+
+    def __init__(self):
+        self._pending = defaultdict(lambda: {'challenger_answers': [], 'opponent_answers': []})
+        self._size = 0
+        self._flusher = None
+        self._flushing = False
+        self.stats = {'buffered': 0, 'flushed': 0, 'writes': 0, 'failed': 0}
+
+    def record(self, app, battle_id, side, index, answer, is_correct):
+        """Queue one answer for ``battle_id``; never touches Mongo."""
+        self._pending[battle_id][f'{side}_answers'].append({
+            'question_index': index,
+            'answer': answer,
+            'is_correct': is_correct,
+            'answered_at': datetime.utcnow(),
+        })
+        self._size += 1
+        self.stats['buffered'] += 1
+        if self._flusher is None:
+            self._flusher = eventlet.spawn(self._flush_loop, app, app.config.get('BATTLE_ANSWER_FLUSH_INTERVAL', 2))
+        elif self._size >= app.config.get('BATTLE_ANSWER_FLUSH_BATCH', 200) and not self._flushing:
+            eventlet.spawn_n(self._flush_in_context, app)
+
+    def _flush_loop(self, app, interval):
+        while True:
+            eventlet.sleep(interval)
+            self._flush_in_context(app)
+
+    def _flush_in_context(self, app):
+        with app.app_context():
+            self.flush(app)
+
+    def flush(self, app, battle_id=None):
+        """Write buffered answers (all battles, or just ``battle_id``) in one bulk write."""
+        from ..models.battle import BattleResult
+        if battle_id is not None:
+            pending = {battle_id: self._pending.pop(battle_id)} if battle_id in self._pending else {}
+        else:
+            pending, self._pending = self._pending, defaultdict(self._pending.default_factory)
+        if not pending:
+            return 0
+
+        ops, count = [], 0
+        for bid, fields in pending.items():
+            push = {f: {'$each': entries} for f, entries in fields.items() if entries}
+            try:
+                oid = ObjectId(bid)
+            except (InvalidId, TypeError):
+                continue
+            if push:
+                ops.append(UpdateOne({'_id': oid}, {'$push': push}))
+                count += sum(len(e['$each']) for e in push.values())
+        self._size -= sum(len(e) for fields in pending.values() for e in fields.values())
+        if not ops:
+            return 0
+
+        self._flushing = True
+        try:
+            BattleResult._get_collection().bulk_write(ops, ordered=False)
+            self.stats['flushed'] += count
+            self.stats['writes'] += 1
+            app.logger.info(f"[ANSWERS] Flushed {count} answers for {len(ops)} battles")
+        except Exception as e:
+            # Put them back ahead of anything that arrived meanwhile so the next tick retries in order
+            self.stats['failed'] += 1
+            for bid, fields in pending.items():
+                for f, entries in fields.items():
+                    self._pending[bid][f][:0] = entries
+                    self._size += len(entries)
+            app.logger.error(f"[ANSWERS] Flush failed: {e}")
+            count = 0
+        finally:
+            self._flushing = False
+        return count
+
+
+answer_log = AnswerLog()
@@ -0,0 +1,117 @@
+"""
+CareerSage Battle Stats — atomic rating/record updates for finished battles
+Every counter, streak, rating floor and badge is applied inside Mongo by one
+``bulk_write`` of upserting pipeline updates, and the players' documents are
+then read back (one ``$in`` query) for the response, the leaderboards and
+the rating index. Two battles finishing at once for the same user both land.
+
+The one deliberate deviation from "nothing read-modified-written in Python"
+is the pre-read: a rating engine needs both players' current ratings before
+there is anything to write, so the deltas come from that snapshot. Rating
+changes are applied as increments; Glicko-2 deviation / volatility are only
+set if the document has not been updated since the snapshot, so a
+concurrent result is kept rather than overwritten with stale values.
+"""
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from ..models.battle import BattleStats
+
+RATING_FLOOR = 100
+DEFAULTS = {'total_battles': 0, 'wins': 0, 'losses': 0, 'draws': 0, 'rating': 1000,
+            'badges': [], 'win_streak': 0, 'best_streak': 0}
+
+
+def load_stats(user_ids):
+    """user_id (str) -> BattleStats (unsaved defaults for users without stats), one query."""
+    docs = BattleStats._get_collection().find({'user_id': {'$in': [ObjectId(uid) for uid in user_ids]}})
+    found = {str(doc['user_id']): BattleStats._from_son(doc) for doc in docs}
+    return {uid: found.get(uid) or BattleStats() for uid in user_ids}
+
+
+def _field(name):
+    return {'$ifNull': [f'${name}', DEFAULTS[name]]}
+
+
+def _inc(name, by=1):
+    return {'$add': [_field(name), by]}
+
+
+def rating_state(stats):
+    """What a rating engine needs to know about a player."""
+    return {'rating': stats.rating, 'rd': stats.rating_deviation, 'volatility': stats.volatility}
+
+
+def rating_fields(old, new):
+    """Engine-specific fields (Glicko-2 deviation / volatility) that changed."""
+    return {field: new[key] for key, field in (('rd', 'rating_deviation'), ('volatility', 'volatility'))
+            if key in new and new[key] != old.get(key)}
+
+
+def _guarded(name, value, seen):
+    """``value`` if the document's updated_at is still ``seen`` (None: no document yet)."""
+    return {'$cond': [{'$eq': [{'$ifNull': ['$updated_at', None]}, seen]}, {'$literal': value}, f'${name}']}
+
+
+def _pipeline(outcome, delta, now, extra=None, seen=None):
+    """Update pipeline for one player: outcome is 'win', 'loss' or 'draw'.
+
+    ``extra`` fields are set only if nothing updated the player since the
+    snapshot that had ``updated_at == seen``.
+    """
+    step = {name: _field(name) for name in DEFAULTS}
+    step.update({name: _guarded(name, value, seen) for name, value in (extra or {}).items()})
+    step['total_battles'] = _inc('total_battles')
+    step['rating'] = {'$max': [_inc('rating', delta), RATING_FLOOR]}
+    step['updated_at'] = now
+    if outcome == 'win':
+        step['wins'] = _inc('wins')
+        step['win_streak'] = _inc('win_streak')
+    elif outcome == 'loss':
+        step['losses'] = _inc('losses')
+        step['win_streak'] = {'$literal': 0}
+    else:
+        step['draws'] = _inc('draws')
+
+    earned = [{'$cond': [{'$gte': [f'${field}', minimum]}, badge, None]}
+              for badge, field, minimum in BattleStats.BADGE_RULES]
+    return [
+        {'$set': step},
+        {'$set': {'best_streak': {'$max': ['$best_streak', '$win_streak']}}},
+        {'$set': {'badges': {'$concatArrays': ['$badges', {'$filter': {
+            'input': earned,
+            'cond': {'$and': [{'$ne': ['$$this', None]}, {'$not': [{'$in': ['$$this', '$badges']}]}]},
+        }}]}}},
+    ]
+
+
+def apply_results(snapshot, results):
+    """Write ``{user_id: (outcome, rating_delta, extra_fields)}`` in one bulk write.
+
+    ``snapshot`` is what ``load_stats`` returned; its entries for the written
+    users are replaced by the documents as stored after the write (including
+    any battle for the same user that finished in between).
+    Returns ``{user_id: new_badges}``.
+    """
+    now = datetime.utcnow()
+    ops = [UpdateOne({'user_id': ObjectId(uid)},
+                     _pipeline(outcome, delta, now, extra, snapshot[uid].updated_at if snapshot[uid].pk else None),
+                     upsert=True)
+           for uid, (outcome, delta, extra) in results.items()]
+    collection = BattleStats._get_collection()
+    try:
+        collection.bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Two first-ever battles upserting the same user: the loser of the
+        # unique-index race retries as a plain update
+        errors = e.details.get('writeErrors', [])
+        if not errors or any(err.get('code') != 11000 for err in errors):
+            raise
+        retry = [ops[err['index']] for err in errors]
+        collection.bulk_write(retry, ordered=False)
+    stored = load_stats(list(results))
+    new_badges = {uid: [b for b in stored[uid].badges if b not in (snapshot[uid].badges or [])]
+                  for uid in results}
+    snapshot.update(stored)
+    return new_badges
@@ -0,0 +1,771 @@
+"""
+CareerSage Battle Store — live battle rooms and socket presence
+Replaces the module-level ``active_rooms`` / ``user_sid_map`` dicts so more
+than one worker (or host) can serve battles. BATTLE_STORE_URL selects the
+backend: empty for in-process memory (single worker), ``redis://...`` for a
+shared Redis-protocol server (Redis, Valkey, KeyDB, or any local stand-in).
+"""
+import bisect
+import json
+import time
+from ..utils.ranking import RankedSet
+
+try:
+    import redis
+except ImportError:  # optional: only needed when BATTLE_STORE_URL is a redis:// URL
+    redis = None
+
+ROOM_INT_FIELDS = {'challenger_score', 'opponent_score', 'challenger_answered', 'opponent_answered', 'total'}
+ROOM_BOOL_FIELDS = {'is_solo'}
+ROOM_JSON_FIELDS = {'questions'}
+PLAYER_FIELDS = ('challenger_uid', 'opponent_uid')
+
+# What record_answer reports back besides the verdict: enough to score,
+# notify the opponent and decide completion without re-reading the room
+OUTCOME_FIELDS = ('challenger_uid', 'opponent_uid', 'challenger_score', 'opponent_score',
+                  'challenger_answered', 'opponent_answered', 'total', 'is_solo')
+
+
+# record_answer in one step: a late answer racing complete_battle/delete_room
+# must neither score a finished battle nor recreate a partial room hash.
+# KEYS: room, room:key, room:answers; ARGV: user_id, index, answer, *OUTCOME_FIELDS
+RECORD_ANSWER_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 or redis.call('HEXISTS', KEYS[1], 'finished') == 1 then
+    return false
+end
+local players = redis.call('HMGET', KEYS[1], 'challenger_uid', 'opponent_uid')
+local side
+if ARGV[1] ~= '' and players[1] == ARGV[1] then side = 'challenger'
+elseif ARGV[1] ~= '' and players[2] == ARGV[1] then side = 'opponent'
+else return false end
+local correct = redis.call('HGET', KEYS[2], ARGV[2])
+if not correct then return false end
+local is_correct = tonumber(ARGV[3]) == tonumber(correct)
+local duplicate = redis.call('HSETNX', KEYS[3], side .. ':' .. ARGV[2], ARGV[3]) == 0
+if not duplicate then
+    local ttl = redis.call('PTTL', KEYS[1])
+    if ttl > 0 then redis.call('PEXPIRE', KEYS[3], ttl) end
+    redis.call('HINCRBY', KEYS[1], side .. '_answered', 1)
+    if is_correct then redis.call('HINCRBY', KEYS[1], side .. '_score', 1) end
+end
+local fields = {}
+for i = 4, #ARGV do fields[#fields + 1] = ARGV[i] end
+return {side, correct, is_correct and 1 or 0, duplicate and 1 or 0,
+        redis.call('HMGET', KEYS[1], unpack(fields))}
+"""
+
+
+def answer_key(questions):
+    """question index (as str) -> index of the correct option."""
+    return {str(i): q['correct'] for i, q in enumerate(questions or [])}
+
+
+def player_side(room, user_id):
+    if user_id and room.get('challenger_uid') == user_id:
+        return 'challenger'
+    if user_id and room.get('opponent_uid') == user_id:
+        return 'opponent'
+    return None
+
+
+class MemoryBattleStore:
+    """Process-local store. Correct only with a single worker process."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._rooms = {}     # battle_id -> room dict
+        self._keys = {}      # battle_id -> {question index: correct}
+        self._answers = {}   # battle_id -> {(side, question index): answer}
+        self._finished = set()
+        self._sids = {}      # user_id -> {sid: None}, oldest first (one per tab)
+        self._users = {}     # sid -> user_id
+        self._battles = {}   # user_id -> battle_id of their live room
+        self._queues = {}    # topic_key -> sorted [(rating, joined_at, user_id)]
+        self._queued = {}    # user_id -> queue entry dict
+        self._locks = {}     # name -> expiry
+        self._boards = {}    # board -> RankedSet
+        self._board_expiry = {}  # board -> expiry
+        self._profiles = {}  # user_id -> leaderboard card (name, record, badges)
+        self._announced = set()  # users friends were last told are online
+        self._meta = {}      # name -> small bookkeeping value (e.g. leaderboard build version)
+
+    # ── Rooms ──
+
+    def get_room(self, battle_id):
+        room = self._rooms.get(battle_id)
+        return dict(room) if room is not None else None
+
+    def put_room(self, battle_id, room):
+        self._rooms[battle_id] = dict(room)
+        self._keys[battle_id] = answer_key(room.get('questions'))
+        self._answers[battle_id] = {}
+        self._finished.discard(battle_id)
+        for field in PLAYER_FIELDS:
+            if room.get(field):
+                self._battles[room[field]] = battle_id
+
+    def update_room(self, battle_id, **fields):
+        room = self._rooms.get(battle_id)
+        if room is not None:
+            room.update(fields)
+            for field in PLAYER_FIELDS:
+                if fields.get(field):
+                    self._battles[fields[field]] = battle_id
+
+    def incr_room(self, battle_id, field, amount=1):
+        """Atomically add to a counter; returns the new value (None if the room is gone)."""
+        room = self._rooms.get(battle_id)
+        if room is None:
+            return None
+        room[field] = room.get(field, 0) + amount
+        return room[field]
+
+    def delete_room(self, battle_id):
+        self._keys.pop(battle_id, None)
+        self._answers.pop(battle_id, None)
+        self._finished.discard(battle_id)
+        room = self._rooms.pop(battle_id, None)
+        if room is None:
+            return False
+        for field in PLAYER_FIELDS:
+            if room.get(field) and self._battles.get(room[field]) == battle_id:
+                del self._battles[room[field]]
+        return True
+
+    def get_battle(self, user_id):
+        """The battle_id of the live room ``user_id`` is playing in, if any."""
+        battle_id = self._battles.get(user_id) if user_id else None
+        if battle_id and battle_id not in self._rooms:
+            self.clear_battle(battle_id, [user_id])
+            return None
+        return battle_id
+
+    def clear_battle(self, battle_id, user_ids):
+        """Forget ``battle_id`` as the live battle of ``user_ids`` (rooms that are already gone)."""
+        for uid in user_ids:
+            if uid and self._battles.get(uid) == battle_id:
+                del self._battles[uid]
+
+    def record_answer(self, battle_id, user_id, index, answer):
+        """Score one answer to question ``index``, at most once per (player, question).
+
+        Returns None if the room, question or player is unknown or the battle
+        is already being finalized (see ``claim_completion``); otherwise a
+        dict with ``side``, ``correct``, ``is_correct``, ``duplicate`` and the
+        room's counters *after* this answer (see OUTCOME_FIELDS).
+        """
+        room = self._rooms.get(battle_id)
+        if room is None or battle_id in self._finished:
+            return None
+        correct = self._keys[battle_id].get(str(index))
+        side = player_side(room, user_id)
+        if correct is None or side is None:
+            return None
+
+        answers = self._answers[battle_id]
+        duplicate = (side, str(index)) in answers
+        is_correct = answer == correct
+        if not duplicate:
+            answers[(side, str(index))] = answer
+            room[f'{side}_answered'] = room.get(f'{side}_answered', 0) + 1
+            if is_correct:
+                room[f'{side}_score'] = room.get(f'{side}_score', 0) + 1
+        outcome = {f: room.get(f) for f in OUTCOME_FIELDS}
+        outcome.update(side=side, correct=correct, is_correct=is_correct, duplicate=duplicate)
+        return outcome
+
+    def claim_completion(self, battle_id):
+        """True for exactly one caller per room: whoever gets to finalize the battle."""
+        if battle_id not in self._rooms or battle_id in self._finished:
+            return False
+        self._finished.add(battle_id)
+        return True
+
+    def rooms(self):
+        """Iterate (battle_id, room) over every live room."""
+        return [(bid, dict(room)) for bid, room in self._rooms.items()]
+
+    # ── Presence ──
+
+    def set_sid(self, user_id, sid):
+        """Attach a socket to ``user_id``; returns True if the user just came online."""
+        previous = self._users.get(sid)
+        if previous and previous != user_id:
+            self.drop_sid(sid)
+        sids = self._sids.setdefault(user_id, {})
+        came_online = not sids
+        sids.pop(sid, None)
+        sids[sid] = None  # most recent last
+        self._users[sid] = user_id
+        return came_online
+
+    def get_sid(self, user_id):
+        """The user's most recently registered socket."""
+        sids = self._sids.get(user_id) if user_id else None
+        return next(reversed(sids)) if sids else None
+
+    def get_sids(self, user_id):
+        return list(self._sids.get(user_id, ())) if user_id else []
+
+    def user_for(self, sid):
+        return self._users.get(sid)
+
+    def is_online(self, user_id):
+        return user_id in self._sids
+
+    def online(self, user_ids):
+        """The subset of ``user_ids`` with a live socket."""
+        return {uid for uid in user_ids if uid in self._sids}
+
+    def heartbeat(self):
+        """Nothing to refresh: this process's sockets die with it."""
+        return 0
+
+    def set_announced(self, user_id, online):
+        """Record what friends were told about ``user_id``; False if they already knew."""
+        if online == (user_id in self._announced):
+            return False
+        if online:
+            self._announced.add(user_id)
+        else:
+            self._announced.discard(user_id)
+        return True
+
+    def drop_sid(self, sid):
+        """Forget a disconnected socket; returns its user if that was their last one (now offline)."""
+        user_id = self._users.pop(sid, None)
+        sids = self._sids.get(user_id)
+        if sids is None:
+            return None
+        sids.pop(sid, None)
+        if sids:
+            return None
+        del self._sids[user_id]
+        return user_id
+
+    # ── Matchmaking queues ──
+
+    def queue_add(self, entry):
+        """Queue ``entry`` (user_id, topic_key, rating, joined_at, ...) replacing any earlier one."""
+        self.queue_remove(entry['user_id'])
+        bisect.insort(self._queues.setdefault(entry['topic_key'], []),
+                      (entry['rating'], entry['joined_at'], entry['user_id']))
+        self._queued[entry['user_id']] = dict(entry)
+
+    def queue_remove(self, user_id):
+        """Take a user out of whatever queue they are in; returns their entry."""
+        entry = self._queued.pop(user_id, None)
+        if entry is None:
+            return None
+        queue = self._queues.get(entry['topic_key'], [])
+        item = (entry['rating'], entry['joined_at'], user_id)
+        i = bisect.bisect_left(queue, item)
+        if i < len(queue) and queue[i] == item:
+            queue.pop(i)
+        if not queue:
+            self._queues.pop(entry['topic_key'], None)
+        return entry
+
+    def queue_entries(self, topic_key):
+        """Everyone waiting on ``topic_key``, lowest rating first."""
+        return [self._queued[uid] for _, _, uid in self._queues.get(topic_key, ())]
+
+    def queue_topics(self):
+        return list(self._queues)
+
+    def queue_claim(self, user_ids):
+        """Atomically dequeue all of ``user_ids``; False (and nothing removed) if any already left."""
+        if not all(uid in self._queued for uid in user_ids):
+            return False
+        for uid in user_ids:
+            self.queue_remove(uid)
+        return True
+
+    def try_lock(self, name, seconds):
+        """Best-effort lease so only one worker runs a periodic job per tick."""
+        now = time.time()
+        if self._locks.get(name, 0) > now:
+            return False
+        self._locks[name] = now + seconds
+        return True
+
+    def release_lock(self, name):
+        self._locks.pop(name, None)
+
+    def get_meta(self, name):
+        return self._meta.get(name)
+
+    def set_meta(self, name, value):
+        self._meta[name] = str(value)
+
+    # ── Leaderboards ──
+
+    def _board(self, board, create=False):
+        expiry = self._board_expiry.get(board)
+        if expiry is not None and expiry <= time.time():
+            self.board_drop(board)
+        if create:
+            return self._boards.setdefault(board, RankedSet())
+        return self._boards.get(board) or RankedSet()
+
+    def board_set(self, board, scores):
+        """Set ``{user_id: score}`` on a board (ZADD)."""
+        ranked = self._board(board, create=True)
+        for user_id, score in scores.items():
+            ranked.set(user_id, score)
+
+    def board_incr(self, board, user_id, amount=1):
+        return self._board(board, create=True).incr(user_id, amount)
+
+    def board_page(self, board, start, count):
+        """[(user_id, score)] from rank ``start`` down, highest score first."""
+        return self._board(board).page(start, count)
+
+    def board_rank(self, board, user_id):
+        """(0-based rank, score) or None when the user is not on the board."""
+        ranked = self._board(board)
+        rank = ranked.rank(user_id)
+        return None if rank is None else (rank, ranked.score(user_id))
+
+    def board_size(self, board):
+        return len(self._board(board))
+
+    def board_expire(self, board, seconds):
+        self._board_expiry[board] = time.time() + seconds
+
+    def board_drop(self, board):
+        self._boards.pop(board, None)
+        self._board_expiry.pop(board, None)
+
+    def board_replace(self, board, source):
+        """Swap ``source`` in as ``board`` (RENAME); an empty ``source`` leaves ``board`` empty."""
+        ranked = self._boards.pop(source, None)
+        expiry = self._board_expiry.pop(source, None)
+        self.board_drop(board)
+        if ranked is not None:
+            self._boards[board] = ranked
+            if expiry is not None:
+                self._board_expiry[board] = expiry
+
+    def set_profiles(self, profiles):
+        self._profiles.update({uid: dict(p) for uid, p in profiles.items()})
+
+    def get_profiles(self, user_ids):
+        return {uid: dict(self._profiles[uid]) for uid in user_ids if uid in self._profiles}
+
+
+class RedisBattleStore:
+    """Shared store over the Redis protocol.
+
+    Rooms are hashes (``<prefix>room:<battle_id>``) so score/answer counters
+    use HINCRBY and stay consistent when both players' sockets live on
+    different workers. Each room has two side hashes: ``:key`` (question
+    index -> correct option) and ``:answers`` (``side:question`` -> answer, written
+    with HSETNX so a double submit is a no-op). Everything per room expires
+    after ``room_ttl`` seconds in case a battle is abandoned.
+
+    Presence: ``sids:<user>`` is a sorted set of that user's sockets (score =
+    last heartbeat, one per tab), ``presence`` maps user -> newest sid,
+    ``sid_users`` maps sid -> user, ``announced`` is the set of users
+    friends were last told are online and
+    ``user_battle`` maps user -> battle_id. ``user_battle`` does not expire
+    with the room, so ``get_battle`` drops entries whose room is gone.
+    Each worker re-scores its own sockets every ``sid_ttl / 3`` seconds
+    (``heartbeat``); reads prune sockets not seen for ``sid_ttl`` seconds,
+    so a crashed worker's users go offline instead of staying online forever.
+
+    Matchmaking: ``queue:<topic_key>`` is a sorted set of user ids scored by
+    rating, ``queued`` maps user -> entry JSON and ``queue_topics`` lists
+    non-empty queues.
+
+    Leaderboards: ``board:<name>`` is a sorted set of user ids by score and
+    ``profiles`` maps user -> leaderboard card JSON. ``meta:<name>`` holds
+    small bookkeeping strings such as the boards' build version.
+    """
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='careersage:', room_ttl=2 * 3600, sid_ttl=120):
+        if redis is None:
+            raise RuntimeError("BATTLE_STORE_URL is set but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.room_ttl = room_ttl
+        self.sid_ttl = sid_ttl
+        self._local = {}     # sid -> user_id for sockets on this worker (heartbeat)
+        self._presence = f"{prefix}presence"
+        self._sid_users = f"{prefix}sid_users"
+        self._user_battle = f"{prefix}user_battle"
+        self._queued = f"{prefix}queued"
+        self._queue_topics = f"{prefix}queue_topics"
+        self._profiles = f"{prefix}profiles"
+        self._announced = f"{prefix}announced"
+        self._record_answer = self.client.register_script(RECORD_ANSWER_LUA)
+
+    def _room_key(self, battle_id):
+        return f"{self.prefix}room:{battle_id}"
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, separators=(',', ':'))
+        return str(value)
+
+    @staticmethod
+    def _decode(field, value):
+        if field in ROOM_INT_FIELDS:
+            return int(value)
+        if field in ROOM_BOOL_FIELDS:
+            return value == '1'
+        if field in ROOM_JSON_FIELDS:
+            return json.loads(value)
+        return value
+
+    # ── Rooms ──
+
+    def get_room(self, battle_id):
+        raw = self.client.hgetall(self._room_key(battle_id))
+        if not raw:
+            return None
+        room = {field: self._decode(field, value) for field, value in raw.items()}
+        for field in ('challenger_uid', 'challenger_sid', 'opponent_uid', 'opponent_sid'):
+            room.setdefault(field, None)
+        return room
+
+    def put_room(self, battle_id, room):
+        key = self._room_key(battle_id)
+        mapping = {f: self._encode(v) for f, v in room.items() if v is not None}
+        correct = answer_key(room.get('questions'))
+        pipe = self.client.pipeline()
+        pipe.delete(key, f"{key}:key", f"{key}:answers")
+        pipe.hset(key, mapping=mapping)
+        if correct:
+            pipe.hset(f"{key}:key", mapping=correct)
+        players = {room[f]: battle_id for f in PLAYER_FIELDS if room.get(f)}
+        if players:
+            pipe.hset(self._user_battle, mapping=players)
+        for k in (key, f"{key}:key", f"{key}:answers"):
+            pipe.expire(k, self.room_ttl)
+        pipe.execute()
+
+    def update_room(self, battle_id, **fields):
+        key = self._room_key(battle_id)
+        if not self.client.exists(key):
+            return
+        values = {f: self._encode(v) for f, v in fields.items() if v is not None}
+        cleared = [f for f, v in fields.items() if v is None]
+        pipe = self.client.pipeline()
+        if values:
+            pipe.hset(key, mapping=values)
+        if cleared:
+            pipe.hdel(key, *cleared)
+        players = {fields[f]: battle_id for f in PLAYER_FIELDS if fields.get(f)}
+        if players:
+            pipe.hset(self._user_battle, mapping=players)
+        pipe.execute()
+
+    def incr_room(self, battle_id, field, amount=1):
+        key = self._room_key(battle_id)
+        if not self.client.exists(key):
+            return None
+        return self.client.hincrby(key, field, amount)
+
+    def delete_room(self, battle_id):
+        key = self._room_key(battle_id)
+        players = [uid for uid in self.client.hmget(key, *PLAYER_FIELDS) if uid]
+        deleted = bool(self.client.delete(key, f"{key}:key", f"{key}:answers"))
+        self.clear_battle(battle_id, players)
+        return deleted
+
+    def get_battle(self, user_id):
+        if not user_id:
+            return None
+        battle_id = self.client.hget(self._user_battle, user_id)
+        if battle_id and not self.client.exists(self._room_key(battle_id)):
+            # The room expired; user_battle entries don't, so drop it here
+            self.clear_battle(battle_id, [user_id])
+            return None
+        return battle_id
+
+    def clear_battle(self, battle_id, user_ids):
+        for uid in user_ids:
+            if uid and self.client.hget(self._user_battle, uid) == battle_id:
+                self.client.hdel(self._user_battle, uid)
+
+    def record_answer(self, battle_id, user_id, index, answer):
+        key = self._room_key(battle_id)
+        result = self._record_answer(keys=[key, f"{key}:key", f"{key}:answers"],
+                                     args=[user_id or '', str(index), self._encode(answer), *OUTCOME_FIELDS])
+        if not result:
+            return None
+        side, correct, is_correct, duplicate, values = result
+        outcome = {f: self._decode(f, v) if v is not None else None for f, v in zip(OUTCOME_FIELDS, values)}
+        outcome.update(side=side, correct=int(correct), is_correct=bool(is_correct), duplicate=bool(duplicate))
+        return outcome
+
+    def claim_completion(self, battle_id):
+        key = self._room_key(battle_id)
+        if not self.client.exists(key):
+            return False
+        return bool(self.client.hsetnx(key, 'finished', '1'))
+
+    def rooms(self):
+        start = len(self._room_key(''))
+        for key in self.client.scan_iter(match=self._room_key('*'), count=200):
+            room = self.get_room(key[start:])
+            if room is not None:
+                yield key[start:], room
+
+    # ── Presence ──
+
+    def _sids_key(self, user_id):
+        return f"{self.prefix}sids:{user_id}"
+
+    def set_sid(self, user_id, sid):
+        previous = self.client.hget(self._sid_users, sid)
+        if previous and previous != user_id:
+            self.drop_sid(sid)
+        self._newest([user_id])   # forget sockets a dead worker left behind
+        key = self._sids_key(user_id)
+        pipe = self.client.pipeline()
+        pipe.zadd(key, {sid: time.time()})
+        pipe.zcard(key)
+        pipe.expire(key, self.sid_ttl)
+        pipe.hset(self._presence, user_id, sid)
+        pipe.hset(self._sid_users, sid, user_id)
+        count = pipe.execute()[1]
+        self._local[sid] = user_id
+        return count == 1
+
+    def heartbeat(self):
+        """Mark this worker's sockets as still alive; returns how many."""
+        if not self._local:
+            return 0
+        now = time.time()
+        pipe = self.client.pipeline()
+        for sid, user_id in self._local.items():
+            pipe.zadd(self._sids_key(user_id), {sid: now}, xx=True)
+            pipe.expire(self._sids_key(user_id), self.sid_ttl)
+        pipe.execute()
+        return len(self._local)
+
+    def set_announced(self, user_id, online):
+        if online:
+            return bool(self.client.sadd(self._announced, user_id))
+        return bool(self.client.srem(self._announced, user_id))
+
+    def _newest(self, user_ids):
+        """{user_id: newest registered live sid or None}, pruning sockets past ``sid_ttl``."""
+        cutoff = time.time() - self.sid_ttl
+        pipe = self.client.pipeline()
+        for uid in user_ids:
+            key = self._sids_key(uid)
+            pipe.zrangebyscore(key, '-inf', cutoff)
+            pipe.zremrangebyscore(key, '-inf', cutoff)
+            pipe.zrange(key, -1, -1)
+        pipe.hmget(self._presence, user_ids)
+        values = pipe.execute()
+        registered = values.pop()
+        newest, expired, moved, gone = {}, [], {}, []
+        for i, uid in enumerate(user_ids):
+            dead, _, top = values[3 * i:3 * i + 3]
+            expired.extend(dead)
+            sid = registered[i] if registered[i] not in dead else None
+            newest[uid] = (sid or top[0]) if top else None
+            if newest[uid] is None and registered[i]:
+                gone.append(uid)
+            elif newest[uid] != registered[i]:
+                moved[uid] = newest[uid]
+        if expired:
+            pipe = self.client.pipeline()
+            pipe.hdel(self._sid_users, *expired)
+            if gone:
+                pipe.hdel(self._presence, *gone)
+            if moved:
+                pipe.hset(self._presence, mapping=moved)
+            pipe.execute()
+        return newest
+
+    def get_sid(self, user_id):
+        return self._newest([user_id])[user_id] if user_id else None
+
+    def get_sids(self, user_id):
+        if not user_id:
+            return []
+        self._newest([user_id])
+        return self.client.zrange(self._sids_key(user_id), 0, -1)
+
+    def user_for(self, sid):
+        return self.client.hget(self._sid_users, sid)
+
+    def is_online(self, user_id):
+        return self.get_sid(user_id) is not None
+
+    def online(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        return {uid for uid, sid in self._newest(user_ids).items() if sid}
+
+    def drop_sid(self, sid):
+        self._local.pop(sid, None)
+        user_id = self.client.hget(self._sid_users, sid)
+        if not user_id:
+            return None
+        pipe = self.client.pipeline()
+        pipe.hdel(self._sid_users, sid)
+        pipe.zrem(self._sids_key(user_id), sid)
+        pipe.zrange(self._sids_key(user_id), -1, -1)
+        newest = pipe.execute()[-1]
+        if newest:
+            self.client.hset(self._presence, user_id, newest[0])
+            return None
+        self.client.hdel(self._presence, user_id)
+        return user_id
+
+    # ── Matchmaking queues ──
+
+    def _queue_key(self, topic_key):
+        return f"{self.prefix}queue:{topic_key}"
+
+    def queue_add(self, entry):
+        self.queue_remove(entry['user_id'])
+        pipe = self.client.pipeline()
+        pipe.zadd(self._queue_key(entry['topic_key']), {entry['user_id']: entry['rating']})
+        pipe.hset(self._queued, entry['user_id'], json.dumps(entry, separators=(',', ':')))
+        pipe.sadd(self._queue_topics, entry['topic_key'])
+        pipe.execute()
+
+    def queue_remove(self, user_id):
+        raw = self.client.hget(self._queued, user_id)
+        if not raw:
+            return None
+        entry = json.loads(raw)
+        pipe = self.client.pipeline()
+        pipe.zrem(self._queue_key(entry['topic_key']), user_id)
+        pipe.hdel(self._queued, user_id)
+        pipe.execute()
+        return entry
+
+    def queue_entries(self, topic_key):
+        user_ids = self.client.zrange(self._queue_key(topic_key), 0, -1)
+        if not user_ids:
+            self.client.srem(self._queue_topics, topic_key)
+            return []
+        return [json.loads(raw) for raw in self.client.hmget(self._queued, user_ids) if raw]
+
+    def queue_topics(self):
+        return list(self.client.smembers(self._queue_topics))
+
+    def queue_claim(self, user_ids):
+        entries = [json.loads(raw) if raw else None for raw in self.client.hmget(self._queued, list(user_ids))]
+        if None in entries:
+            return False
+        # ZREM is the atomic step: whoever removes a member owns it. Roll back on a partial claim.
+        claimed = []
+        for entry in entries:
+            if not self.client.zrem(self._queue_key(entry['topic_key']), entry['user_id']):
+                for e in claimed:
+                    self.client.zadd(self._queue_key(e['topic_key']), {e['user_id']: e['rating']})
+                return False
+            claimed.append(entry)
+        self.client.hdel(self._queued, *[e['user_id'] for e in claimed])
+        return True
+
+    def try_lock(self, name, seconds):
+        return bool(self.client.set(f"{self.prefix}lock:{name}", '1', nx=True, px=int(seconds * 1000)))
+
+    def release_lock(self, name):
+        self.client.delete(f"{self.prefix}lock:{name}")
+
+    def get_meta(self, name):
+        return self.client.get(f"{self.prefix}meta:{name}")
+
+    def set_meta(self, name, value):
+        self.client.set(f"{self.prefix}meta:{name}", str(value))
+
+    # ── Leaderboards ──
+
+    def _board_key(self, board):
+        return f"{self.prefix}board:{board}"
+
+    def board_set(self, board, scores):
+        if scores:
+            self.client.zadd(self._board_key(board), scores)
+
+    def board_incr(self, board, user_id, amount=1):
+        return self.client.zincrby(self._board_key(board), amount, user_id)
+
+    def board_page(self, board, start, count):
+        if count <= 0:
+            return []
+        rows = self.client.zrevrange(self._board_key(board), start, start + count - 1, withscores=True)
+        return [(user_id, int(score) if score.is_integer() else score) for user_id, score in rows]
+
+    def board_rank(self, board, user_id):
+        pipe = self.client.pipeline()
+        pipe.zrevrank(self._board_key(board), user_id)
+        pipe.zscore(self._board_key(board), user_id)
+        rank, score = pipe.execute()
+        if rank is None:
+            return None
+        return rank, int(score) if score.is_integer() else score
+
+    def board_size(self, board):
+        return self.client.zcard(self._board_key(board))
+
+    def board_expire(self, board, seconds):
+        self.client.expire(self._board_key(board), int(seconds))
+
+    def board_drop(self, board):
+        self.client.delete(self._board_key(board))
+
+    def board_replace(self, board, source):
+        if self.client.exists(self._board_key(source)):
+            self.client.rename(self._board_key(source), self._board_key(board))
+        else:
+            self.client.delete(self._board_key(board))
+
+    def set_profiles(self, profiles):
+        if profiles:
+            self.client.hset(self._profiles, mapping={uid: json.dumps(p, separators=(',', ':'))
+                                                      for uid, p in profiles.items()})
+
+    def get_profiles(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        return {uid: json.loads(raw) for uid, raw in zip(user_ids, self.client.hmget(self._profiles, user_ids)) if raw}
+
+
+class BattleStore:
+    """Module-level handle; ``configure`` picks the backend from app config."""
+
+    def __init__(self):
+        self._store = MemoryBattleStore()
+        self._url = ''
+
+    def configure(self, config):
+        url = config.get('BATTLE_STORE_URL', '') or ''
+        if url == self._url:
+            return
+        if url.startswith(('redis://', 'rediss://', 'unix://')):
+            self._store = RedisBattleStore(url, prefix=config.get('BATTLE_STORE_PREFIX', 'careersage:'),
+                                           room_ttl=config.get('BATTLE_ROOM_TTL', 2 * 3600),
+                                           sid_ttl=config.get('PRESENCE_SID_TTL', 120))
+        else:
+            self._store = MemoryBattleStore()
+        self._url = url
+
+    @property
+    def backend(self):
+        return self._store
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+
+battle_store = BattleStore()
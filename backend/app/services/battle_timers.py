@@ -0,0 +1,91 @@
+"""
+CareerSage Battle Timers — server-side deadlines for live battles
+One green thread per worker sleeps until the earliest deadline in a heap.
+Rescheduling or cancelling a timer is O(log n) / O(1): stale heap entries
+are skipped when they surface instead of being searched for.
+"""
+import heapq
+import itertools
+import time
+import eventlet
+from eventlet.queue import LightQueue, Empty
+from flask import current_app
+
+
+class TimerHeap:
+    """Keyed one-shot timers; scheduling a key again replaces its deadline."""
+
+    def __init__(self):
+        self._heap = []          # (when, seq, key, fn, args)
+        self._live = {}          # key -> seq of its current entry
+        self._seq = itertools.count()
+        self._wake = LightQueue()
+        self._thread = None
+        self._pool = None
+        self.stats = {'scheduled': 0, 'fired': 0, 'cancelled': 0}
+
+    def ensure_started(self, app):
+        """Start (or restart, if it died) this worker's timer loop."""
+        if self._thread is not None and not self._thread.dead:
+            return
+        self._pool = eventlet.GreenPool(app.config.get('BATTLE_TIMER_CONCURRENCY', 16))
+        self._thread = eventlet.spawn(self._run, app)
+
+    def schedule(self, key, delay, fn, *args):
+        """Call ``fn(app, *args)`` in ``delay`` seconds (inside an app context).
+
+        Starts this worker's timer loop if nothing has yet: with several
+        workers, an answer can land on one that never created a battle.
+        """
+        self.ensure_started(current_app._get_current_object())
+        seq = next(self._seq)
+        when = time.time() + delay
+        self._live[key] = seq
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (when, seq, key, fn, args))
+        self.stats['scheduled'] += 1
+        if earliest is None or when < earliest:
+            self._wake.put(None)
+
+    def cancel(self, *keys):
+        for key in keys:
+            if self._live.pop(key, None) is not None:
+                self.stats['cancelled'] += 1
+
+    def pending(self, key):
+        """Whether ``key`` will still fire: only true while the loop is running."""
+        return key in self._live and self._thread is not None and not self._thread.dead
+
+    def __len__(self):
+        return len(self._live)
+
+    def _run(self, app):
+        while True:
+            # Drop entries that were cancelled or superseded
+            while self._heap and self._live.get(self._heap[0][2]) != self._heap[0][1]:
+                heapq.heappop(self._heap)
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                self._wake.get(timeout=timeout)
+                continue  # an earlier deadline arrived; recompute
+            except Empty:
+                pass
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                when, seq, key, fn, args = heapq.heappop(self._heap)
+                if self._live.get(key) != seq:
+                    continue
+                del self._live[key]
+                self.stats['fired'] += 1
+                self._pool.spawn_n(self._fire, app, key, fn, args)
+
+    @staticmethod
+    def _fire(app, key, fn, args):
+        with app.app_context():
+            try:
+                fn(app, *args)
+            except Exception as e:
+                app.logger.error(f"[TIMER] {key} failed: {e}")
+
+
+battle_timers = TimerHeap()
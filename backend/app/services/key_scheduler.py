@@ -0,0 +1,178 @@
+"""
+CareerSage Key Scheduler — health-aware routing across LLM API keys
+Tracks latency and errors per key, honours Retry-After on 429s and opens a
+circuit on keys that keep failing, so traffic drains away from a bad key
+instead of a fixed third of requests landing on it.
+"""
+import time
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class KeyHealth:
+    """Rolling health of a single API key."""
+
+    def __init__(self):
+        self.latency = None         # EWMA of successful call latency (seconds)
+        self.error_rate = 0.0       # EWMA of failures (0..1)
+        self.failures = 0           # consecutive failures
+        self.state = CLOSED
+        self.open_until = 0.0       # circuit stays open until this time
+        self.open_for = 0.0         # current open duration (doubles on failed probes)
+        self.cooldown_until = 0.0   # Retry-After from a 429
+        self.probing = False        # half-open: one trial call in flight
+        self.calls = 0
+        self.rate_limited = 0
+
+    def to_dict(self, now):
+        return {
+            'state': self.state,
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'error_rate': round(self.error_rate, 3),
+            'failures': self.failures,
+            'cooldown': max(0.0, round(self.cooldown_until - now, 1)),
+            'calls': self.calls,
+            'rate_limited': self.rate_limited,
+        }
+
+
+class KeyScheduler:
+    """Chooses which key serves the next call.
+
+    - Keys cooling down after a 429 (``Retry-After``) or with an open
+      circuit are skipped.
+    - A circuit opens after ``failure_threshold`` consecutive failures; once
+      ``open_seconds`` pass a single probe call is let through (half-open).
+      A successful probe closes it, a failed one reopens it for twice as long
+      (capped at ``max_open_seconds``).
+    - Among usable keys the one with the lowest expected wait wins:
+      ``(in_flight + 1) x latency EWMA``, inflated by its error rate. Keys
+      with no samples yet are assumed to be average.
+    """
+
+    def __init__(self, alpha=0.3, failure_threshold=3, open_seconds=30, max_open_seconds=300,
+                 default_retry_after=10):
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.default_retry_after = default_retry_after
+        self._keys = {}
+
+    def configure(self, config):
+        self.alpha = config.get('AI_KEY_EWMA_ALPHA', self.alpha)
+        self.failure_threshold = config.get('AI_KEY_FAILURE_THRESHOLD', self.failure_threshold)
+        self.open_seconds = config.get('AI_KEY_OPEN_SECONDS', self.open_seconds)
+        self.max_open_seconds = config.get('AI_KEY_MAX_OPEN_SECONDS', self.max_open_seconds)
+        self.default_retry_after = config.get('AI_KEY_DEFAULT_RETRY_AFTER', self.default_retry_after)
+
+    def resize(self, num_keys):
+        """Track exactly ``num_keys`` keys (history is kept for surviving indexes)."""
+        self._keys = {i: self._keys.get(i) or KeyHealth() for i in range(num_keys)}
+
+    def health(self, key_index):
+        return self._keys[key_index]
+
+    # ──────────────────────────────────────────
+    #  Routing
+    # ──────────────────────────────────────────
+
+    def usable(self, key_index, now=None):
+        now = now or time.time()
+        h = self._keys[key_index]
+        if h.cooldown_until > now:
+            return False
+        if h.state == OPEN:
+            if h.open_until > now:
+                return False
+            h.state = HALF_OPEN
+        if h.state == HALF_OPEN:
+            return not h.probing
+        return True
+
+    def order(self, in_flight, exclude=(), key_hint=None):
+        """Usable keys, best first. ``in_flight`` maps key_index -> active calls."""
+        now = time.time()
+        known = [h.latency for h in self._keys.values() if h.latency is not None]
+        baseline = sum(known) / len(known) if known else 1.0
+
+        def cost(i):
+            h = self._keys[i]
+            latency = h.latency if h.latency is not None else baseline
+            expected = (in_flight.get(i, 0) + 1) * latency * (1 + 4 * h.error_rate)
+            return (i in exclude, expected, in_flight.get(i, 0), i != key_hint)
+
+        return sorted((i for i in self._keys if self.usable(i, now)), key=cost)
+
+    def begin(self, key_index):
+        h = self._keys[key_index]
+        h.calls += 1
+        if h.state == HALF_OPEN:
+            h.probing = True
+
+    # ──────────────────────────────────────────
+    #  Outcomes
+    # ──────────────────────────────────────────
+
+    def _ewma(self, old, sample):
+        return sample if old is None else old + self.alpha * (sample - old)
+
+    def record_success(self, key_index, latency):
+        h = self._keys.get(key_index)
+        if h is None:
+            return
+        h.latency = self._ewma(h.latency, latency)
+        h.error_rate = self._ewma(h.error_rate, 0.0)
+        h.failures = 0
+        h.probing = False
+        h.state, h.open_for = CLOSED, 0.0
+
+    def cancel(self, key_index, elapsed=None):
+        """A call was abandoned (lost a hedge race): no verdict, but count how slow it was."""
+        h = self._keys.get(key_index)
+        if h is None:
+            return
+        h.probing = False
+        if elapsed is not None:
+            h.latency = self._ewma(h.latency, elapsed)
+
+    def record_failure(self, key_index, status=None, retry_after=None):
+        """Count a failed call. A 429 only cools the key down; anything else feeds the breaker."""
+        h = self._keys.get(key_index)
+        if h is None:
+            return
+        now = time.time()
+        was_probe, h.probing = h.probing, False
+
+        if status == 429:
+            h.rate_limited += 1
+            h.cooldown_until = now + (retry_after if retry_after is not None else self.default_retry_after)
+            if was_probe:
+                h.state = OPEN  # probe told us nothing; look again after the cooldown
+                h.open_until = h.cooldown_until
+            return
+
+        h.error_rate = self._ewma(h.error_rate, 1.0)
+        h.failures += 1
+        if was_probe:
+            h.open_for = min(max(h.open_for, self.open_seconds) * 2, self.max_open_seconds)
+        elif h.failures >= self.failure_threshold and h.state == CLOSED:
+            h.open_for = self.open_seconds
+        else:
+            return
+        h.state = OPEN
+        h.open_until = now + h.open_for
+
+    def next_available_in(self):
+        """Seconds until some key becomes usable again (0 if one already is)."""
+        now = time.time()
+        waits = []
+        for i, h in self._keys.items():
+            if self.usable(i, now):
+                return 0.0
+            waits.append(max(h.cooldown_until, h.open_until if h.state == OPEN else 0) - now)
+        return max(0.0, min(waits)) if waits else 0.0
+
+    def stats(self):
+        now = time.time()
+        return {i: h.to_dict(now) for i, h in self._keys.items()}
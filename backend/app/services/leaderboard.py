@@ -0,0 +1,243 @@
+"""
+CareerSage Leaderboard — ranked boards maintained as battles finish
+Boards live in the battle store (RankedSet in memory, sorted sets in Redis):
+
+- ``global``            every player with stats, by rating
+- ``topic:<topic_key>`` wins against real opponents on one topic
+- ``weekly:<YYYY-Www>`` wins against real opponents in one ISO week (UTC)
+
+finalize_battle pushes each result in; each player's card (name, record,
+badges) is stored next to the boards, so serving a page or a rank is a
+store lookup with no Mongo queries. Boards are built from Mongo when they
+are needed and the store has none, or has ones from a different
+LEADERBOARD_BUILD_VERSION: the version a build used is kept in the store,
+so bumping it makes every worker's next read rebuild boards that drifted.
+"""
+from datetime import datetime, timedelta
+from bson import ObjectId
+from .battle_store import battle_store
+from ..utils.topics import canonical_topic
+
+GLOBAL = 'global'
+CARD_FIELDS = {'user_id': 1, 'rating': 1, 'wins': 1, 'losses': 1, 'total_battles': 1, 'badges': 1}
+WEEKLY_KEEP = 3 * 7 * 24 * 3600   # weekly boards expire three weeks after their last update
+
+
+def topic_key(topic):
+    return canonical_topic(topic) or (topic or '').strip().lower()
+
+
+def week_id(when=None):
+    year, week, _ = (when or datetime.utcnow()).isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def week_start(when=None):
+    when = when or datetime.utcnow()
+    return datetime(when.year, when.month, when.day) - timedelta(days=when.weekday())
+
+
+def weekly_kept(week):
+    """Whether ``week`` (YYYY-Www) is recent enough to still have a board."""
+    try:
+        start = datetime.strptime(f'{week}-1', '%G-W%V-%u')
+    except ValueError:
+        return False
+    return start >= week_start(datetime.utcnow() - timedelta(seconds=WEEKLY_KEEP))
+
+
+def board_name(kind='global', topic=None, week=None):
+    """Store name for a board; None for an unknown kind or a topic board without a topic."""
+    if kind == 'global':
+        return GLOBAL
+    if kind == 'weekly':
+        return f'weekly:{week or week_id()}'
+    if kind == 'topic' and topic:
+        return f'topic:{topic_key(topic)}'
+    return None
+
+
+def card(stats, name):
+    return {
+        'name': name,
+        'rating': stats.rating,
+        'wins': stats.wins,
+        'losses': stats.losses,
+        'total_battles': stats.total_battles,
+        'badges': list(stats.badges or []),
+    }
+
+
+class Leaderboard:
+    """Incrementally maintained boards plus denormalized player cards."""
+
+    # ──────────────────────────────────────────
+    #  Reads
+    # ──────────────────────────────────────────
+
+    def page(self, app, board, page=1, per_page=20):
+        """Rows for one page of a board and the board's size."""
+        self.ensure_built(app)
+        start = (page - 1) * per_page
+        entries = battle_store.board_page(board, start, per_page)
+        profiles = self.profiles([uid for uid, _ in entries])
+        rows = [self.row(start + i + 1, user_id, score, profiles.get(user_id) or {'name': 'Unknown'}, board)
+                for i, (user_id, score) in enumerate(entries)]
+        return rows, battle_store.board_size(board)
+
+    def rank_of(self, app, board, user_id):
+        """A user's row on a board (O(log n)), or None when they are not on it."""
+        self.ensure_built(app)
+        found = battle_store.board_rank(board, user_id)
+        if found is None:
+            return None
+        rank, score = found
+        profile = self.profiles([user_id]).get(user_id) or {'name': 'Unknown'}
+        return self.row(rank + 1, user_id, score, profile, board)
+
+    def profiles(self, user_ids):
+        """Cards for ``user_ids``; ones missing from the store are loaded from Mongo and stored."""
+        from ..models.battle import BattleStats
+
+        found = battle_store.get_profiles(user_ids)
+        missing = [ObjectId(uid) for uid in user_ids if uid not in found and ObjectId.is_valid(uid)]
+        if missing:
+            cards = self._cards(list(BattleStats._get_collection().find({'user_id': {'$in': missing}}, CARD_FIELDS)))
+            battle_store.set_profiles(cards)
+            found.update(cards)
+        return found
+
+    @staticmethod
+    def row(rank, user_id, score, profile, board):
+        total = profile.get('total_battles', 0)
+        row = {
+            'rank': rank,
+            'user_id': user_id,
+            'name': profile.get('name', 'Unknown'),
+            'rating': profile.get('rating', 1000),
+            'wins': profile.get('wins', 0),
+            'losses': profile.get('losses', 0),
+            'total_battles': total,
+            'badges': profile.get('badges', []),
+            'win_rate': round((profile.get('wins', 0) / total * 100), 1) if total > 0 else 0,
+        }
+        if board != GLOBAL:
+            row['score'] = score
+        return row
+
+    # ──────────────────────────────────────────
+    #  Writes
+    # ──────────────────────────────────────────
+
+    def record_battle(self, app, battle, stats):
+        """Push a finished battle in. ``battle`` is ``BattleResult.to_dict()``,
+        ``stats`` maps user_id -> BattleStats as finalize_battle left them."""
+        self.ensure_built(app)
+        players = [battle['challenger']]
+        if not battle['is_ai_opponent']:
+            players.append(battle['opponent'])
+        players = [p for p in players if p and p.get('id') in stats]
+        battle_store.board_set(GLOBAL, {p['id']: stats[p['id']].rating for p in players})
+        battle_store.set_profiles({p['id']: card(stats[p['id']], p['name']) for p in players})
+
+        winner = battle.get('winner_id')
+        if battle['is_ai_opponent'] or not winner:
+            return
+        finished = datetime.fromisoformat(battle['completed_at']) if battle.get('completed_at') else None
+        weekly = board_name('weekly', week=week_id(finished))
+        battle_store.board_incr(board_name('topic', topic=battle['topic']), winner, 1)
+        battle_store.board_incr(weekly, winner, 1)
+        battle_store.board_expire(weekly, WEEKLY_KEEP)
+
+    # ──────────────────────────────────────────
+    #  Building from Mongo
+    # ──────────────────────────────────────────
+
+    def ensure_built(self, app):
+        version = str(app.config.get('LEADERBOARD_BUILD_VERSION', 1))
+        if battle_store.get_meta('leaderboard_build') == version and battle_store.board_size(GLOBAL):
+            return
+        if not battle_store.try_lock('leaderboard_build', 300):
+            return  # another worker is building; serve what is there
+        self.rebuild(app)
+
+    @staticmethod
+    def _cards(stats):
+        """{user_id: card} for raw BattleStats documents (CARD_FIELDS), with names from User."""
+        from ..models.battle import BattleStats
+        from ..models.user import User
+
+        names = {u['_id']: u.get('name', 'Unknown') for u in User._get_collection().find(
+            {'_id': {'$in': [s['user_id'] for s in stats]}}, {'name': 1})}
+        return {str(s['user_id']): card(BattleStats._from_son(s), names.get(s['user_id'], 'Unknown')) for s in stats}
+
+    def _load_global(self, board, stats, chunk):
+        for i in range(0, len(stats), chunk):
+            batch = stats[i:i + chunk]
+            battle_store.board_set(board, {str(s['user_id']): s.get('rating', 1000) for s in batch})
+            battle_store.set_profiles(self._cards(batch))
+
+    def rebuild(self, app, chunk=1000):
+        """Load every board from BattleStats / BattleResult. Returns the number of players.
+
+        The global board is built aside and swapped in, so players whose stats
+        are gone drop off it and readers never see it half-built. Weekly boards
+        are rebuilt for every week still within WEEKLY_KEEP.
+        """
+        from ..models.battle import BattleResult, BattleStats
+
+        started = datetime.utcnow()
+        building = f'{GLOBAL}:building'
+        battle_store.board_drop(building)
+        stats = list(BattleStats._get_collection().find({}, CARD_FIELDS))
+        self._load_global(building, stats, chunk)
+        battle_store.board_replace(GLOBAL, building)
+        # Results finished during the build went to the old board; carry them over
+        self._load_global(GLOBAL, list(BattleStats._get_collection().find(
+            {'updated_at': {'$gte': started}}, CARD_FIELDS)), chunk)
+
+        decided = {'status': 'completed', 'is_ai_opponent': {'$ne': True}, 'winner_id': {'$ne': None}}
+        topic_wins = {}
+        for row in BattleResult._get_collection().aggregate([
+            {'$match': decided},
+            {'$group': {'_id': {'topic': '$topic', 'winner': '$winner_id'}, 'wins': {'$sum': 1}}},
+        ]):
+            board = board_name('topic', topic=row['_id']['topic'])
+            if board:
+                wins = topic_wins.setdefault(board, {})
+                winner = str(row['_id']['winner'])
+                wins[winner] = wins.get(winner, 0) + row['wins']
+        for board, wins in topic_wins.items():
+            battle_store.board_drop(board)
+            battle_store.board_set(board, wins)
+
+        # Weekly boards expire WEEKLY_KEEP after their last win, as record_battle leaves them
+        oldest = week_start(started - timedelta(seconds=WEEKLY_KEEP))
+        weeks, last_win = {}, {}
+        for row in BattleResult._get_collection().aggregate([
+            {'$match': dict(decided, completed_at={'$gte': oldest})},
+            {'$group': {'_id': {'week': {'$dateToString': {'format': '%G-W%V', 'date': '$completed_at'}},
+                                'winner': '$winner_id'},
+                        'wins': {'$sum': 1}, 'last': {'$max': '$completed_at'}}},
+        ]):
+            week = row['_id']['week']
+            weeks.setdefault(week, {})[str(row['_id']['winner'])] = row['wins']
+            last_win[week] = max(last_win.get(week, row['last']), row['last'])
+        day = oldest
+        while day <= started:
+            battle_store.board_drop(board_name('weekly', week=week_id(day)))
+            day += timedelta(days=7)
+        for week, wins in weeks.items():
+            keep = WEEKLY_KEEP - (started - last_win[week]).total_seconds()
+            if keep > 0:
+                board = board_name('weekly', week=week)
+                battle_store.board_set(board, wins)
+                battle_store.board_expire(board, keep)
+
+        battle_store.set_meta('leaderboard_build', app.config.get('LEADERBOARD_BUILD_VERSION', 1))
+        app.logger.info(f"[LEADERBOARD] Built {len(stats)} players, {len(topic_wins)} topics, {len(weeks)} weeks "
+                        f"in {(datetime.utcnow() - started).total_seconds():.2f}s")
+        return len(stats)
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,363 @@
+"""
+CareerSage LLM Backends — pluggable chat-completion providers
+Selected with LLM_BACKEND: "nvidia" (default), "ollama", or "fake".
+
+Backends only speak HTTP (or pretend to); concurrency, retries and logging
+stay in AIService and the gateway. ``complete`` returns the full text and
+``stream`` yields text chunks; both raise on failure (HTTP errors as
+UpstreamError, so the key scheduler can see 429s and Retry-After).
+"""
+import hashlib
+import json
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+class UpstreamError(Exception):
+    """Non-2xx response from the provider."""
+
+    def __init__(self, status, message='', retry_after=None):
+        super().__init__(f"HTTP {status}: {message}" if message else f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def check_response(response):
+    """raise_for_status, but keeping the status code and Retry-After."""
+    if response.status_code < 400:
+        return
+    raise UpstreamError(response.status_code, (response.reason or '')[:200],
+                        _retry_after(response.headers.get('Retry-After')))
+
+
+class LLMBackend:
+    """Interface every backend implements."""
+
+    name = 'base'
+    model = None
+
+    @property
+    def num_keys(self):
+        """Independent credentials/slots the gateway can spread load across."""
+        return 1
+
+    def complete(self, prompt, system_msg, key_index=0):
+        raise NotImplementedError
+
+    def stream(self, prompt, system_msg, key_index=0):
+        raise NotImplementedError
+
+
+# ──────────────────────────────────────────
+#  NVIDIA (OpenAI-compatible chat completions)
+# ──────────────────────────────────────────
+
+class NvidiaBackend(LLMBackend):
+    name = 'nvidia'
+
+    def __init__(self, session, base_url, model, api_keys, timeout=(10, 40)):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_keys = [k for k in api_keys if k] or ['']
+        self.timeout = timeout  # (connect_timeout, read_timeout)
+
+    @property
+    def num_keys(self):
+        return len(self.api_keys)
+
+    def _request(self, prompt, system_msg, key_index, stream):
+        return {
+            'url': f"{self.base_url}/chat/completions",
+            'headers': {
+                "Authorization": f"Bearer {self.api_keys[key_index % len(self.api_keys)]}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream" if stream else "application/json"
+            },
+            'json': {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": system_msg},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.6,
+                "top_p": 0.95,
+                "max_tokens": 4096,
+                "stream": stream
+            },
+            'timeout': self.timeout,
+        }
+
+    def complete(self, prompt, system_msg, key_index=0):
+        response = self.session.post(**self._request(prompt, system_msg, key_index, False))
+        check_response(response)
+        data = response.json()
+        if 'choices' not in data or not data['choices']:
+            return None
+        return data['choices'][0]['message']['content']
+
+    def stream(self, prompt, system_msg, key_index=0):
+        with self.session.post(stream=True, **self._request(prompt, system_msg, key_index, True)) as response:
+            check_response(response)
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                choices = chunk.get('choices') or []
+                delta = (choices[0].get('delta') or {}).get('content') if choices else None
+                if delta:
+                    yield delta
+
+
+# ──────────────────────────────────────────
+#  Ollama (native /api/chat, NDJSON streaming)
+# ──────────────────────────────────────────
+
+class OllamaBackend(LLMBackend):
+    name = 'ollama'
+
+    def __init__(self, session, base_url, model, timeout=(10, 120)):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+
+    def _payload(self, prompt, system_msg, stream):
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": prompt}
+            ],
+            "options": {"temperature": 0.6, "top_p": 0.95, "num_predict": 4096},
+            "stream": stream
+        }
+
+    def complete(self, prompt, system_msg, key_index=0):
+        response = self.session.post(f"{self.base_url}/api/chat",
+                                     json=self._payload(prompt, system_msg, False),
+                                     timeout=self.timeout)
+        check_response(response)
+        return (response.json().get('message') or {}).get('content')
+
+    def stream(self, prompt, system_msg, key_index=0):
+        with self.session.post(f"{self.base_url}/api/chat",
+                               json=self._payload(prompt, system_msg, True),
+                               timeout=self.timeout, stream=True) as response:
+            check_response(response)
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                delta = (chunk.get('message') or {}).get('content')
+                if delta:
+                    yield delta
+                if chunk.get('done'):
+                    break
+
+
+# ──────────────────────────────────────────
+#  Fake (offline, deterministic stand-in for load tests)
+# ──────────────────────────────────────────
+
+class FakeBackendError(UpstreamError):
+    """Injected failure from FakeBackend (LLM_FAKE_ERROR_RATE)."""
+
+    def __init__(self, message='injected failure'):
+        super().__init__(503, message)
+
+
+class LatencyModel:
+    """Samples total response latency (seconds) from a small spec string.
+
+    ``constant:0.5``, ``uniform:0.2,1.5``, ``normal:1.0,0.3``,
+    ``lognormal:0.0,0.5`` (mu/sigma of the underlying normal), or ``replay``
+    to use each recording's own ``latency`` field.
+    """
+
+    def __init__(self, spec='constant:0', rng=None):
+        kind, _, args = (spec or 'constant:0').partition(':')
+        self.kind = kind.strip().lower()
+        self.args = [float(a) for a in args.split(',') if a.strip()]
+        self.rng = rng or random.Random(0)
+
+    def sample(self, recorded=None):
+        if self.kind == 'replay':
+            return float(recorded or 0)
+        if self.kind == 'uniform':
+            return self.rng.uniform(*self.args[:2])
+        if self.kind == 'normal':
+            return max(0.0, self.rng.gauss(*self.args[:2]))
+        if self.kind == 'lognormal':
+            return self.rng.lognormvariate(*self.args[:2])
+        return self.args[0] if self.args else 0.0
+
+
+class FakeBackend(LLMBackend):
+    """Replays recorded responses with a configurable latency distribution.
+
+    Recordings file (LLM_FAKE_RECORDINGS) is a JSON list of
+    ``{"contains": "<prompt substring>", "content": "...", "latency": 1.2}``;
+    the first entry whose substring appears in the prompt wins. Prompts with
+    no recording get a built-in canned response shaped like the real thing
+    (roadmap / quiz questions / resume), so the whole app works offline.
+    The same seed and call sequence always yields the same latencies.
+    """
+
+    name = 'fake'
+    model = 'fake'
+
+    def __init__(self, recordings=None, latency='constant:0', first_token_ratio=0.2,
+                 error_rate=0.0, num_keys=3, seed=0):
+        self.recordings = recordings or []
+        self.latency_spec = latency
+        self.first_token_ratio = first_token_ratio
+        self.error_rate = error_rate
+        self._num_keys = num_keys
+        self.seed = seed
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        recordings = []
+        if path:
+            with open(path, encoding='utf-8') as f:
+                recordings = json.load(f)
+        return cls(recordings=recordings, **kwargs)
+
+    @property
+    def num_keys(self):
+        return self._num_keys
+
+    def _rng(self, prompt):
+        self.calls += 1
+        digest = hashlib.sha1(f"{self.seed}:{self.calls}:{prompt}".encode('utf-8')).hexdigest()
+        return random.Random(int(digest[:12], 16))
+
+    def _lookup(self, prompt):
+        for rec in self.recordings:
+            if rec.get('contains', '') in prompt:
+                return rec.get('content', ''), rec.get('latency')
+        return canned_response(prompt), None
+
+    def _plan(self, prompt):
+        rng = self._rng(prompt)
+        if self.error_rate and rng.random() < self.error_rate:
+            time.sleep(LatencyModel(self.latency_spec, rng).sample() * self.first_token_ratio)
+            raise FakeBackendError()
+        content, recorded = self._lookup(prompt)
+        return content, LatencyModel(self.latency_spec, rng).sample(recorded)
+
+    def complete(self, prompt, system_msg, key_index=0):
+        content, latency = self._plan(prompt)
+        time.sleep(latency)
+        return content
+
+    def stream(self, prompt, system_msg, key_index=0):
+        content, latency = self._plan(prompt)
+        time.sleep(latency * self.first_token_ratio)
+        chunks = [content[i:i + 24] for i in range(0, len(content), 24)] or ['']
+        gap = latency * (1 - self.first_token_ratio) / max(len(chunks), 1)
+        for chunk in chunks:
+            yield chunk
+            if gap:
+                time.sleep(gap)
+
+
+def canned_response(prompt):
+    """Deterministic JSON shaped like what each prompt type expects."""
+    if '"questions"' in prompt:
+        questions = [{
+            "id": i + 1,
+            "question": f"Sample question {i + 1}?",
+            "category": "Core Concepts",
+            "options": ["Option A", "Option B", "Option C", "Option D"],
+            "correct": i % 4,
+            "explanation": "Canned answer from the fake LLM backend."
+        } for i in range(10)]
+        return json.dumps({"questions": questions})
+
+    if '"nodes"' in prompt:
+        count = 14 if '12-15' in prompt else 8
+        nodes = [{
+            "id": f"step-{i + 1}",
+            "title": f"Learning Step {i + 1}",
+            "description": "Canned roadmap node from the fake LLM backend.",
+            "type": "required" if i % 3 else "recommended",
+            "estimatedTime": "2 weeks",
+            "topics": ["Concept A", "Concept B", "Concept C"],
+            "resources": []
+        } for i in range(count)]
+        # root -> two branches -> merge -> ... keeps the DAG layout interesting
+        edges = []
+        for i in range(1, count):
+            parent = max(0, i - 1 - (i % 2))
+            edges.append({"source": f"step-{parent + 1}", "target": f"step-{i + 1}"})
+        return json.dumps({"title": "Roadmap", "description": "Fake", "nodes": nodes, "edges": edges})
+
+    if '"summary"' in prompt:
+        return json.dumps({"summary": "Canned resume summary from the fake LLM backend.",
+                           "experience": [], "education": [], "skills": {}, "projects": [],
+                           "certifications": []})
+
+    return json.dumps({})
+
+
+# ──────────────────────────────────────────
+#  Factory
+# ──────────────────────────────────────────
+
+def nvidia_api_keys(config):
+    """All configured NVIDIA keys: the NVIDIA_API_KEYS list, then the legacy slots.
+
+    Blank entries and duplicates are dropped; order is kept so key indexes
+    stay stable across restarts.
+    """
+    keys = [k.strip() for k in (config.get('NVIDIA_API_KEYS') or '').split(',')]
+    keys += [config.get(name, '') for name in ('NVIDIA_API_KEY', 'NVIDIA_API_KEY_2', 'NVIDIA_API_KEY_3')]
+    return list(dict.fromkeys(k for k in keys if k))
+
+
+def create_backend(config, session):
+    """Build the backend selected by LLM_BACKEND from app config."""
+    name = (config.get('LLM_BACKEND') or 'nvidia').lower()
+    model = config.get('LLM_MODEL')
+
+    if name == 'ollama':
+        return OllamaBackend(session, config.get('OLLAMA_BASE_URL', 'http://localhost:11434'),
+                             model or config.get('OLLAMA_MODEL', 'llama2'))
+
+    if name == 'fake':
+        return FakeBackend.from_file(
+            config.get('LLM_FAKE_RECORDINGS'),
+            latency=config.get('LLM_FAKE_LATENCY', 'constant:0'),
+            error_rate=config.get('LLM_FAKE_ERROR_RATE', 0.0),
+            num_keys=config.get('LLM_FAKE_KEYS', 3),
+            seed=config.get('LLM_FAKE_SEED', 0),
+        )
+
+    # The 8b model is the default on purpose: 70b caused multi-minute delays on AWS.
+    # Set LLM_MODEL explicitly to opt into anything else.
+    return NvidiaBackend(session, config.get('NVIDIA_BASE_URL', 'https://integrate.api.nvidia.com/v1'),
+                         model or 'meta/llama-3.1-8b-instruct', nvidia_api_keys(config))
@@ -0,0 +1,279 @@
+"""
+CareerSage LLM Gateway — per-key concurrency limits, admission control, coalescing
+Every upstream LLM call goes through here so a burst of requests can't flood
+the provider or pile up green threads on the single eventlet worker.
+"""
+import hashlib
+import time
+from collections import deque
+import eventlet
+from eventlet.event import Event
+from eventlet.queue import Empty, LightQueue
+from eventlet.semaphore import Semaphore
+from .key_scheduler import KeyScheduler
+
+
+class GatewayBusy(Exception):
+    """Raised when the gateway queue is full or a slot wait timed out."""
+
+
+class LLMGateway:
+    """Bounded, coalescing front door for upstream LLM calls.
+
+    - Each API key has its own in-flight semaphore (``max_per_key``).
+    - Callers that can't get a slot wait in a bounded queue; once
+      ``max_queue`` callers are waiting new calls are rejected outright.
+    - Identical prompts in flight at the same time share one upstream call.
+    - Which key serves a call is up to the KeyScheduler (health, 429
+      cooldowns, circuit breakers), not a fixed rotation.
+    - Optional hedging: if an attempt hasn't produced its first token within
+      the ``hedge_percentile`` of recent first-token latency, a duplicate is
+      fired on another key; the first to produce output wins and the other
+      is killed.
+    """
+
+    def __init__(self):
+        self.scheduler = KeyScheduler()
+        self.hedge_enabled = False
+        self.hedge_percentile = 95
+        self.hedge_min_delay = 1.0
+        self.hedge_min_samples = 20
+        self._first_token = {}    # kind -> deque of recent first-token latencies
+        self._key_slots = {}      # key_index -> Semaphore(max_per_key)
+        self._capacity = None     # Semaphore(total slots across all keys)
+        self._shape = None        # (num_keys, max_per_key) the slots were built for
+        self._inflight = {}       # fingerprint -> Event
+        self._waiting = 0
+        self._stats = {
+            'calls': 0,
+            'upstream': 0,
+            'coalesced': 0,
+            'rejected': 0,
+            'failed': 0,
+            'hedges_fired': 0,
+            'hedges_won': 0,
+        }
+
+    def configure(self, config):
+        self.hedge_enabled = config.get('AI_HEDGE_ENABLED', self.hedge_enabled)
+        self.hedge_percentile = config.get('AI_HEDGE_PERCENTILE', self.hedge_percentile)
+        self.hedge_min_delay = config.get('AI_HEDGE_MIN_DELAY', self.hedge_min_delay)
+        self.hedge_min_samples = config.get('AI_HEDGE_MIN_SAMPLES', self.hedge_min_samples)
+        self.scheduler.configure(config)
+
+    # ──────────────────────────────────────────
+    #  Slots
+    # ──────────────────────────────────────────
+
+    def _ensure_slots(self, num_keys, max_per_key):
+        """(Re)build semaphores when the key count or limit changes."""
+        if self._shape == (num_keys, max_per_key):
+            return
+        self._key_slots = {i: Semaphore(max_per_key) for i in range(num_keys)}
+        self._capacity = Semaphore(num_keys * max_per_key)
+        self._shape = (num_keys, max_per_key)
+        self.scheduler.resize(num_keys)
+
+    def _in_flight(self):
+        return {i: self._shape[1] - sem.counter for i, sem in self._key_slots.items()}
+
+    def _acquire(self, key_hint, exclude, max_queue, timeout):
+        """Wait for a free slot and return the key index that owns it."""
+        if not self._capacity.acquire(blocking=False):
+            if self._waiting >= max_queue:
+                self._stats['rejected'] += 1
+                raise GatewayBusy(f"queue full ({self._waiting} waiting)")
+            self._waiting += 1
+            try:
+                if not self._capacity.acquire(timeout=timeout):
+                    self._stats['rejected'] += 1
+                    raise GatewayBusy(f"no slot after {timeout}s")
+            finally:
+                self._waiting -= 1
+
+        # Holding a capacity token guarantees at least one key has a free slot,
+        # but the scheduler may rule keys out (cooling down / circuit open).
+        for key_index in self.scheduler.order(self._in_flight(), exclude, key_hint):
+            if self._key_slots[key_index].acquire(blocking=False):
+                self.scheduler.begin(key_index)
+                return key_index
+
+        self._capacity.release()
+        wait = self.scheduler.next_available_in()
+        self._stats['rejected'] += 1
+        raise GatewayBusy(f"no healthy key (next one usable in {wait:.0f}s)")
+
+    def _try_acquire_other(self, exclude):
+        """Grab a free slot on a key not in ``exclude`` without waiting (for hedges)."""
+        if not self._capacity.acquire(blocking=False):
+            return None
+        for key_index in self.scheduler.order(self._in_flight(), exclude):
+            if key_index not in exclude and self._key_slots[key_index].acquire(blocking=False):
+                self.scheduler.begin(key_index)
+                return key_index
+        self._capacity.release()
+        return None
+
+    def _release(self, key_index):
+        self._key_slots[key_index].release()
+        self._capacity.release()
+
+    # ──────────────────────────────────────────
+    #  Public API
+    # ──────────────────────────────────────────
+
+    @staticmethod
+    def fingerprint(*parts):
+        """Stable identity for a request, used to coalesce duplicates."""
+        return hashlib.sha1("\x1f".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+    def submit(self, fingerprint, call, key_hint=None, num_keys=3, max_per_key=4,
+               max_queue=64, queue_timeout=30, attempts=2, kind='complete'):
+        """Run ``call(key_index, claim)`` under the gateway and return its result.
+
+        ``call`` returns None or raises on failure (an exception's ``status``
+        and ``retry_after`` attributes are passed to the scheduler); the
+        gateway then retries on a different key up to ``attempts`` times.
+        ``call`` must invoke ``claim()`` when it has its first output (first
+        token, or the whole reply) and give up if it returns False: a hedged
+        twin got there first. First-token latencies are tracked per ``kind``.
+        Concurrent submits with the same fingerprint wait for the leader's
+        result instead of calling out.
+        """
+        self._stats['calls'] += 1
+
+        pending = self._inflight.get(fingerprint)
+        if pending is not None:
+            self._stats['coalesced'] += 1
+            return pending.wait()
+
+        event = Event()
+        self._inflight[fingerprint] = event
+        result = None
+        try:
+            self._ensure_slots(num_keys, max_per_key)
+            result = self._run(call, key_hint, max_queue, queue_timeout, attempts, kind)
+            return result
+        finally:
+            self._inflight.pop(fingerprint, None)
+            event.send(result)
+
+    def _run(self, call, key_hint, max_queue, queue_timeout, attempts, kind):
+        tried = set()
+        for _ in range(max(1, attempts)):
+            key_index = self._acquire(key_hint, tried, max_queue, queue_timeout)
+            tried.add(key_index)
+            delay = self.hedge_delay(kind)
+            if delay is None:
+                result = self._attempt(call, key_index, lambda: True, kind)
+            else:
+                result = self._race(call, key_index, tried, delay, kind)
+            if result is not None:
+                return result
+            key_hint = None
+        return None
+
+    def _attempt(self, call, key_index, claim, kind):
+        """One upstream call on an already-acquired slot; releases it and records the outcome."""
+        self._stats['upstream'] += 1
+        start = time.time()
+        result, error, finished, lost = None, None, False, []
+
+        def timed_claim():
+            if not claim():
+                lost.append(True)
+                return False
+            self._first_token.setdefault(kind, deque(maxlen=200)).append(time.time() - start)
+            return True
+
+        try:
+            result = call(key_index, timed_claim)
+            finished = True
+        except Exception as e:
+            error, finished = e, True
+        finally:
+            self._release(key_index)
+            if not finished or lost:
+                # Lost a hedge race: no verdict on the key, but it was slow
+                self.scheduler.cancel(key_index, time.time() - start)
+        if lost:
+            return None
+        if result is not None:
+            self.scheduler.record_success(key_index, time.time() - start)
+            return result
+        self._stats['failed'] += 1
+        self.scheduler.record_failure(key_index, getattr(error, 'status', None),
+                                      getattr(error, 'retry_after', None))
+        return None
+
+    def _race(self, call, key_index, tried, delay, kind):
+        """Run on ``key_index``; past ``delay`` with no output, hedge on a second key."""
+        results = LightQueue()
+        threads = {}
+        started = set()
+        winner = []
+        closed = []
+
+        def claim_for(k):
+            def claim():
+                if winner:
+                    return winner[0] == k
+                winner.append(k)
+                for other in started - {k}:
+                    threads[other].kill()
+                return True
+            return claim
+
+        def run(k):
+            result = None
+            try:
+                if closed or (winner and winner[0] != k):
+                    self._release(k)  # lost before it even started
+                    self.scheduler.cancel(k)
+                    return
+                started.add(k)
+                result = self._attempt(call, k, claim_for(k), kind)
+            finally:
+                results.put((k, result))
+
+        threads[key_index] = eventlet.spawn(run, key_index)
+        try:
+            try:
+                return results.get(timeout=delay)[1]
+            except Empty:
+                pass
+            hedge_key = None if winner else self._try_acquire_other(tried)
+            if hedge_key is None:
+                return results.get()[1]
+
+            tried.add(hedge_key)
+            self._stats['hedges_fired'] += 1
+            threads[hedge_key] = eventlet.spawn(run, hedge_key)
+            for _ in range(len(threads)):
+                k, result = results.get()
+                if result is not None:
+                    if k == hedge_key:
+                        self._stats['hedges_won'] += 1
+                    return result
+            return None
+        finally:
+            closed.append(True)
+            for k in started:
+                threads[k].kill()
+
+    def hedge_delay(self, kind):
+        """Seconds to wait for a first token before hedging, or None to not hedge."""
+        samples = self._first_token.get(kind)
+        if not self.hedge_enabled or not samples or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))
+        return max(self.hedge_min_delay, ordered[index])
+
+    def stats(self):
+        """Snapshot of counters and current load."""
+        in_flight = self._in_flight() if self._shape else {}
+        hedge_after = {kind: self.hedge_delay(kind) for kind in self._first_token}
+        return dict(self._stats, waiting=self._waiting, in_flight=in_flight,
+                    coalescing=len(self._inflight), keys=self.scheduler.stats(),
+                    hedge_after=hedge_after, at=time.time())
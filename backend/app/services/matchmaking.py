@@ -0,0 +1,117 @@
+"""
+CareerSage Matchmaking — rating-banded pairing per topic
+Players queue for a topic; a background loop pairs neighbours in rating
+order whose gap fits the widening band of either player and starts the
+battle for them. Queues live in the battle store (a sorted list in memory,
+a sorted set in Redis), so nothing polls Mongo.
+"""
+import time
+import eventlet
+from .battle_store import battle_store
+from ..utils.topics import canonical_topic
+
+
+class Matchmaker:
+    """Pairs queued players; ``on_match(app, first, second)`` starts their battle.
+
+    A player's acceptable rating gap is
+    ``MATCHMAKING_BASE_BAND + MATCHMAKING_BAND_GROWTH x seconds waited``,
+    capped at MATCHMAKING_MAX_BAND. Two players match when their gap fits
+    either one's band, so someone who has waited long is matched sooner.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._pool = None
+        self._on_match = None
+        self.stats = {'queued': 0, 'matched': 0, 'left': 0}
+
+    def ensure_started(self, app, on_match):
+        self._on_match = on_match
+        if self._loop is not None:
+            return
+        self._pool = eventlet.GreenPool(app.config.get('MATCHMAKING_CONCURRENCY', 8))
+        self._loop = eventlet.spawn(self._match_loop, app)
+
+    # ──────────────────────────────────────────
+    #  Queue
+    # ──────────────────────────────────────────
+
+    def join(self, app, user_id, topic, rating):
+        entry = {
+            'user_id': user_id,
+            'topic': topic,
+            'topic_key': canonical_topic(topic) or topic.lower(),
+            'rating': rating,
+            'joined_at': time.time(),
+        }
+        battle_store.queue_add(entry)
+        self.stats['queued'] += 1
+        # Try right away so an evenly matched pair doesn't wait for the next tick
+        self.match_topic(app, entry['topic_key'])
+        return entry
+
+    def leave(self, user_id):
+        entry = battle_store.queue_remove(user_id)
+        if entry:
+            self.stats['left'] += 1
+        return entry
+
+    # ──────────────────────────────────────────
+    #  Pairing
+    # ──────────────────────────────────────────
+
+    @staticmethod
+    def band(config, waited):
+        base = config.get('MATCHMAKING_BASE_BAND', 50)
+        growth = config.get('MATCHMAKING_BAND_GROWTH', 10)
+        return min(base + growth * max(0.0, waited), config.get('MATCHMAKING_MAX_BAND', 500))
+
+    def pairs(self, entries, config, now=None):
+        """Greedy pairing over entries sorted by rating: closest neighbours first, O(n)."""
+        now = now or time.time()
+        out, i = [], 0
+        while i < len(entries) - 1:
+            a, b = entries[i], entries[i + 1]
+            gap = b['rating'] - a['rating']
+            if gap <= max(self.band(config, now - a['joined_at']), self.band(config, now - b['joined_at'])):
+                out.append((a, b))
+                i += 2
+            else:
+                i += 1
+        return out
+
+    def match_topic(self, app, topic_key):
+        matched = 0
+        for a, b in self.pairs(battle_store.queue_entries(topic_key), app.config):
+            # Another worker (or a leave_queue) may have taken one of them already
+            if not battle_store.queue_claim([a['user_id'], b['user_id']]):
+                continue
+            first, second = sorted((a, b), key=lambda e: e['joined_at'])
+            matched += 1
+            self.stats['matched'] += 1
+            if self._pool is not None and self._on_match is not None:
+                self._pool.spawn_n(self._start, app, first, second)
+        return matched
+
+    def _start(self, app, first, second):
+        with app.app_context():
+            try:
+                self._on_match(app, first, second)
+            except Exception as e:
+                app.logger.error(f"[MATCH] Starting {first['user_id']} vs {second['user_id']} failed: {e}")
+
+    def _match_loop(self, app):
+        tick = app.config.get('MATCHMAKING_TICK', 1.0)
+        while True:
+            eventlet.sleep(tick)
+            try:
+                if not battle_store.try_lock('matchmaking', tick):
+                    continue
+                for topic_key in battle_store.queue_topics():
+                    self.match_topic(app, topic_key)
+            except Exception as e:
+                app.logger.error(f"[MATCH] Pairing pass failed: {e}")
+
+
+matchmaker = Matchmaker()
@@ -0,0 +1,76 @@
+"""
+CareerSage Presence — targeted online/offline fan-out
+Every registered socket joins a per-user room (``user:<id>``), so presence
+changes are emitted only to that user's online friends instead of to every
+connected client. Changes are coalesced: a user who drops and reconnects
+within PRESENCE_COALESCE_SECONDS (page reload, deploy, flaky network)
+produces no events at all.
+"""
+import eventlet
+from .battle_store import battle_store
+from .battle_timers import battle_timers
+
+LOBBY_ROOM = 'battle_lobby'   # clients looking at the battle lobby (new_battle_available)
+
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+
+class Presence:
+    """Debounced friend-only presence notifications (one worker's view)."""
+
+    def __init__(self):
+        self._pending = set()     # users with a flush scheduled
+        self.stats = {'changes': 0, 'coalesced': 0, 'emitted': 0}
+
+    def changed(self, app, user_id):
+        """A user's first socket connected or last socket went away."""
+        self.stats['changes'] += 1
+        if user_id in self._pending:
+            self.stats['coalesced'] += 1
+            return
+        self._pending.add(user_id)
+        eventlet.spawn_after(app.config.get('PRESENCE_COALESCE_SECONDS', 2), self._flush, app, user_id)
+
+    def _flush(self, app, user_id):
+        self._pending.discard(user_id)
+        online = battle_store.is_online(user_id)
+        # Shared, so the worker that sees the disconnect knows another one
+        # announced the connect
+        if not battle_store.set_announced(user_id, online):
+            self.stats['coalesced'] += 1
+            return
+        with app.app_context():
+            try:
+                self.notify_friends(user_id, online)
+            except Exception as e:
+                app.logger.error(f"[PRESENCE] Fan-out for {user_id} failed: {e}")
+
+    def ensure_heartbeat(self, app):
+        """Keep this worker's sockets fresh in the shared store (see PRESENCE_SID_TTL)."""
+        if not battle_timers.pending('presence_heartbeat'):
+            battle_timers.schedule('presence_heartbeat', app.config.get('PRESENCE_SID_TTL', 120) / 3, self._heartbeat)
+
+    def _heartbeat(self, app):
+        self.ensure_heartbeat(app)
+        battle_store.heartbeat()
+
+    def notify_friends(self, user_id, online):
+        from ..extensions import socketio
+        from ..models.user import User
+        from bson import ObjectId
+        user = User.objects(id=ObjectId(user_id)).only('name', 'friends').first()
+        if not user or not user.friends:
+            return 0
+        targets = battle_store.online(str(fid) for fid in user.friends)
+        payload = {'user_id': user_id}
+        if online:
+            payload['name'] = user.name
+        for fid in targets:
+            socketio.emit('user_online' if online else 'user_offline', payload, to=user_room(fid), namespace='/')
+        self.stats['emitted'] += len(targets)
+        return len(targets)
+
+
+presence = Presence()
@@ -0,0 +1,338 @@
+"""
+CareerSage Question Bank — pre-generated battle questions per topic
+create_battle samples 10 questions from the bank in milliseconds instead of
+waiting on the LLM. A background generator keeps popular pools filled and
+tops up any pool that runs low; a short pool is padded with fallback
+questions, and a never-seen topic is generated off the request path.
+"""
+import random
+from datetime import datetime, timedelta
+import eventlet
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import current_app
+from pymongo.errors import BulkWriteError
+
+# Rotated into the prompt so successive batches for a topic cover different
+# ground (and identical prompts don't get coalesced by the LLM gateway)
+QUESTION_FOCUSES = [
+    'core concepts and terminology',
+    'everyday tools, commands and workflows',
+    'best practices and common pitfalls',
+    'debugging and troubleshooting',
+    'advanced features and internals',
+    'real-world scenarios and trade-offs',
+]
+
+BATCH_SIZE = 10
+
+
+def build_question_prompt(topic, focus=None):
+    focus_line = f"\n- For this batch, focus on: {focus}" if focus else ""
+    return f"""Generate exactly 10 multiple-choice quiz questions SPECIFICALLY about "{topic}" for a rapid-fire skill battle.
+
+Return ONLY valid JSON in this exact format:
+{{
+  "questions": [
+    {{
+      "id": 1,
+      "question": "What is ...?",
+      "options": ["Option A", "Option B", "Option C", "Option D"],
+      "correct": 0
+    }}
+  ]
+}}
+
+Rules:
+- "correct" is the 0-based index of the right answer
+- Questions should range from easy to hard
+- Keep questions concise (rapid-fire style)
+- CRITICAL: ALL questions MUST be specifically about {topic}. Do NOT generate generic programming or computer science questions unless the topic IS programming/computer science.
+- For example, if the topic is "AutoCAD", ask about AutoCAD commands, tools, workflows, file formats, etc.
+- If the topic is "SolidWorks", ask about sketching, assemblies, simulations, etc.
+- Cover different aspects and features of {topic}
+- Exactly 4 options per question
+- Exactly 10 questions
+- IMPORTANT: Randomize the position of the correct answer across questions. Do NOT always put the correct answer at the same index.{focus_line}"""
+
+
+def generate_fallback_questions(topic):
+    """Fallback questions - dynamically generated to be relevant to the topic"""
+    templates = [
+        {"question": f"Which of the following is a key feature of {topic}?",
+         "options": [f"Core functionality of {topic}", "Unrelated feature", "Not applicable", "None of these"], "correct": 0},
+        {"question": f"What is {topic} primarily used for?",
+         "options": ["Entertainment only", f"Professional work in its domain", "Social media", "Gaming"], "correct": 1},
+        {"question": f"Who would typically use {topic} in their work?",
+         "options": ["Chefs", f"Professionals in the {topic} field", "Athletes", "Musicians"], "correct": 1},
+        {"question": f"What is the first step to learning {topic}?",
+         "options": ["Skip basics", "Memorize everything", f"Understand {topic} fundamentals", "Ignore documentation"], "correct": 2},
+        {"question": f"Which skill is most helpful when working with {topic}?",
+         "options": ["Cooking", f"Understanding {topic} concepts", "Singing", "Dancing"], "correct": 1},
+        {"question": f"What makes {topic} valuable in industry?",
+         "options": ["It's free", "It's old", f"It solves real-world problems", "It's simple"], "correct": 2},
+        {"question": f"How can you improve your {topic} skills?",
+         "options": [f"Practice with {topic} projects", "Only watch videos", "Avoid practicing", "Read unrelated books"], "correct": 0},
+        {"question": f"What type of professional certification exists for {topic}?",
+         "options": ["Cooking certificate", f"{topic} professional certification", "Driving license", "Sports medal"], "correct": 1},
+        {"question": f"Which is a reliable place to learn {topic}?",
+         "options": [f"Official {topic} documentation/courses", "Random social media", "Unverified blogs only", "None of these"], "correct": 0},
+        {"question": f"What is a common beginner mistake when learning {topic}?",
+         "options": ["Practicing too much", f"Skipping {topic} fundamentals", "Reading documentation", "Asking questions"], "correct": 1},
+    ]
+    for i, q in enumerate(templates):
+        q['id'] = i + 1
+    return templates
+
+
+class QuestionBank:
+    """Samples battle questions from the question_bank collection and keeps it filled.
+
+    - ``draw`` picks questions the players haven't seen in their last
+      QUESTION_BANK_SEEN_BATTLES battles (repeats only if the pool is too
+      small), and schedules a top-up when the pool is below
+      QUESTION_BANK_LOW_WATER.
+    - A scheduler loop fills QUESTION_BANK_TOPICS plus every topic battled
+      in the last week up to QUESTION_BANK_TARGET questions.
+    """
+
+    def __init__(self):
+        self._filling = set()    # topic keys with a top-up in flight
+        self._checked = {}       # topic key -> last time the pool size was checked
+        self._pool = None
+        self._scheduler = None
+        self._batch = 0
+        self.stats = {'drawn': 0, 'cold': 0, 'generated': 0, 'failed': 0}
+
+    def ensure_started(self, app):
+        if self._pool is not None:
+            return
+        self._pool = eventlet.GreenPool(app.config.get('QUESTION_BANK_CONCURRENCY', 2))
+        if app.config.get('QUESTION_BANK_REFRESH_ENABLED', True):
+            self._scheduler = eventlet.spawn(self._schedule_loop, app)
+
+    # ──────────────────────────────────────────
+    #  Drawing questions for a battle
+    # ──────────────────────────────────────────
+
+    def draw(self, topic, user_ids=(), count=BATCH_SIZE, wait=False):
+        """Battle-ready questions (ids 1..n, shuffled options), or None if none could be made.
+
+        Never calls the AI unless ``wait`` is set: a short pool is padded
+        with fallback questions and topped up in the background, and an
+        empty one returns None. With ``wait``, a short pool generates a
+        batch inline first, so only set it off the request path.
+        """
+        from ..models.question_bank import BankQuestion
+        app = current_app._get_current_object()
+        self.ensure_started(app)
+        key = BankQuestion.make_topic_key(topic)
+
+        try:
+            seen = self.recently_seen(user_ids)
+            picked = self._sample(key, count, seen)
+            if len(picked) < count:
+                # Not enough unseen questions: repeats beat a 15s wait
+                picked += self._sample(key, count - len(picked), {d['_id'] for d in picked})
+        except Exception as e:
+            app.logger.error(f"[QBANK] Sampling failed for '{topic}': {e}")
+            picked = []
+
+        short = len(picked) < count
+        if short:
+            self.stats['cold'] += 1
+            if wait:
+                # Generate inline and bank the batch
+                fresh = self.generate(topic) or []
+                picked = (picked + [d for d in fresh if d['_id'] not in {p['_id'] for p in picked}])[:count]
+            if not picked:
+                return None    # never-seen topic; without ``wait`` the caller generates it elsewhere
+        else:
+            self.stats['drawn'] += 1
+
+        # A short pool is refilled now, not after the usual check interval
+        self.top_up(app, topic, key, force=short and not wait)
+        questions = self._to_battle(picked)
+        if len(questions) < count:
+            # The AI failed or came back short: keep what the bank had, pad with fallbacks
+            for q in generate_fallback_questions(topic)[:count - len(questions)]:
+                questions.append(dict(q, id=len(questions) + 1))
+        return questions
+
+    def recently_seen(self, user_ids):
+        """Bank ids of questions these users got in their most recent battles."""
+        from ..models.battle import BattleResult
+        oids = []
+        for uid in user_ids:
+            try:
+                oids.append(ObjectId(str(uid)))
+            except (InvalidId, TypeError):
+                continue
+        if not oids:
+            return set()
+        limit = current_app.config.get('QUESTION_BANK_SEEN_BATTLES', 20) * len(oids)
+        cursor = (BattleResult._get_collection()
+                  .find({'$or': [{'challenger_id': {'$in': oids}}, {'opponent_id': {'$in': oids}}]},
+                        {'questions.qid': 1})
+                  .sort('created_at', -1)
+                  .limit(limit))
+        seen = set()
+        for battle in cursor:
+            for q in battle.get('questions', []):
+                if q.get('qid'):
+                    try:
+                        seen.add(ObjectId(q['qid']))
+                    except InvalidId:
+                        pass
+        return seen
+
+    def _sample(self, key, size, exclude):
+        from ..models.question_bank import BankQuestion
+        if size <= 0:
+            return []
+        match = {'topic_key': key}
+        if exclude:
+            match['_id'] = {'$nin': list(exclude)}
+        return list(BankQuestion._get_collection().aggregate([
+            {'$match': match},
+            {'$sample': {'size': size}},
+            {'$project': {'question': 1, 'options': 1, 'correct': 1}},
+        ]))
+
+    @staticmethod
+    def _to_battle(docs):
+        questions = []
+        for i, doc in enumerate(docs):
+            options = list(doc['options'])
+            answer = options[doc['correct']]
+            random.shuffle(options)
+            questions.append({
+                'id': i + 1,
+                'qid': str(doc['_id']),
+                'question': doc['question'],
+                'options': options,
+                'correct': options.index(answer),
+            })
+        return questions
+
+    # ──────────────────────────────────────────
+    #  Generation
+    # ──────────────────────────────────────────
+
+    def generate(self, topic, focus=None):
+        """One LLM batch for ``topic``, stored in the bank. Returns the banked docs (as dicts) or None.
+
+        A question already in the pool is returned as the stored copy, so
+        every returned ``_id`` exists in the collection.
+        """
+        from .ai_service import ai_service as ai
+        from ..models.question_bank import BankQuestion
+
+        content = ai.call_nvidia_api(build_question_prompt(topic, focus))
+        data = ai.parse_json_response(content) if content else None
+        if not isinstance(data, dict) or not isinstance(data.get('questions'), list):
+            self.stats['failed'] += 1
+            return None
+
+        key = BankQuestion.make_topic_key(topic)
+        now = datetime.utcnow()
+        docs, fingerprints = [], set()
+        for q in data['questions']:
+            if not isinstance(q, dict):
+                continue
+            question = str(q.get('question') or '').strip()
+            options = [str(o) for o in (q.get('options') or [])][:4]
+            correct = q.get('correct')
+            if not question or len(options) != 4 or len(set(options)) != 4:
+                continue
+            if not isinstance(correct, int) or not 0 <= correct < 4:
+                continue
+            fingerprint = BankQuestion.make_fingerprint(question)
+            if fingerprint in fingerprints:
+                continue
+            fingerprints.add(fingerprint)
+            docs.append({'_id': ObjectId(), 'topic_key': key, 'topic': topic, 'question': question,
+                         'options': options, 'correct': correct, 'fingerprint': fingerprint,
+                         'created_at': now})
+        if not docs:
+            self.stats['failed'] += 1
+            return None
+
+        collection = BankQuestion._get_collection()
+        stored, inserted = docs, len(docs)
+        try:
+            collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Duplicates of questions already in the pool are expected: use the banked copy
+            errors = e.details.get('writeErrors', [])
+            failed = {err['index'] for err in errors}
+            duplicates = [docs[err['index']]['fingerprint'] for err in errors if err.get('code') == 11000]
+            existing = {d['fingerprint']: d for d in collection.find(
+                {'topic_key': key, 'fingerprint': {'$in': duplicates}},
+                {'question': 1, 'options': 1, 'correct': 1, 'fingerprint': 1})} if duplicates else {}
+            stored = [existing.get(d['fingerprint']) if i in failed else d for i, d in enumerate(docs)]
+            stored = [d for d in stored if d]
+            inserted = len(docs) - len(failed)
+        except Exception as e:
+            current_app.logger.error(f"[QBANK] Save failed for '{topic}': {e}")
+            stored, inserted = [], 0
+        self.stats['generated'] += inserted
+        current_app.logger.info(f"[QBANK] '{topic}' ({key}): +{inserted} questions")
+        if not stored:
+            self.stats['failed'] += 1
+            return None
+        return stored
+
+    def top_up(self, app, topic, key, force=False):
+        """Queue a background fill for ``key`` unless one is running or it was checked recently."""
+        if key in self._filling or self._pool is None:
+            return False
+        now = datetime.utcnow()
+        last = self._checked.get(key)
+        if not force and last and now - last < timedelta(seconds=60):
+            return False
+        self._checked[key] = now
+        self._filling.add(key)
+        self._pool.spawn_n(self._fill, app, topic, key)
+        return True
+
+    def _fill(self, app, topic, key):
+        from ..models.question_bank import BankQuestion
+        try:
+            with app.app_context():
+                size = BankQuestion.objects(topic_key=key).count()
+                if size >= app.config.get('QUESTION_BANK_LOW_WATER', 30):
+                    return
+                target = app.config.get('QUESTION_BANK_TARGET', 60)
+                batches = min(-(-(target - size) // BATCH_SIZE), app.config.get('QUESTION_BANK_MAX_BATCHES', 3))
+                for _ in range(batches):
+                    self._batch += 1
+                    if not self.generate(topic, QUESTION_FOCUSES[self._batch % len(QUESTION_FOCUSES)]):
+                        break
+        except Exception as e:
+            self.stats['failed'] += 1
+            app.logger.error(f"[QBANK] Top-up for '{topic}' failed: {e}")
+        finally:
+            self._filling.discard(key)
+
+    def _schedule_loop(self, app):
+        from ..models.battle import BattleResult
+        from ..models.question_bank import BankQuestion
+        interval = app.config.get('QUESTION_BANK_REFRESH_INTERVAL', 1800)
+        while True:
+            with app.app_context():
+                try:
+                    topics = [t.strip() for t in app.config.get('QUESTION_BANK_TOPICS', '').split(',') if t.strip()]
+                    since = datetime.utcnow() - timedelta(days=7)
+                    topics += BattleResult.objects(created_at__gte=since).distinct('topic')
+                    queued = {}
+                    for topic in topics:
+                        queued.setdefault(BankQuestion.make_topic_key(topic), topic)
+                    for key, topic in queued.items():
+                        self.top_up(app, topic, key, force=True)
+                except Exception as e:
+                    app.logger.error(f"[QBANK] Refresh pass failed: {e}")
+            eventlet.sleep(interval)
+
+
+question_bank = QuestionBank()
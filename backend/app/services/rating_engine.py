@@ -0,0 +1,190 @@
+"""
+CareerSage Rating Engines — pluggable rating formulas for battles
+RATING_ENGINE picks the engine finalize_battle uses for live updates:
+
+- ``elo``     K=32 Elo against real opponents, flat +15 / -10 against the AI
+- ``glicko2`` Glicko-2 (rating, deviation, volatility); the AI is a fixed
+              opponent rated AI_RATING
+
+Every engine also rates a whole rating period at once over NumPy arrays.
+recompute_ratings.py uses that to replay the full battle log into a shadow
+collection, so a formula change can be checked before it touches BattleStats.
+"""
+import math
+
+try:
+    import numpy as np
+except ImportError:  # optional: only needed for glicko2 and batch recomputes
+    np = None
+
+RATING_FLOOR = 100
+AI_RATING = 1000.0
+AI_DEVIATION = 50.0
+GLICKO_SCALE = 173.7178
+
+
+def initial_state():
+    return {'rating': 1000.0, 'rd': 350.0, 'volatility': 0.06}
+
+
+def _require_numpy(what):
+    if np is None:
+        raise RuntimeError(f"{what} needs the 'numpy' package (pip install numpy)")
+
+
+class EloEngine:
+    """The original formula: K=32 Elo, rounded per game, never less than one point."""
+
+    name = 'elo'
+
+    def __init__(self, k=32, solo_win=15, solo_loss=-10):
+        self.k = k
+        self.solo_win = solo_win
+        self.solo_loss = solo_loss
+
+    def expected(self, rating, other):
+        return 1 / (1 + 10 ** ((other - rating) / 400))
+
+    def rate_battle(self, a, b, score):
+        """New states for both players; ``score`` is 1 / 0.5 / 0 from a's side."""
+        expected = self.expected(a['rating'], b['rating'])
+        if score == 0.5:
+            change = round(self.k * (0.5 - expected))
+            deltas = change, -change
+        else:
+            winner_expected = expected if score == 1 else 1 - expected
+            win_change = max(round(self.k * (1 - winner_expected)), 1)
+            loss_change = min(round(self.k * (0 - (1 - winner_expected))), -1)
+            deltas = (win_change, loss_change) if score == 1 else (loss_change, win_change)
+        return (dict(a, rating=max(a['rating'] + deltas[0], RATING_FLOOR)),
+                dict(b, rating=max(b['rating'] + deltas[1], RATING_FLOOR)))
+
+    def rate_solo(self, a, score):
+        delta = self.solo_win if score == 1 else (self.solo_loss if score == 0 else 0)
+        return dict(a, rating=max(a['rating'] + delta, RATING_FLOOR))
+
+    def rate_period(self, state, a, b, s):
+        """Batch Elo: every game in the period is scored against period-start ratings.
+
+        ``state`` holds per-player arrays, ``a``/``b`` are player indexes
+        (``b == -1`` for the AI) and ``s`` is a's score. Returns a new state.
+        """
+        _require_numpy('Batch rating')
+        rating = state['rating']
+        human = b >= 0
+        ra, rb = rating[a], np.where(human, rating[np.maximum(b, 0)], 0)
+        expected = 1 / (1 + 10 ** ((rb - ra) / 400))
+        change = np.where(human, self.k * (s - expected),
+                          np.select([s == 1, s == 0], [self.solo_win, self.solo_loss], 0))
+        delta = np.bincount(a, weights=change, minlength=len(rating))
+        delta -= np.bincount(b[human], weights=change[human], minlength=len(rating))
+        return dict(state, rating=np.maximum(rating + np.round(delta), RATING_FLOOR))
+
+
+class Glicko2Engine:
+    """Glicko-2 (Glickman, 2012), vectorized over every player in a period."""
+
+    name = 'glicko2'
+
+    def __init__(self, tau=0.5, max_rd=350.0, epsilon=1e-6):
+        _require_numpy('The glicko2 rating engine')
+        self.tau = tau
+        self.max_rd = max_rd
+        self.epsilon = epsilon
+
+    @staticmethod
+    def g(phi):
+        return 1 / np.sqrt(1 + 3 * phi ** 2 / math.pi ** 2)
+
+    def rate_battle(self, a, b, score):
+        state = {key: np.array([a[key], b[key]], dtype=float) for key in ('rating', 'rd', 'volatility')}
+        new = self.rate_period(state, np.array([0]), np.array([1]), np.array([float(score)]))
+        return tuple({key: float(new[key][i]) for key in new} for i in (0, 1))
+
+    def rate_solo(self, a, score):
+        state = {key: np.array([a[key]], dtype=float) for key in ('rating', 'rd', 'volatility')}
+        new = self.rate_period(state, np.array([0]), np.array([-1]), np.array([float(score)]))
+        return {key: float(new[key][0]) for key in new}
+
+    def rate_period(self, state, a, b, s):
+        """One rating period. Same arguments as ``EloEngine.rate_period``.
+
+        Players without a game in the period only have their deviation grow.
+        """
+        n = len(state['rating'])
+        mu = (state['rating'] - 1500) / GLICKO_SCALE
+        phi = state['rd'] / GLICKO_SCALE
+        sigma = state['volatility']
+
+        # Each game seen from both sides; the AI's side is never rated
+        human = b >= 0
+        player = np.concatenate([a, b[human]])
+        opponent = np.concatenate([b, a[human]])
+        score = np.concatenate([s, 1 - s[human]])
+        ai = opponent < 0
+        opp = np.maximum(opponent, 0)
+        opp_mu = np.where(ai, (AI_RATING - 1500) / GLICKO_SCALE, mu[opp])
+        opp_phi = np.where(ai, AI_DEVIATION / GLICKO_SCALE, phi[opp])
+
+        g = self.g(opp_phi)
+        expected = 1 / (1 + np.exp(-g * (mu[player] - opp_mu)))
+        info = np.bincount(player, weights=g ** 2 * expected * (1 - expected), minlength=n)
+        improvement = np.bincount(player, weights=g * (score - expected), minlength=n)
+
+        played = info > 0
+        v = 1 / info[played]
+        new_sigma = sigma.copy()
+        new_sigma[played] = self._volatility(v * improvement[played], phi[played], v, sigma[played])
+
+        phi_star = np.sqrt(phi ** 2 + new_sigma ** 2)
+        new_phi = 1 / np.sqrt(1 / phi_star ** 2 + info)   # == phi_star for players who sat out
+        new_mu = mu + new_phi ** 2 * improvement
+        return {
+            'rating': new_mu * GLICKO_SCALE + 1500,
+            'rd': np.minimum(new_phi * GLICKO_SCALE, self.max_rd),
+            'volatility': new_sigma,
+        }
+
+    def _volatility(self, delta, phi, v, sigma):
+        """New volatility by the Illinois iteration (step 5 of the paper), all players at once."""
+        tau2 = self.tau ** 2
+        a = np.log(sigma ** 2)
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / tau2
+
+        big = delta ** 2 > phi ** 2 + v
+        B = np.where(big, np.log(np.maximum(delta ** 2 - phi ** 2 - v, 1e-300)), a - self.tau)
+        stepping = ~big & (f(B) < 0)
+        while stepping.any():
+            B = np.where(stepping, B - self.tau, B)
+            stepping &= f(B) < 0
+
+        A, fA, fB = a, f(a), f(B)
+        with np.errstate(divide='ignore', invalid='ignore'):   # converged players divide 0 by 0
+            for _ in range(100):
+                active = np.abs(B - A) > self.epsilon
+                if not active.any():
+                    break
+                C = np.where(active, A + (A - B) * fA / (fB - fA), B)
+                fC = f(C)
+                swap = fC * fB <= 0
+                A = np.where(active & swap, B, A)
+                fA = np.where(active, np.where(swap, fB, fA / 2), fA)
+                B, fB = np.where(active, C, B), np.where(active, fC, fB)
+        return np.exp(A / 2)
+
+
+ENGINES = {'elo': EloEngine, 'glicko2': Glicko2Engine}
+
+
+def get_engine(config=None, name=None):
+    """The engine named by ``name`` or RATING_ENGINE."""
+    config = config or {}
+    name = (name or config.get('RATING_ENGINE', 'elo')).lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown rating engine '{name}' (choose from {', '.join(ENGINES)})")
+    if name == 'glicko2':
+        return Glicko2Engine(tau=config.get('RATING_GLICKO_TAU', 0.5))
+    return EloEngine()
@@ -0,0 +1,58 @@
+"""
+CareerSage Rating Index — rank, percentile and neighbours by rating
+Answered from the shared ``global`` leaderboard (see leaderboard.py), which
+is the authoritative rating order: /rank, /rank/<id>/around and
+/leaderboard/me all read the same sorted set, so they always agree and
+include results finished on any worker. Profile views never count
+documents in Mongo.
+"""
+from .battle_store import battle_store
+from .leaderboard import leaderboard, GLOBAL
+
+
+class RatingIndex:
+    """Rank and percentile queries over the global board (O(log n) each)."""
+
+    def standing(self, app, user_id):
+        """{rank, percentile, rating, total} or None for a player without stats."""
+        leaderboard.ensure_built(app)
+        found = battle_store.board_rank(GLOBAL, user_id)
+        if found is None:
+            return None
+        rank, rating = found
+        total = battle_store.board_size(GLOBAL)
+        others = total - 1
+        return {
+            'user_id': user_id,
+            'rank': rank + 1,
+            # Share of other players ranked below this one
+            'percentile': round((others - rank) / others * 100, 1) if others else 100.0,
+            'rating': rating,
+            'total': total,
+        }
+
+    def around(self, app, user_id, count=10):
+        """Up to ``count`` players above and below ``user_id``, or None."""
+        leaderboard.ensure_built(app)
+        found = battle_store.board_rank(GLOBAL, user_id)
+        if found is None:
+            return None
+        rank = found[0]
+        start = max(rank - count, 0)
+        rows = battle_store.board_page(GLOBAL, start, rank - start + count + 1)
+        profiles = battle_store.get_profiles(uid for uid, _ in rows)
+        out = {'above': [], 'me': None, 'below': []}
+        for position, (uid, rating) in enumerate(rows, start):
+            row = {'rank': position + 1, 'user_id': uid, 'rating': rating,
+                   'name': profiles.get(uid, {}).get('name', 'Unknown')}
+            if position < rank:
+                out['above'].append(row)
+            elif position > rank:
+                out['below'].append(row)
+            else:
+                out['me'] = row
+        out['total'] = battle_store.board_size(GLOBAL)
+        return out
+
+
+rating_index = RatingIndex()
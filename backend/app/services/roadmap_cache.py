@@ -0,0 +1,201 @@
+"""
+CareerSage Roadmap Cache — in-process LRU/TTL tier in front of RoadmapCache
+Popular topics are served from worker memory; Mongo is only hit on a miss.
+Hit counts are accumulated locally and flushed to Mongo in one bulk write.
+Stale entries are served immediately and regenerated in the background.
+"""
+import json
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+import eventlet
+from pymongo import UpdateOne
+from ..utils.topics import TopicSimilarityIndex
+
+
+class RoadmapMemoryCache:
+    """Bounded LRU keyed by cache_key, capped by entry count and total bytes.
+
+    Entries are stored as JSON text: that gives an honest byte size for the
+    cap and hands every caller a private copy they are free to mutate.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, ttl=600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, stale_at, payload)
+        self._bytes = 0
+        self._pending_hits = Counter()
+        self._flusher = None
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def configure(self, config):
+        self.max_entries = config.get('ROADMAP_CACHE_MAX_ENTRIES', self.max_entries)
+        self.max_bytes = config.get('ROADMAP_CACHE_MAX_BYTES', self.max_bytes)
+        self.ttl = config.get('ROADMAP_CACHE_TTL', self.ttl)
+
+    # ──────────────────────────────────────────
+    #  LRU
+    # ──────────────────────────────────────────
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        expires_at, _, payload = entry
+        if expires_at < time.time():
+            self._drop(key)
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return json.loads(payload)
+
+    def put(self, key, value, stale_at=None):
+        """Store a roadmap; ``stale_at`` (epoch seconds) marks when it needs a refresh."""
+        payload = json.dumps(value, separators=(',', ':'), default=str)
+        if len(payload) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.time() + self.ttl, stale_at or float('inf'), payload)
+        self._bytes += len(payload)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.stats['evictions'] += 1
+
+    def is_stale(self, key):
+        entry = self._entries.get(key)
+        return bool(entry) and entry[1] < time.time()
+
+    def invalidate(self, key):
+        if key in self._entries:
+            self._drop(key)
+
+    def _drop(self, key):
+        _, _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    # ──────────────────────────────────────────
+    #  Batched hit counting
+    # ──────────────────────────────────────────
+
+    def record_hit(self, key, app):
+        """Count a hit locally; a background green thread flushes the totals."""
+        self._pending_hits[key] += 1
+        if self._flusher is None:
+            interval = app.config.get('ROADMAP_CACHE_FLUSH_INTERVAL', 30)
+            self._flusher = eventlet.spawn(self._flush_loop, app, interval)
+
+    def pending_hits(self, key):
+        return self._pending_hits.get(key, 0)
+
+    def _flush_loop(self, app, interval):
+        while True:
+            eventlet.sleep(interval)
+            with app.app_context():
+                self.flush_hits(app)
+
+    def flush_hits(self, app):
+        """Push accumulated hit counts to Mongo as one unordered bulk write."""
+        if not self._pending_hits:
+            return 0
+        from ..models.cache import RoadmapCache
+        pending, self._pending_hits = self._pending_hits, Counter()
+        ops = [UpdateOne({'cache_key': key}, {'$inc': {'hit_count': n}}) for key, n in pending.items()]
+        try:
+            RoadmapCache._get_collection().bulk_write(ops, ordered=False)
+            app.logger.info(f"[CACHE] Flushed hit counts for {len(ops)} keys")
+        except Exception as e:
+            # Put them back so the next tick retries
+            self._pending_hits.update(pending)
+            app.logger.error(f"[CACHE] Hit flush failed: {e}")
+        return len(ops)
+
+
+class RoadmapRefresher:
+    """Background regeneration of stale cache entries (stale-while-revalidate).
+
+    - ``revalidate`` is called on a stale hit: the caller already has the old
+      roadmap, a green thread regenerates and overwrites it.
+    - A scheduler loop pre-warms the top-N entries by hit_count that will go
+      stale within ROADMAP_REFRESH_AHEAD seconds, so popular topics never
+      reach a cold generation.
+    """
+
+    def __init__(self):
+        self._refreshing = set()   # cache keys with a regeneration in flight
+        self._pool = None
+        self._scheduler = None
+        self.stats = {'revalidated': 0, 'prewarmed': 0, 'failed': 0}
+
+    def ensure_started(self, app, service):
+        if self._scheduler is not None or not app.config.get('ROADMAP_REFRESH_ENABLED', True):
+            return
+        self._pool = eventlet.GreenPool(app.config.get('ROADMAP_REFRESH_CONCURRENCY', 2))
+        self._scheduler = eventlet.spawn(self._schedule_loop, app, service)
+
+    def revalidate(self, app, service, key):
+        """Queue a background regeneration for ``key`` unless one is already running."""
+        if key in self._refreshing or self._pool is None:
+            return False
+        self._refreshing.add(key)
+        self._pool.spawn_n(self._refresh, app, service, key, 'revalidated')
+        return True
+
+    def _refresh(self, app, service, key, reason):
+        try:
+            with app.app_context():
+                roadmap = service.refresh_cache_entry(key)
+                if roadmap:
+                    self.stats[reason] += 1
+                    app.logger.info(f"[CACHE REFRESH] {key} ({reason})")
+                else:
+                    self.stats['failed'] += 1
+                    app.logger.warning(f"[CACHE REFRESH] {key} failed, keeping stale copy")
+        except Exception as e:
+            self.stats['failed'] += 1
+            app.logger.error(f"[CACHE REFRESH] {key} error: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def _schedule_loop(self, app, service):
+        interval = app.config.get('ROADMAP_REFRESH_INTERVAL', 3600)
+        while True:
+            eventlet.sleep(interval)
+            with app.app_context():
+                try:
+                    self.prewarm(app, service)
+                except Exception as e:
+                    app.logger.error(f"[CACHE] Pre-warm pass failed: {e}")
+
+    def prewarm(self, app, service):
+        """Refresh the most popular entries that are stale or about to be."""
+        from ..models.cache import RoadmapCache
+        cfg = app.config
+        horizon = cfg.get('ROADMAP_CACHE_SOFT_TTL', 7 * 86400) - cfg.get('ROADMAP_REFRESH_AHEAD', 86400)
+        cutoff = datetime.utcnow() - timedelta(seconds=max(horizon, 0))
+        due = (RoadmapCache.objects(refreshed_at__lt=cutoff)
+               .order_by('-hit_count')
+               .limit(cfg.get('ROADMAP_REFRESH_TOP_N', 50))
+               .scalar('cache_key'))
+        queued = 0
+        for key in due:
+            if key in self._refreshing:
+                continue
+            self._refreshing.add(key)
+            self._pool.spawn_n(self._refresh, app, service, key, 'prewarmed')
+            queued += 1
+        if queued:
+            app.logger.info(f"[CACHE] Pre-warming {queued} popular roadmaps")
+        return queued
+
+
+roadmap_memory_cache = RoadmapMemoryCache()
+roadmap_refresher = RoadmapRefresher()
+
+# Fuzzy lookup over existing cache keys, bucketed by "mode|experience_level"
+topic_index = TopicSimilarityIndex()
@@ -0,0 +1,82 @@
+"""
+Compact Socket.IO protocol for live battles (v2)
+Questions are sent once, in battle_start, as ``[text, options]`` pairs and
+referred to by their index from then on; per-answer events are small
+positional arrays. With BATTLE_MSGPACK on (and ``msgpack`` installed) the
+server-to-client battle events are MessagePack-encoded binary frames.
+"""
+try:
+    import msgpack
+except ImportError:  # optional: only needed when BATTLE_MSGPACK is enabled
+    msgpack = None
+
+PROTOCOL_VERSION = 2
+
+
+def msgpack_available():
+    return msgpack is not None
+
+
+def encode(payload, binary=False):
+    """Payload as-is (JSON) or as MessagePack bytes (sent as a binary attachment)."""
+    if binary and msgpack is not None:
+        return msgpack.packb(payload, use_bin_type=True)
+    return payload
+
+
+def pack_questions(questions):
+    """Client-safe questions (no answers), indexed by position."""
+    return [[q['question'], q['options']] for q in questions]
+
+
+def start_payload(battle_id, topic, questions, role, opponent, question_seconds, solo=False, matched=False):
+    return {
+        'v': PROTOCOL_VERSION,
+        'b': battle_id,
+        't': topic,
+        'q': pack_questions(questions),
+        'r': role,
+        'o': opponent,
+        'qs': question_seconds,
+        's': int(solo),
+        'm': int(matched),
+    }
+
+
+def answer_payload(index, correct, is_correct, score, timed_out=False):
+    return [index, correct, int(is_correct), score, int(timed_out)]
+
+
+def progress_payload(score, answered):
+    return [score, answered]
+
+
+def scoreboard_payload(state):
+    """Spectator scoreboard: [challenger score, answered, opponent score, answered]."""
+    return [state.get('challenger_score', 0), state.get('challenger_answered', 0),
+            state.get('opponent_score', 0), state.get('opponent_answered', 0)]
+
+
+def describe(binary=False, question_seconds=15, progress_hz=4, spectator_hz=2):
+    """Self-description served at /api/battle/protocol."""
+    return {
+        'version': PROTOCOL_VERSION,
+        'encoding': 'msgpack' if binary and msgpack is not None else 'json',
+        'question_seconds': question_seconds,
+        'progress_hz': progress_hz,
+        'spectator_hz': spectator_hz,
+        'events': {
+            'battle_start': {'v': 'protocol version', 'b': 'battle id', 't': 'topic',
+                             'q': '[[question, [options]], ...] (refer to questions by index)',
+                             'r': "'challenger' | 'opponent'", 'o': '{name, rating?}',
+                             'qs': 'seconds per question', 's': 'solo (0/1)', 'm': 'matchmade (0/1)'},
+            'submit_answer': {'b': 'battle id', 'u': 'user id', 'i': 'question index', 'a': 'option index (-1 = none)'},
+            'answer_result': '[index, correct option, is_correct (0/1), your score, timed_out (0/1)]',
+            'opponent_progress': '[opponent score, opponent answered] (at most progress_hz per second)',
+            'spectate_state': {'b': 'battle id', 't': 'topic', 'n': 'questions', 'p': '[challenger name, opponent name]',
+                               'sc': 'scoreboard, as in spectate_score'},
+            'spectate_score': '[challenger score, challenger answered, opponent score, opponent answered] '
+                              '(one room broadcast, at most spectator_hz per second)',
+            'spectate_result': {'battle': 'final battle document (JSON)'},
+        },
+    }
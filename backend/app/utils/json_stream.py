@@ -0,0 +1,265 @@
+"""
+Incremental JSON helpers for LLM output
+One bracket- and string-aware scanner finds the first JSON value (object or
+array) in model output (skipping fences and chatter), repairs the usual defects (trailing
+commas, output cut off mid-array) and works on a stream as well as a string.
+"""
+import json
+import re
+
+_OUTSIDE = re.compile(r'["{}\[\],]')   # structural characters outside strings
+_INSIDE = re.compile(r'["\\]')          # characters that matter inside a string
+_CLOSER = {'{': '}', '[': ']'}
+
+
+class JsonScanner:
+    """Single-pass scanner over (possibly partial) LLM output.
+
+    ``feed`` chunks as they arrive; ``result`` returns the best parse of what
+    has been seen so far. Only structural characters are visited (strings are
+    skipped with a regex), so long responses cost one linear pass with no
+    backtracking. While scanning it records:
+
+    - ``start`` / ``end``: offsets of the first root object or array once balanced
+    - commas directly followed by ``}`` or ``]`` (dropped on repair)
+    - the last point where closing the open brackets yields valid JSON
+      (after a complete element), used when the output was truncated
+
+    Subclasses can hook ``_on_open`` (after the push), ``_on_close`` (before
+    the pop) and ``_on_string``. ``_root`` matches the characters a root
+    value may open with.
+    """
+
+    _root = re.compile(r'[{\[]')
+
+    def __init__(self):
+        self._data = ''
+        self._pos = 0              # next offset to scan
+        self._stack = []           # open containers ('{' / '[')
+        self._in_string = False
+        self._string_start = None
+        self._comma = None         # offset of the last comma not yet followed by a value
+        self._trailing = []        # offsets of trailing commas
+        self._safe = None          # (offset, depth) of the last clean cut point
+        self.start = None
+        self.end = None
+
+    @property
+    def depth(self):
+        return len(self._stack)
+
+    @property
+    def complete(self):
+        return self.end is not None
+
+    def feed(self, chunk):
+        if not chunk or self.end is not None:
+            return
+        self._data += chunk
+        data, n, pos = self._data, len(self._data), self._pos
+
+        if self.start is None:
+            m = self._root.search(data, pos)
+            if not m:
+                self._pos = n
+                return
+            pos = m.start()
+            self.start = pos
+            self._stack.append(data[pos])
+            self._safe = (pos + 1, 1)
+            self._on_open(data[pos], pos)
+            pos += 1
+
+        while pos < n:
+            if self._in_string:
+                m = _INSIDE.search(data, pos)
+                if not m:
+                    pos = n
+                    break
+                i = m.start()
+                if data[i] == '\\':
+                    if i + 1 >= n:
+                        pos = i  # escaped char is in the next chunk
+                        break
+                    pos = i + 2
+                    continue
+                self._in_string = False
+                pos = i + 1
+                self._on_string(self._string_start, i)
+                continue
+
+            m = _OUTSIDE.search(data, pos)
+            if not m:
+                pos = n
+                break
+            i = m.start()
+            ch = data[i]
+            pos = i + 1
+
+            if self._comma is not None:
+                if ch in '}]' and not data[self._comma + 1:i].strip():
+                    self._trailing.append(self._comma)
+                self._comma = None
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ',':
+                self._comma = i
+                self._safe = (i, len(self._stack))
+            elif ch in '{[':
+                self._stack.append(ch)
+                self._safe = (i + 1, len(self._stack))
+                self._on_open(ch, i)
+            else:
+                self._on_close(ch, i)
+                self._stack.pop()
+                if not self._stack:
+                    self.end = i + 1
+                    break
+                self._safe = (i + 1, len(self._stack))
+
+        self._pos = pos
+
+    # ──────────────────────────────────────────
+    #  Hooks
+    # ──────────────────────────────────────────
+
+    def _on_open(self, ch, pos):
+        pass
+
+    def _on_close(self, ch, pos):
+        pass
+
+    def _on_string(self, start, end):
+        pass
+
+    # ──────────────────────────────────────────
+    #  Repair / parse
+    # ──────────────────────────────────────────
+
+    def _text(self, start, end):
+        """data[start:end] with any trailing commas in that range removed."""
+        cuts = [c for c in self._trailing if start <= c < end]
+        if self._comma is not None and start <= self._comma < end and not self._data[self._comma + 1:end].strip():
+            cuts.append(self._comma)
+        if not cuts:
+            return self._data[start:end]
+        parts, prev = [], start
+        for c in sorted(cuts):
+            parts.append(self._data[prev:c])
+            prev = c + 1
+        parts.append(self._data[prev:end])
+        return ''.join(parts)
+
+    def parse_range(self, start, end):
+        """Parse data[start:end], retrying once without trailing commas."""
+        text = self._data[start:end]
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        repaired = self._text(start, end)
+        if repaired != text:
+            try:
+                return json.loads(repaired)
+            except json.JSONDecodeError:
+                pass
+        return None
+
+    def result(self):
+        """Best-effort value of the root seen so far (None if nothing usable)."""
+        if self.start is None:
+            return None
+        if self.end is not None:
+            return self.parse_range(self.start, self.end)
+
+        # Truncated: close whatever is open, first at the very end, then at the last clean cut
+        cuts = []
+        if not self._in_string:
+            cuts.append((len(self._data), len(self._stack)))
+        if self._safe:
+            cuts.append(self._safe)
+        for end, depth in cuts:
+            closers = ''.join(_CLOSER[c] for c in reversed(self._stack[:depth]))
+            try:
+                return json.loads(self._text(self.start, end) + closers)
+            except json.JSONDecodeError:
+                continue
+        return None
+
+
+def extract_json(text, max_candidates=3):
+    """First JSON object or array in LLM output, repaired if needed; None if there isn't one.
+
+    Clean output takes the ``json.loads`` fast path. Otherwise the text is
+    scanned once from whichever of ``{`` / ``[`` comes first; if that value
+    doesn't parse (e.g. brackets in prose), the next ``max_candidates - 1``
+    openings are tried. A nested value is never returned as the root.
+    """
+    if not text:
+        return None
+    stripped = text.strip()
+    if stripped.startswith(('{', '[')):
+        try:
+            return json.loads(stripped)
+        except json.JSONDecodeError:
+            pass
+
+    offset = 0
+    for _ in range(max_candidates):
+        scanner = JsonScanner()
+        scanner.feed(text[offset:] if offset else text)
+        value = scanner.result()
+        if value is not None or not scanner.complete:
+            return value
+        offset += scanner.start + 1
+    return None
+
+
+class NodeStreamParser(JsonScanner):
+    """Pull completed objects out of a top-level array while JSON is still streaming.
+
+    Feed it chunks of model output; every time an element of ``array_key``
+    (e.g. the roadmap's ``"nodes"``) closes, ``feed`` returns it parsed.
+    Anything before the first ``{`` (markdown fences, chatter) is ignored,
+    and ``result()`` gives the whole (repaired) document at any point.
+    """
+
+    _root = re.compile(r'\{')   # the document is an object holding the array
+
+    def __init__(self, array_key='nodes'):
+        super().__init__()
+        self.array_key = array_key
+        self._last_key = None     # last string seen directly inside the root object
+        self._array_depth = None  # depth of the target array once we're inside it
+        self._item_start = None   # offset of the current element's opening brace
+        self._completed = []
+        self.count = 0
+
+    def feed(self, chunk):
+        """Consume a chunk and return the list of elements completed by it."""
+        self._completed = []
+        super().feed(chunk)
+        return self._completed
+
+    def _on_string(self, start, end):
+        if self.depth == 1 and self._array_depth is None:
+            self._last_key = self._data[start + 1:end]
+
+    def _on_open(self, ch, pos):
+        if ch == '[' and self.depth == 2 and self._last_key == self.array_key:
+            self._array_depth = 2
+        elif ch == '{' and self._array_depth and self.depth == self._array_depth + 1:
+            self._item_start = pos
+
+    def _on_close(self, ch, pos):
+        if ch == '}' and self._item_start is not None and self.depth == self._array_depth + 1:
+            item = self.parse_range(self._item_start, pos + 1)
+            if item is not None:
+                self._completed.append(item)
+                self.count += 1
+            self._item_start = None
+        elif ch == ']' and self._array_depth and self.depth == self._array_depth:
+            self._array_depth = None
+            self._last_key = None
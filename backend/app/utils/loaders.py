@@ -0,0 +1,74 @@
+"""
+Batched document loading for serializers
+Serializers ask the request's IdentityMap for the users / battle stats they
+reference instead of querying one document at a time. Ids not seen yet in
+this request are fetched together with one ``$in`` query; ids already seen
+cost nothing, across every serializer in the same request.
+"""
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import g, has_app_context
+
+
+def ref_id(doc, field):
+    """ObjectId a ReferenceField points at, without dereferencing it (which would query)."""
+    value = doc._data.get(field)
+    if value is None:
+        return None
+    return getattr(value, 'id', value)   # DBRef / loaded Document / raw ObjectId
+
+
+def _oid(value):
+    if value is None or isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(str(value))
+    except (InvalidId, TypeError):
+        return None
+
+
+class IdentityMap:
+    """Documents loaded during one request, keyed by ObjectId. Read-only use:
+    users are loaded without password_hash and friends."""
+
+    def __init__(self):
+        self._maps = {}   # kind -> {ObjectId: document or None}
+
+    def _load(self, kind, ids, fetch):
+        ids = [oid for oid in (_oid(i) for i in ids) if oid is not None]
+        cache = self._maps.setdefault(kind, {})
+        missing = list({oid for oid in ids if oid not in cache})
+        if missing:
+            found = fetch(missing)
+            for oid in missing:
+                cache[oid] = found.get(oid)
+        return {oid: cache[oid] for oid in ids if cache[oid] is not None}
+
+    def users(self, ids):
+        """{ObjectId: User} for the given ids (str or ObjectId); unknown ids are left out."""
+        from ..models.user import User
+        return self._load('users', ids, lambda missing: {
+            u.id: u for u in User.objects(id__in=missing).exclude('password_hash', 'friends')})
+
+    def stats(self, user_ids):
+        """{user ObjectId: BattleStats} for users that have stats. Never creates any."""
+        from ..models.battle import BattleStats
+        return self._load('stats', user_ids, lambda missing: {
+            doc['user_id']: BattleStats._from_son(doc)
+            for doc in BattleStats._get_collection().find({'user_id': {'$in': missing}})})
+
+
+def identity_map():
+    """The current request's IdentityMap (a throwaway one outside an app context)."""
+    if not has_app_context():
+        return IdentityMap()
+    if 'identity_map' not in g:
+        g.identity_map = IdentityMap()
+    return g.identity_map
+
+
+def serialize_battles(battles):
+    """``BattleResult.to_dict()`` for many battles with one user query in total."""
+    battles = list(battles)
+    users = identity_map().users(ref_id(b, field) for b in battles for field in ('challenger_id', 'opponent_id'))
+    return [b.to_dict(users) for b in battles]
@@ -0,0 +1,141 @@
+"""
+Topic canonicalization and fuzzy matching for cache keys
+"React.js", "ReactJS", "react js developer" and "React Developer" all map to
+the same canonical topic, so they share one cached roadmap.
+"""
+import re
+
+# Multi-word / punctuated spellings → single canonical token.
+# Applied to the lowercased topic before tokenizing, longest phrase first.
+TOPIC_ALIASES = {
+    'react.js': 'react', 'reactjs': 'react', 'react js': 'react',
+    'react native': 'react-native', 'react-native': 'react-native',
+    'vue.js': 'vue', 'vuejs': 'vue', 'vue js': 'vue',
+    'angular.js': 'angular', 'angularjs': 'angular', 'angular js': 'angular',
+    'next.js': 'nextjs', 'next js': 'nextjs',
+    'node.js': 'node', 'nodejs': 'node', 'node js': 'node',
+    'express.js': 'express', 'expressjs': 'express',
+    'javascript': 'javascript', 'java script': 'javascript', 'js': 'javascript',
+    'typescript': 'typescript', 'ts': 'typescript',
+    'golang': 'go', 'go lang': 'go',
+    'c#': 'csharp', 'c sharp': 'csharp', 'c++': 'cpp',
+    '.net': 'dotnet', 'asp.net': 'aspnet',
+    'py': 'python', 'python3': 'python',
+    'k8s': 'kubernetes',
+    'postgres': 'postgresql', 'mongo': 'mongodb',
+    'front end': 'frontend', 'front-end': 'frontend',
+    'back end': 'backend', 'back-end': 'backend',
+    'full stack': 'fullstack', 'full-stack': 'fullstack', 'mern stack': 'mern', 'mern': 'mern',
+    'dev ops': 'devops', 'dev-ops': 'devops',
+    'machine learning': 'machine-learning', 'ml': 'machine-learning',
+    'deep learning': 'deep-learning', 'dl': 'deep-learning',
+    'artificial intelligence': 'ai',
+    'data science': 'data-science', 'data scientist': 'data-science',
+    'cyber security': 'cybersecurity', 'cyber-security': 'cybersecurity',
+    'ui/ux': 'ux', 'ui ux': 'ux', 'ux/ui': 'ux',
+    'ci/cd': 'cicd',
+    'amazon web services': 'aws', 'google cloud': 'gcp',
+    'ios': 'ios', 'android': 'android',
+}
+
+# Role words that don't change which roadmap the user wants.
+ROLE_WORDS = {
+    'developer', 'developers', 'development', 'dev', 'engineer', 'engineers', 'engineering',
+    'programmer', 'programming', 'roadmap', 'career', 'path', 'become', 'a', 'an', 'the',
+    'to', 'for', 'in', 'of', 'and', 'how', 'learn', 'course', 'complete', 'beginner',
+}
+
+# Names that merely end in "s" and must not be de-pluralized.
+NO_STEM = {
+    'devops', 'mlops', 'kubernetes', 'aws', 'ios', 'macos', 'redis', 'sass', 'css',
+    'express', 'analysis', 'postgres', 'jenkins', 'rails', 'numpy', 'pandas', 'graphics',
+    'analytics', 'physics', 'robotics', 'electronics', 'ads', 'os',
+}
+
+_ALIAS_PATTERN = re.compile(
+    r'(?<![\w.#+])(' + '|'.join(
+        re.escape(a) for a in sorted(TOPIC_ALIASES, key=len, reverse=True)
+    ) + r')(?![\w#+])'
+)
+_TOKEN_PATTERN = re.compile(r'[a-z0-9][a-z0-9\-]*')
+
+
+def _stem(token):
+    """Very light suffix stripping — just enough to fold plurals."""
+    if len(token) <= 3 or '-' in token or token in NO_STEM:
+        return token
+    if token.endswith('ies'):
+        return token[:-3] + 'y'
+    if token.endswith('s') and not token.endswith(('ss', 'us', 'is')):
+        return token[:-1]
+    return token
+
+
+def canonical_topic(topic):
+    """Normalize a free-text topic into an order-independent canonical form."""
+    text = (topic or '').strip().lower()
+    text = _ALIAS_PATTERN.sub(lambda m: f" {TOPIC_ALIASES[m.group(1)]} ", text)
+    tokens = {_stem(t) for t in _TOKEN_PATTERN.findall(text)}
+    meaningful = sorted(t for t in tokens if t not in ROLE_WORDS)
+    # "Developer" alone shouldn't collapse to an empty key
+    return ' '.join(meaningful or sorted(tokens)) or text
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TopicSimilarityIndex:
+    """Character-trigram index over canonical topics, bucketed by an arbitrary key.
+
+    ``nearest`` returns the most similar known topic (Jaccard over trigrams)
+    if it clears ``threshold``; candidates come from an inverted index so a
+    lookup only scores topics that share at least one trigram.
+    """
+
+    def __init__(self):
+        self._grams = {}     # bucket -> {topic: trigram set}
+        self._postings = {}  # bucket -> {trigram: set(topic)}
+        self.loaded = False
+
+    def add(self, bucket, topic):
+        topics = self._grams.setdefault(bucket, {})
+        if topic in topics:
+            return
+        grams = _trigrams(topic)
+        topics[topic] = grams
+        postings = self._postings.setdefault(bucket, {})
+        for g in grams:
+            postings.setdefault(g, set()).add(topic)
+
+    def discard(self, bucket, topic):
+        grams = self._grams.get(bucket, {}).pop(topic, None)
+        if not grams:
+            return
+        postings = self._postings.get(bucket, {})
+        for g in grams:
+            postings.get(g, set()).discard(topic)
+
+    def nearest(self, bucket, topic, threshold=0.8):
+        """Return (topic, score) of the best match above threshold, else (None, best score)."""
+        topics = self._grams.get(bucket)
+        if not topics:
+            return None, 0.0
+        if topic in topics:
+            return topic, 1.0
+        grams = _trigrams(topic)
+        postings = self._postings.get(bucket, {})
+        overlap = {}
+        for g in grams:
+            for candidate in postings.get(g, ()):
+                overlap[candidate] = overlap.get(candidate, 0) + 1
+
+        best, best_score = None, 0.0
+        for candidate, shared in overlap.items():
+            score = shared / (len(grams) + len(topics[candidate]) - shared)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best_score >= threshold:
+            return best, best_score
+        return None, best_score
@@ -9,12 +9,17 @@ on AWS (production) even though it works locally with socketio.run().
 import eventlet
 eventlet.monkey_patch()
 
+import os
+
 # Server socket
 bind = "0.0.0.0:5000"
 
-# Worker processes — eventlet uses green threads inside 1 worker
+# Worker processes — eventlet uses green threads inside each worker.
+# More than 1 worker needs BATTLE_STORE_URL and SOCKETIO_MESSAGE_QUEUE
+# (shared battle rooms / cross-worker emits) and WebSocket-first clients,
+# since long-polling requests aren't sticky to one worker.
 worker_class = "eventlet"
-workers = 1
+workers = int(os.getenv("GUNICORN_WORKERS", 1))
 
 # Timeout — allow enough time for AI API calls (40s API timeout + overhead)
 timeout = 180
@@ -0,0 +1,226 @@
+"""
+Spectator Load Test - 1,000 sockets watching one live battle
+Run with: python loadtest_spectators.py --challenger USER_ID --opponent USER_ID [--spectators 1000]
+
+Against a running server (python run.py / gunicorn), two driver sockets
+create and play a battle between the given users while N spectator sockets
+join its spectate room. Every answer's send time is recorded, so each
+spectate_score frame a spectator receives gives a fan-out delay. Reports
+connect time, frames per spectator, delivery p50/p95/max and how many
+spectators saw the final result.
+
+Needs the python-socketio client (pip install "python-socketio[client]").
+Use --battle BATTLE_ID to watch a battle that is already being played.
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import statistics
+import sys
+import time
+
+import socketio
+
+try:
+    import msgpack
+except ImportError:  # only needed when the server runs with BATTLE_MSGPACK=true
+    msgpack = None
+
+
+def decode(data):
+    if isinstance(data, (bytes, bytearray)):
+        if msgpack is None:
+            raise RuntimeError('server sends MessagePack frames; pip install msgpack')
+        return msgpack.unpackb(data, raw=False)
+    return data
+
+
+class Spectator:
+    def __init__(self, url, battle_id, sent, transports):
+        self.sent = sent              # total answers -> time the driver sent that answer
+        self.delays = []
+        self.frames = 0
+        self.joined = None
+        self.finished = False
+        self.error = None
+        self.client = socketio.Client(reconnection=False)
+        self.client.on('spectate_state', self._on_state)
+        self.client.on('spectate_score', self._on_score)
+        self.client.on('spectate_result', self._on_result)
+        self.client.on('error', self._on_error)
+        self.url, self.battle_id, self.transports = url, battle_id, transports
+
+    def start(self):
+        started = time.time()
+        try:
+            self.client.connect(self.url, transports=self.transports, wait_timeout=30)
+            self.client.emit('spectate_battle', {'battle_id': self.battle_id})
+        except Exception as e:
+            self.error = f'{type(e).__name__}: {e}'
+        return time.time() - started
+
+    def _on_state(self, data):
+        self.joined = time.time()
+
+    def _on_score(self, data):
+        received = time.time()
+        c_score, c_answered, o_score, o_answered = decode(data)
+        self.frames += 1
+        sent = self.sent.get(c_answered + o_answered)
+        if sent:
+            self.delays.append(received - sent)
+
+    def _on_result(self, data):
+        self.finished = True
+
+    def _on_error(self, data):
+        self.error = data.get('message') if isinstance(data, dict) else str(data)
+
+    def stop(self):
+        try:
+            self.client.disconnect()
+        except Exception:
+            pass
+
+
+class Driver:
+    """Two player sockets that create, join and play one battle."""
+
+    def __init__(self, url, challenger, opponent, topic, transports):
+        self.url, self.topic, self.transports = url, topic, transports
+        self.players = {'challenger': challenger, 'opponent': opponent}
+        self.clients = {}
+        self.battle_id = None
+        self.total = 0
+        self.ready = eventlet.event.Event()
+        self.started = {'challenger': eventlet.event.Event(), 'opponent': eventlet.event.Event()}
+
+    def connect(self):
+        for role, user_id in self.players.items():
+            client = socketio.Client(reconnection=False)
+            client.on('battle_created', self._on_created)
+            client.on('battle_start', lambda data, role=role: self._on_start(role, data))
+            client.on('error', lambda data, role=role: print(f'  [{role}] error: {data}'))
+            client.connect(self.url, transports=self.transports, wait_timeout=30)
+            client.emit('register_user', {'user_id': user_id})
+            self.clients[role] = client
+
+    def _on_created(self, data):
+        self.battle_id = data['battle_id']
+        self.total = data['total_questions']
+        self.ready.send()
+
+    def _on_start(self, role, data):
+        self.started[role].send(decode(data))
+
+    def create(self):
+        self.clients['challenger'].emit('create_battle', {'user_id': self.players['challenger'], 'topic': self.topic})
+        self.ready.wait()
+        self.clients['opponent'].emit('join_battle', {'user_id': self.players['opponent'], 'battle_id': self.battle_id})
+        for event in self.started.values():
+            event.wait()
+        return self.battle_id
+
+    def play(self, sent, interval):
+        """Alternate answers between the players, recording when each was sent."""
+        count = 0
+        for index in range(self.total):
+            for role in ('challenger', 'opponent'):
+                count += 1
+                sent[count] = time.time()
+                self.clients[role].emit('submit_answer', {'b': self.battle_id, 'u': self.players[role],
+                                                          'i': index, 'a': index % 4})
+                eventlet.sleep(interval)
+
+    def close(self):
+        for client in self.clients.values():
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(args):
+    transports = ['websocket'] if args.websocket_only else None
+    sent = {}
+    driver = None
+    battle_id = args.battle
+    if not battle_id:
+        driver = Driver(args.url, args.challenger, args.opponent, args.topic, transports)
+        driver.connect()
+        battle_id = driver.create()
+        print(f'Battle {battle_id} started ({driver.total} questions)')
+
+    print(f'Connecting {args.spectators} spectators (concurrency {args.concurrency})...')
+    spectators = [Spectator(args.url, battle_id, sent, transports) for _ in range(args.spectators)]
+    pool = eventlet.GreenPool(args.concurrency)
+    started = time.time()
+    connect_times = list(pool.imap(lambda s: s.start(), spectators))
+    deadline = time.time() + 30
+    while time.time() < deadline and sum(1 for s in spectators if s.joined or s.error) < len(spectators):
+        eventlet.sleep(0.1)
+    joined = [s for s in spectators if s.joined]
+    print(f'  {len(joined)}/{len(spectators)} watching after {time.time() - started:.1f}s '
+          f'(connect p50 {percentile(connect_times, 50) * 1000:.0f} ms, '
+          f'p95 {percentile(connect_times, 95) * 1000:.0f} ms)')
+
+    if driver:
+        print(f'Playing at one answer every {args.interval}s...')
+        driver.play(sent, args.interval)
+    else:
+        print(f'Watching for {args.duration}s...')
+    wait_until = time.time() + (10 if driver else args.duration)
+    while time.time() < wait_until and not all(s.finished for s in joined):
+        eventlet.sleep(0.2)
+
+    delays = [d for s in joined for d in s.delays]
+    frames = [s.frames for s in joined]
+    errors = [s.error for s in spectators if s.error]
+    print('\nResults')
+    print(f'  spectators watching:   {len(joined)}')
+    print(f'  frames per spectator:  min {min(frames, default=0)}, '
+          f'median {statistics.median(frames) if frames else 0}, max {max(frames, default=0)}')
+    if delays:
+        print(f'  answer -> spectator:   p50 {percentile(delays, 50) * 1000:.0f} ms, '
+              f'p95 {percentile(delays, 95) * 1000:.0f} ms, max {max(delays) * 1000:.0f} ms '
+              f'(includes up to 1/BATTLE_SPECTATOR_HZ of deliberate throttling)')
+    print(f'  saw final result:      {sum(1 for s in joined if s.finished)}')
+    if errors:
+        print(f'  errors:                {len(errors)} (first: {errors[0]})')
+
+    for s in spectators:
+        s.stop()
+    if driver:
+        driver.close()
+    return len(joined) == len(spectators) and not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test battle spectating with many sockets')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--spectators', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=100, help='sockets connecting at once')
+    parser.add_argument('--challenger', help='user id that creates the battle')
+    parser.add_argument('--opponent', help='user id that joins it')
+    parser.add_argument('--topic', default='JavaScript')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between answers')
+    parser.add_argument('--battle', help='watch this live battle instead of driving one')
+    parser.add_argument('--duration', type=float, default=60, help='how long to watch with --battle')
+    parser.add_argument('--websocket-only', action='store_true', help='skip the long-polling handshake')
+    args = parser.parse_args()
+    if not args.battle and not (args.challenger and args.opponent):
+        parser.error('give --challenger and --opponent user ids, or --battle')
+
+    sys.exit(0 if run(args) else 1)
+
+
+if __name__ == '__main__':
+    main()
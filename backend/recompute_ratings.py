@@ -0,0 +1,238 @@
+"""
+Rating Recompute - Replay every finished battle through a rating engine
+Run with: python recompute_ratings.py [--engine glicko2] [--period-days 7] [--incremental] [--promote]
+
+Completed BattleResult documents are read once (a projection, oldest first),
+turned into NumPy arrays and rated one rating period at a time with the
+engine's vectorized ``rate_period``. Results go to a shadow collection
+(``battle_ratings_<engine>`` by default), swapped in with a rename, so live
+BattleStats ratings are untouched until you pass --promote.
+
+Only closed periods are rated; the shadow collection remembers the last one,
+so --incremental (e.g. from cron once a period) only rates what is new.
+The Elo engine is replayed per period too, which approximates the live
+per-game Elo rather than reproducing it.
+
+--promote also rates the open period (without saving it to the shadow) and
+writes each player only if their live stats did not change meanwhile;
+players who finished a battle during the run are rated again.
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import calendar
+import os
+import sys
+import time
+from datetime import datetime
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from pymongo import UpdateOne
+
+from app import create_app
+from app.services.rating_engine import get_engine, initial_state, RATING_FLOOR
+
+GAME_FIELDS = {'challenger_id': 1, 'opponent_id': 1, 'winner_id': 1, 'is_draw': 1,
+               'is_ai_opponent': 1, 'completed_at': 1}
+
+
+def load_games(period_seconds, after_period=None):
+    """(challenger ids, opponent ids or None for the AI, challenger scores, period numbers)."""
+    from app.models.battle import BattleResult
+    query = {'status': 'completed', 'completed_at': {'$ne': None}}
+    if after_period is not None:
+        query['completed_at'] = {'$gte': datetime.utcfromtimestamp((after_period + 1) * period_seconds)}
+    challengers, opponents, scores, periods = [], [], [], []
+    for doc in BattleResult._get_collection().find(query, GAME_FIELDS).sort('completed_at', 1):
+        if not doc.get('is_ai_opponent') and not doc.get('opponent_id'):
+            continue
+        challengers.append(doc['challenger_id'])
+        opponents.append(None if doc.get('is_ai_opponent') else doc['opponent_id'])
+        if doc.get('is_draw'):
+            scores.append(0.5)
+        else:
+            scores.append(1.0 if doc.get('winner_id') == doc['challenger_id'] else 0.0)
+        periods.append(calendar.timegm(doc['completed_at'].utctimetuple()) // period_seconds)
+    return challengers, opponents, np.array(scores), np.array(periods, dtype=np.int64)
+
+
+def load_shadow(collection, engine, period_days):
+    """Saved state to continue from: (user ids, state arrays, games, last period)."""
+    meta = collection.find_one({'_id': 'meta'})
+    if not meta:
+        return None
+    if meta['engine'] != engine.name or meta['period_days'] != period_days:
+        raise SystemExit(f"{collection.name} was built with {meta['engine']} / {meta['period_days']}-day periods; "
+                         f"run a full recompute instead of --incremental")
+    docs = list(collection.find({'_id': {'$ne': 'meta'}}))
+    ids = [d['_id'] for d in docs]
+    state = {key: np.array([d[key] for d in docs], dtype=float) for key in ('rating', 'rd', 'volatility')}
+    return ids, state, np.array([d['games'] for d in docs], dtype=np.int64), meta['last_period']
+
+
+def replay(engine, ids, state, games, challengers, opponents, scores, periods, first, last):
+    """Rate periods first .. last. Returns (ids, state, games)."""
+    index = {oid: i for i, oid in enumerate(ids)}
+    for oid in challengers + [o for o in opponents if o is not None]:
+        if oid not in index:
+            index[oid] = len(ids)
+            ids.append(oid)
+    grow = len(ids) - len(state['rating'])
+    if grow:
+        start = initial_state()
+        state = {key: np.concatenate([state[key], np.full(grow, start[key])]) for key in state}
+        games = np.concatenate([games, np.zeros(grow, dtype=np.int64)])
+
+    a = np.array([index[c] for c in challengers], dtype=np.int64)
+    b = np.array([index[o] if o is not None else -1 for o in opponents], dtype=np.int64)
+    games += np.bincount(a, minlength=len(ids)) + np.bincount(b[b >= 0], minlength=len(ids))
+
+    # Games are sorted by time, so each period is one contiguous slice
+    bounds = np.searchsorted(periods, np.arange(first, last + 2))
+    for p in range(last - first + 1):
+        lo, hi = bounds[p], bounds[p + 1]
+        state = engine.rate_period(state, a[lo:hi], b[lo:hi], scores[lo:hi])
+    return ids, state, games
+
+
+def save_shadow(db, name, engine, period_days, ids, state, games, last_period, chunk=1000):
+    """Write to a scratch collection, then rename it over the shadow in one step."""
+    scratch = db[f'{name}_build']
+    scratch.drop()
+    now = datetime.utcnow()
+    docs = [{'_id': oid, 'rating': float(state['rating'][i]), 'rd': float(state['rd'][i]),
+             'volatility': float(state['volatility'][i]), 'games': int(games[i]), 'computed_at': now}
+            for i, oid in enumerate(ids)]
+    docs.append({'_id': 'meta', 'engine': engine.name, 'period_days': period_days,
+                 'last_period': int(last_period), 'players': len(ids), 'computed_at': now})
+    for i in range(0, len(docs), chunk):
+        scratch.insert_many(docs[i:i + chunk], ordered=False)
+    scratch.create_index([('rating', -1)])
+    scratch.rename(name, dropTarget=True)
+
+
+def compare(ids, state):
+    """How far the recomputed ratings are from the live ones."""
+    from app.models.battle import BattleStats
+    live = {d['user_id']: d.get('rating', 1000) for d in BattleStats._get_collection().find({}, {'user_id': 1, 'rating': 1})}
+    diff = np.array([state['rating'][i] - live[oid] for i, oid in enumerate(ids) if oid in live])
+    if len(diff):
+        print(f"  vs live ratings: mean |diff| {np.abs(diff).mean():.1f}, "
+              f"max |diff| {np.abs(diff).max():.0f}, moved >50: {(np.abs(diff) > 50).sum()} of {len(diff)}")
+
+
+def promote(app, engine, ids, state, games, period_seconds, current, attempts=3, chunk=1000):
+    """Copy the ratings into BattleStats and refresh the leaderboards.
+
+    The open period is rated on top of the closed ones, for the players who
+    have games in it. Each user is written only if their stats have not
+    changed since they were read (``updated_at``, as in battle_stats); users
+    who finished a battle meanwhile are rated again with it included.
+    Deviation / volatility are only written by engines that track them.
+    """
+    from app.models.battle import BattleStats
+    from app.services.leaderboard import leaderboard
+    collection = BattleStats._get_collection()
+    pending = set(ids)
+    written = 0
+    for _ in range(attempts):
+        seen = {d['user_id']: d.get('updated_at') for d in collection.find(
+            {'user_id': {'$in': list(pending)}}, {'user_id': 1, 'updated_at': 1})}
+        # Read after the snapshot, so a battle finishing in between is either
+        # in these games or has moved updated_at
+        challengers, opponents, scores, periods = load_games(period_seconds, current - 1)
+        final_ids, final_state, played = replay(engine, list(ids), state, games.copy(),
+                                                challengers, opponents, scores, periods, current, current)
+        played -= np.concatenate([games, np.zeros(len(final_ids) - len(ids), dtype=np.int64)])
+        now = datetime.utcnow()
+        ops = []
+        for i, oid in enumerate(final_ids):
+            if oid not in seen:
+                continue
+            # Sitting out the open period leaves a player's closed-period state alone
+            source = final_state if played[i] else state
+            fields = {'rating': max(int(round(source['rating'][i])), RATING_FLOOR), 'updated_at': now}
+            if engine.name == 'glicko2':
+                fields.update(rating_deviation=float(source['rd'][i]), volatility=float(source['volatility'][i]))
+            ops.append(UpdateOne({'user_id': oid, 'updated_at': seen[oid]}, {'$set': fields}))
+        for i in range(0, len(ops), chunk):
+            written += collection.bulk_write(ops[i:i + chunk], ordered=False).modified_count
+        pending = {d['user_id'] for d in collection.find(
+            {'user_id': {'$in': list(seen)}, 'updated_at': {'$ne': now}}, {'user_id': 1})}
+        if not pending:
+            break
+    leaderboard.rebuild(app)
+    print(f"  promoted {written} ratings to BattleStats")
+    if pending:
+        print(f"  {len(pending)} players kept playing through {attempts} attempts; left as they are")
+
+
+def run(app, engine_name, period_days, collection_name, incremental, do_promote):
+    from app.models.battle import BattleResult
+    engine = get_engine(app.config, engine_name)
+    period_seconds = int(period_days * 86400)
+    current = int(time.time()) // period_seconds
+    database = BattleResult._get_db()
+    name = collection_name or f'battle_ratings_{engine.name}'
+
+    saved = load_shadow(database[name], engine, period_days) if incremental else None
+    if saved:
+        ids, state, games, last_done = saved
+    else:
+        ids, state, games, last_done = [], {key: np.array([]) for key in initial_state()}, np.array([], dtype=np.int64), None
+
+    started = time.time()
+    challengers, opponents, scores, periods = load_games(period_seconds, last_done)
+    closed = periods < current
+    count = int(closed.sum())
+    challengers, opponents = challengers[:count], opponents[:count]
+    scores, periods = scores[:count], periods[:count]
+    loaded = time.time()
+    print(f"Loaded {count} games in closed {period_days}-day periods "
+          f"({len(closed) - count} in the open period wait) in {loaded - started:.2f}s")
+    if not count and saved:
+        print("Nothing new to rate")
+        if do_promote:
+            promote(app, engine, ids, state, games, period_seconds, current)
+        return True
+
+    first = last_done + 1 if last_done is not None else int(periods[0]) if count else current - 1
+    last = current - 1
+    ids, state, games = replay(engine, list(ids), state, games, challengers, opponents, scores, periods, first, last)
+    print(f"Rated {last - first + 1} periods for {len(ids)} players with {engine.name} "
+          f"in {time.time() - loaded:.2f}s")
+
+    save_shadow(database, name, engine, period_days, ids, state, games, last)
+    print(f"  wrote {name}")
+    compare(ids, state)
+    order = np.argsort(-state['rating'])[:10]
+    for rank, i in enumerate(order, 1):
+        print(f"  {rank:>2}. {ids[i]}  {state['rating'][i]:7.1f}  rd {state['rd'][i]:5.1f}  ({games[i]} games)")
+
+    if do_promote:
+        promote(app, engine, ids, state, games, period_seconds, current)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recompute battle ratings from the full battle log')
+    parser.add_argument('--engine', help='elo or glicko2 (default: RATING_ENGINE from config)')
+    parser.add_argument('--period-days', type=int, help='rating period length (default: RATING_PERIOD_DAYS)')
+    parser.add_argument('--collection', help='shadow collection (default: battle_ratings_<engine>)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='continue from the shadow collection and rate only newly closed periods')
+    parser.add_argument('--promote', action='store_true', help='copy the results into BattleStats afterwards')
+    parser.add_argument('--env', default=os.getenv('FLASK_ENV', 'development'))
+    args = parser.parse_args()
+
+    app = create_app(args.env)
+    with app.app_context():
+        ok = run(app, args.engine, args.period_days or app.config.get('RATING_PERIOD_DAYS', 7),
+                 args.collection, args.incremental, args.promote)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
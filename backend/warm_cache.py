@@ -0,0 +1,169 @@
+"""
+Roadmap Cache Warmer - Pre-generate AI roadmaps for a topic catalog
+Run with: python warm_cache.py [--catalog catalog.json] [--concurrency 3] [--backend fake]
+
+Every topic x mode x experience level in the catalog is generated through
+AIService.generate_roadmap (so it lands in RoadmapCache exactly like a user
+request would). Progress is checkpointed to a JSON file after each job;
+re-running with the same checkpoint skips everything already done.
+
+Catalog file format:
+    {"topics": ["React Developer", ...], "modes": ["beginner", "advanced"],
+     "experience_levels": ["all"]}
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.services.ai_service import ai_service
+
+
+# Mirrors SUGGESTED_TOPICS in frontend/aisensie.html and the params it sends
+DEFAULT_CATALOG = {
+    'topics': [
+        'Frontend Development', 'Backend Development', 'Full Stack Development',
+        'React Developer', 'Angular Developer', 'Vue.js Developer',
+        'Node.js Developer', 'Python Developer', 'Java Developer',
+        'DevOps Engineer', 'Cloud Engineer (AWS)', 'Cloud Engineer (Azure)',
+        'Machine Learning', 'Data Science', 'Deep Learning',
+        'Cyber Security', 'Ethical Hacking', 'Network Security',
+        'Mobile App Development', 'Flutter Developer', 'React Native Developer',
+        'Android Developer', 'iOS Developer',
+        'Game Development', 'Unity Developer', 'Unreal Engine',
+        'Blockchain Developer', 'Web3 Developer',
+        'Linux Administration', 'System Administration',
+        'Database Administration', 'SQL & NoSQL',
+        'UI/UX Design', 'Product Design',
+        'Embedded Systems', 'IoT Developer',
+        'Kubernetes & Docker', 'Terraform & Infrastructure as Code',
+        'Software Testing & QA', 'Automation Testing',
+    ],
+    'modes': ['beginner', 'advanced'],
+    'experience_levels': ['all'],
+}
+
+
+def load_catalog(path):
+    if not path:
+        return DEFAULT_CATALOG
+    with open(path, encoding='utf-8') as f:
+        catalog = json.load(f)
+    return {
+        'topics': catalog['topics'],
+        'modes': catalog.get('modes', DEFAULT_CATALOG['modes']),
+        'experience_levels': catalog.get('experience_levels', DEFAULT_CATALOG['experience_levels']),
+    }
+
+
+def load_checkpoint(path):
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'done': {}, 'failed': {}}
+
+
+def save_checkpoint(path, checkpoint):
+    """Write atomically so a crash mid-write never corrupts the checkpoint."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def build_jobs(catalog):
+    """Expand the catalog, collapsing topics that share a cache key."""
+    from app.models.cache import RoadmapCache
+    jobs = {}
+    for topic in catalog['topics']:
+        for mode in catalog['modes']:
+            for level in catalog['experience_levels']:
+                key = RoadmapCache.make_key(topic, mode, level)
+                jobs.setdefault(key, (topic, mode, level))
+    return jobs
+
+
+def warm(app, catalog, checkpoint_path, concurrency, force=False, limit=None):
+    jobs = build_jobs(catalog)
+    checkpoint = load_checkpoint(checkpoint_path)
+    pending = [(key, job) for key, job in jobs.items() if key not in checkpoint['done']]
+    if limit:
+        pending = pending[:limit]
+
+    print(f"Catalog: {len(jobs)} unique roadmaps, {len(jobs) - len(pending)} already done, "
+          f"{len(pending)} to generate (concurrency {concurrency})")
+
+    def run(item):
+        key, (topic, mode, level) = item
+        start = time.time()
+        with app.app_context():
+            try:
+                if force:
+                    roadmap = ai_service._generate_uncached(topic, "None specified", level, "learn", mode)
+                    if roadmap and 'error' not in roadmap:
+                        ai_service._save_cache(topic, mode, level, roadmap)
+                else:
+                    roadmap = ai_service.generate_roadmap(topic, experience_level=level,
+                                                          career_goal='learn', mode=mode)
+                ok = bool(roadmap) and 'error' not in roadmap
+                error = None if ok else (roadmap or {}).get('error', 'generation failed')
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {e}"
+        return key, ok, error, time.time() - start
+
+    pool = eventlet.GreenPool(concurrency)
+    done = failed = 0
+    for key, ok, error, elapsed in pool.imap(run, pending):
+        if ok:
+            checkpoint['done'][key] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            checkpoint['failed'].pop(key, None)
+            done += 1
+            print(f"  OK   {key} ({elapsed:.1f}s)")
+        else:
+            checkpoint['failed'][key] = error
+            failed += 1
+            print(f"  FAIL {key}: {error}")
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, checkpoint)
+
+    print(f"\nWarm-up complete: {done} generated, {failed} failed")
+    print(f"Gateway: {ai_service.gateway.stats()}")
+    return failed == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-generate AI roadmaps into RoadmapCache')
+    parser.add_argument('--catalog', help='JSON catalog file (defaults to the built-in topic list)')
+    parser.add_argument('--checkpoint', default='warm_cache.checkpoint.json',
+                        help='progress file; re-run with the same file to resume')
+    parser.add_argument('--concurrency', type=int, default=3,
+                        help='roadmaps generated at once (the gateway still caps per-key load)')
+    parser.add_argument('--limit', type=int, help='stop after this many roadmaps')
+    parser.add_argument('--force', action='store_true', help='regenerate even if already cached')
+    parser.add_argument('--backend', choices=['nvidia', 'ollama', 'fake'],
+                        help='LLM backend for this run (default: LLM_BACKEND from config)')
+    parser.add_argument('--base-url', help='override the NVIDIA-compatible endpoint (e.g. a local stand-in server)')
+    parser.add_argument('--env', default=os.getenv('FLASK_ENV', 'development'))
+    args = parser.parse_args()
+
+    app = create_app(args.env)
+    # One-shot job: no background refresh scheduler in this process
+    app.config['ROADMAP_REFRESH_ENABLED'] = False
+    if args.backend:
+        app.config['LLM_BACKEND'] = args.backend
+    if args.base_url:
+        app.config['NVIDIA_BASE_URL'] = args.base_url.rstrip('/')
+
+    ok = warm(app, load_catalog(args.catalog), args.checkpoint, args.concurrency,
+              force=args.force, limit=args.limit)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -315,14 +315,28 @@ const AIAPI = {
 
 // ============ Battle API ============
 const BattleAPI = {
-  async getLeaderboard() {
-    return await apiRequest("/battle/leaderboard");
+  async getLeaderboard(params = {}) {
+    const query = new URLSearchParams(params).toString();
+    return await apiRequest(`/battle/leaderboard${query ? `?${query}` : ""}`);
+  },
+
+  async getMyRank(params = {}) {
+    const query = new URLSearchParams(params).toString();
+    return await apiRequest(`/battle/leaderboard/me${query ? `?${query}` : ""}`);
   },
 
   async getStats() {
     return await apiRequest("/battle/stats");
   },
 
+  async getRank(userId) {
+    return await apiRequest(`/battle/rank/${userId}`);
+  },
+
+  async getRankAround(userId, count = 10) {
+    return await apiRequest(`/battle/rank/${userId}/around?count=${count}`);
+  },
+
   async getHistory() {
     return await apiRequest("/battle/history");
   },
@@ -330,6 +344,10 @@ const BattleAPI = {
   async getActiveBattles() {
     return await apiRequest("/battle/active");
   },
+
+  async getProtocol() {
+    return await apiRequest("/battle/protocol");
+  },
 };
 
 // ============ Friends & Notifications API ============
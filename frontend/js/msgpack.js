@@ -0,0 +1,95 @@
+// MessagePack decoder for binary battle events - Standalone non-module script
+// Served from our own origin so skill-battle.html can decode the first frame
+// without waiting on a CDN. Decode only: the client never sends MessagePack.
+// Exposes window.MessagePack.decode(Uint8Array | ArrayBuffer).
+(function () {
+  var utf8 = new TextDecoder("utf-8");
+
+  function decode(input) {
+    var bytes = input instanceof ArrayBuffer ? new Uint8Array(input) : input;
+    var view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    var pos = 0;
+
+    function str(length) {
+      var value = utf8.decode(bytes.subarray(pos, pos + length));
+      pos += length;
+      return value;
+    }
+
+    function bin(length) {
+      var value = bytes.slice(pos, pos + length);
+      pos += length;
+      return value;
+    }
+
+    function array(length) {
+      var value = new Array(length);
+      for (var i = 0; i < length; i++) value[i] = read();
+      return value;
+    }
+
+    function map(length) {
+      var value = {};
+      for (var i = 0; i < length; i++) {
+        var key = read();
+        value[key] = read();
+      }
+      return value;
+    }
+
+    function ext(length) {
+      var type = view.getInt8(pos);
+      pos += 1;
+      return { type: type, data: bin(length) };
+    }
+
+    function read() {
+      if (pos >= bytes.length) throw new RangeError("MessagePack: unexpected end of data");
+      var b = bytes[pos++];
+      var n;
+      if (b <= 0x7f) return b;
+      if (b <= 0x8f) return map(b & 0x0f);
+      if (b <= 0x9f) return array(b & 0x0f);
+      if (b <= 0xbf) return str(b & 0x1f);
+      if (b >= 0xe0) return b - 0x100;
+      switch (b) {
+        case 0xc0: return null;
+        case 0xc2: return false;
+        case 0xc3: return true;
+        case 0xc4: n = view.getUint8(pos); pos += 1; return bin(n);
+        case 0xc5: n = view.getUint16(pos); pos += 2; return bin(n);
+        case 0xc6: n = view.getUint32(pos); pos += 4; return bin(n);
+        case 0xc7: n = view.getUint8(pos); pos += 1; return ext(n);
+        case 0xc8: n = view.getUint16(pos); pos += 2; return ext(n);
+        case 0xc9: n = view.getUint32(pos); pos += 4; return ext(n);
+        case 0xca: n = view.getFloat32(pos); pos += 4; return n;
+        case 0xcb: n = view.getFloat64(pos); pos += 8; return n;
+        case 0xcc: n = view.getUint8(pos); pos += 1; return n;
+        case 0xcd: n = view.getUint16(pos); pos += 2; return n;
+        case 0xce: n = view.getUint32(pos); pos += 4; return n;
+        case 0xcf: n = view.getUint32(pos) * 4294967296 + view.getUint32(pos + 4); pos += 8; return n;
+        case 0xd0: n = view.getInt8(pos); pos += 1; return n;
+        case 0xd1: n = view.getInt16(pos); pos += 2; return n;
+        case 0xd2: n = view.getInt32(pos); pos += 4; return n;
+        case 0xd3: n = view.getInt32(pos) * 4294967296 + view.getUint32(pos + 4); pos += 8; return n;
+        case 0xd4: return ext(1);
+        case 0xd5: return ext(2);
+        case 0xd6: return ext(4);
+        case 0xd7: return ext(8);
+        case 0xd8: return ext(16);
+        case 0xd9: n = view.getUint8(pos); pos += 1; return str(n);
+        case 0xda: n = view.getUint16(pos); pos += 2; return str(n);
+        case 0xdb: n = view.getUint32(pos); pos += 4; return str(n);
+        case 0xdc: n = view.getUint16(pos); pos += 2; return array(n);
+        case 0xdd: n = view.getUint32(pos); pos += 4; return array(n);
+        case 0xde: n = view.getUint16(pos); pos += 2; return map(n);
+        case 0xdf: n = view.getUint32(pos); pos += 4; return map(n);
+      }
+      throw new RangeError("MessagePack: unknown type byte 0x" + b.toString(16));
+    }
+
+    return read();
+  }
+
+  window.MessagePack = { decode: decode };
+})();